@@ -0,0 +1,5 @@
+"""
+Micro-benchmarks of the SAP loaders and helpers on synthetic outbound drops.
+
+    python -m benchmark --sizes 1000,10000 --repeat 3
+"""
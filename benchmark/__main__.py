@@ -0,0 +1,46 @@
+import argparse
+import os
+
+from benchmark.suite import REPO_FOLDER, compare_reports, run_benchmarks, write_report
+
+
+# --- Configuration ---
+SIZES = [1_000, 10_000, 100_000]
+WORK_FOLDER = os.path.join(REPO_FOLDER, "data", "benchmark-work")
+OUTPUT_FOLDER = os.path.join(REPO_FOLDER, "data", "benchmarks")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Times the loaders and helpers on synthetic SAP drops."
+    )
+    parser.add_argument(
+        "--sizes",
+        default=",".join(map(str, SIZES)),
+        help="Articles per FULL file, comma separated",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Parse workers passed to the loaders"
+    )
+    parser.add_argument("--delta-ratio", type=float, default=0.1)
+    parser.add_argument("--work-folder", default=WORK_FOLDER)
+    parser.add_argument("--output-folder", default=OUTPUT_FOLDER)
+    parser.add_argument("--compare", help="A previous benchmark JSON to compare against")
+    parser.add_argument(
+        "--keep", action="store_true", help="Keep the generated drops and databases"
+    )
+    args = parser.parse_args()
+
+    report = run_benchmarks(
+        [int(size) for size in args.sizes.split(",")],
+        args.work_folder,
+        repeat=args.repeat,
+        workers=args.workers,
+        delta_ratio=args.delta_ratio,
+        keep=args.keep,
+    )
+    path = write_report(report, args.output_folder)
+    print(f"\nBenchmark results written to {path} ✅")
+    if args.compare:
+        compare_reports(args.compare, report)
@@ -0,0 +1,408 @@
+import contextlib
+import datetime
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+REPO_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT_FOLDER = os.path.join(REPO_FOLDER, "script")
+sys.path.insert(0, SCRIPT_FOLDER)
+sys.path.insert(0, REPO_FOLDER)
+
+import abc_normalize
+import compare_counts
+from abc_utils import (
+    IngestionSession,
+    copy_indexed_raw_lines,
+    create_imported_logs,
+    fingerprint_file,
+    get_db_connection,
+    import_script,
+    scan_raw_lines,
+)
+import file_listing
+from file_listing import FileType, list_files_in_folder
+from benchmark.synthetic import (
+    generate_count_files,
+    generate_drop,
+    generate_listing_folder,
+)
+
+
+# (entity, script, SQL builder, SyntheticDrop attribute) of each loader
+LOADERS = [
+    ("article", "article-to-db", "build_article_staging_sql", "article_files"),
+    ("brand", "brand-to-db", "build_brand_upsert_sql", "brand_files"),
+    ("category", "category-to-db", "build_category_upsert_sql", "category_files"),
+    ("costcenter", "costcenter-to-db", "build_costcenter_upsert_sql", "costcenter_files"),
+]
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silences the progress prints of the code under test."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    size: int
+    seconds: list[float] = field(default_factory=list)
+    rows: int = 0
+    bytes: int = 0
+
+    def to_dict(self) -> dict:
+        best = min(self.seconds)
+        return {
+            "name": self.name,
+            "size": self.size,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "seconds": self.seconds,
+            "best_s": best,
+            "median_s": statistics.median(self.seconds),
+            "rows_per_s": self.rows / best if best else None,
+            "mb_per_s": self.bytes / best / 1e6 if best else None,
+        }
+
+
+def measure(
+    name: str,
+    size: int,
+    run: Callable[[], object],
+    repeat: int,
+    setup: Callable[[], object] | None = None,
+    rows: int = 0,
+    bytes: int = 0,
+) -> BenchmarkResult:
+    """Times run repeat times; setup runs untimed before each repetition."""
+    result = BenchmarkResult(name, size, rows=rows, bytes=bytes)
+    for _ in range(repeat):
+        if setup:
+            setup()
+        with quiet():
+            started_at = time.perf_counter()
+            run()
+            result.seconds.append(time.perf_counter() - started_at)
+    print(
+        f"  {name:<32} size={size:<8} best={min(result.seconds):.4f}s "
+        f"median={statistics.median(result.seconds):.4f}s"
+    )
+    return result
+
+
+def remove_db(db_name: str):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_name + suffix):
+            os.remove(db_name + suffix)
+
+
+def count_data_lines(file_path: str) -> int:
+    with open(file_path, "rb") as f:
+        return sum(1 for _ in f) - 1  # Without the header
+
+
+def load_entity(
+    entity: str, script: str, build_sql: str, files: list[str], db_name: str, workers: int
+):
+    """Runs one loader over files into db_name, the way its __main__ does."""
+    module = import_script(script)
+    module.DB_NAME = db_name
+    create_imported_logs(db_name, module.IMOPORTED_LOG_TABLE_NAME)
+    getattr(module, f"create_{entity}_config_table")(module.TABLE_NAME)
+    with IngestionSession(db_name, getattr(module, build_sql)(module.TABLE_NAME)) as session:
+        pending_files = []
+        for path in files:
+            stamp = os.path.basename(path).split("_")[3]
+            date = datetime.datetime.strptime(stamp, "%Y%m%d").date()
+            pending_files.append((path, date, fingerprint_file(path)))
+        getattr(module, f"import_{entity}_files")(
+            session,
+            pending_files,
+            module.TABLE_NAME,
+            module.IMOPORTED_LOG_TABLE_NAME,
+            workers,
+        )
+
+
+def bench_loaders(
+    drop, size: int, work_folder: str, repeat: int, workers: int
+) -> list[BenchmarkResult]:
+    results = []
+    for entity, script, build_sql, attribute in LOADERS:
+        files = getattr(drop, attribute)
+        db_name = os.path.join(work_folder, f"{entity}.db")
+        results.append(
+            measure(
+                f"load.{entity}",
+                size,
+                lambda: load_entity(entity, script, build_sql, files, db_name, workers),
+                repeat,
+                setup=lambda: remove_db(db_name),
+                rows=sum(count_data_lines(path) for path in files),
+                bytes=sum(os.path.getsize(path) for path in files),
+            )
+        )
+    return results
+
+
+def bench_scanners(drop, size: int, work_folder: str, repeat: int) -> list[BenchmarkResult]:
+    """Raw-record extraction of the delta articles; needs the load.article database."""
+    article_module = import_script("article-to-db")
+    db_name = os.path.join(work_folder, "article.db")
+    source_files = list(reversed(drop.article_files))
+    source_bytes = sum(os.path.getsize(path) for path in source_files)
+    keys = drop.delta_article_ids
+
+    def scan():
+        with open(os.devnull, "wb") as outfile:
+            scan_raw_lines(
+                source_files,
+                set(keys),
+                outfile,
+                "MATNR",
+                abc_normalize.normalize_article_id_bytes,
+            )
+
+    def copy_indexed():
+        conn = get_db_connection(db_name, profile="interactive-read")
+        with open(os.devnull, "wb") as outfile:
+            copy_indexed_raw_lines(
+                conn,
+                article_module.TABLE_NAME,
+                set(keys),
+                source_files,
+                outfile,
+                "MATNR",
+                abc_normalize.normalize_article_id_bytes,
+            )
+        conn.close()
+
+    return [
+        measure("scan.scan_raw_lines", size, scan, repeat, rows=len(keys), bytes=source_bytes),
+        measure("scan.copy_indexed_raw_lines", size, copy_indexed, repeat, rows=len(keys)),
+    ]
+
+
+def read_article_columns(file_path: str) -> dict[str, list[str]]:
+    with open(file_path, encoding="utf-8") as f:
+        header = f.readline().rstrip("\n").split("|")
+        rows = [line.rstrip("\n").split("|") for line in f]
+    return {name: [row[index] for row in rows] for index, name in enumerate(header)}
+
+
+def bench_normalizers(drop, size: int, repeat: int) -> list[BenchmarkResult]:
+    columns = read_article_columns(drop.article_files[0])
+    # (name, column, single-value normalizer, batch normalizer)
+    cases = [
+        (
+            "article_id",
+            "MATNR",
+            abc_normalize.normalize_article_id,
+            abc_normalize.normalize_article_ids,
+        ),
+        (
+            "brand_id",
+            "BRAND_ID",
+            abc_normalize.normalize_brand_id,
+            abc_normalize.normalize_brand_ids,
+        ),
+        (
+            "category_id",
+            "MATKL",
+            abc_normalize.normalize_category_id,
+            abc_normalize.normalize_category_ids,
+        ),
+        ("text", "MAKTX", abc_normalize.normalize_text, abc_normalize.normalize_texts),
+    ]
+
+    def clear_caches():
+        abc_normalize._cached_brand_id.cache_clear()
+        abc_normalize._cached_category_id.cache_clear()
+
+    results = []
+    for name, column, single, batch in cases:
+        values = columns[column]
+        results.append(
+            measure(
+                f"normalize.{name}",
+                size,
+                lambda: [single(value) for value in values],
+                repeat,
+                rows=len(values),
+            )
+        )
+        results.append(
+            measure(
+                f"normalize.{name}.batch",
+                size,
+                lambda: batch(values),
+                repeat,
+                setup=clear_caches,
+                rows=len(values),
+            )
+        )
+    return results
+
+
+def bench_listing(size: int, work_folder: str, repeat: int) -> list[BenchmarkResult]:
+    files = max(100, size // 10)
+    folder = generate_listing_folder(os.path.join(work_folder, "listing"), files)
+
+    def forget_manifest():
+        file_listing.MANIFESTS.clear()
+        if os.path.exists(file_listing.manifest_path(folder)):
+            os.remove(file_listing.manifest_path(folder))
+
+    return [
+        measure(
+            "list_files_in_folder.cold",
+            size,
+            lambda: list_files_in_folder(folder, no_filter=True),
+            repeat,
+            setup=forget_manifest,
+            rows=files,
+        ),
+        measure(
+            "list_files_in_folder",
+            size,
+            lambda: list_files_in_folder(folder, no_filter=True),
+            repeat,
+            rows=files,
+        ),
+        measure(
+            "list_files_in_folder.article",
+            size,
+            lambda: list_files_in_folder(folder, no_filter=True, file_type=FileType.ARTICLE),
+            repeat,
+            rows=files,
+        ),
+        measure(
+            "list_files_in_folder.filtered",
+            size,
+            lambda: list_files_in_folder(folder),
+            repeat,
+            rows=files,
+        ),
+    ]
+
+
+def bench_compare_counts(size: int, work_folder: str, repeat: int) -> list[BenchmarkResult]:
+    pairs = max(100, size // 10)
+    db_file, sap_file = generate_count_files(os.path.join(work_folder, "counts"), pairs)
+    return [
+        measure(
+            "compare_counts",
+            size,
+            lambda: compare_counts.compare_counts(db_file, sap_file),
+            repeat,
+            rows=pairs * 7,
+            bytes=os.path.getsize(db_file) + os.path.getsize(sap_file),
+        ),
+        measure(
+            "compare_counts.streaming",
+            size,
+            lambda: compare_counts.compare_counts_streaming(db_file, sap_file),
+            repeat,
+            rows=pairs * 7,
+            bytes=os.path.getsize(db_file) + os.path.getsize(sap_file),
+        ),
+    ]
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_FOLDER,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "started_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run_benchmarks(
+    sizes: list[int],
+    work_folder: str,
+    repeat: int = 3,
+    workers: int = 1,
+    delta_ratio: float = 0.1,
+    keep: bool = False,
+) -> dict:
+    """
+    Generates a synthetic drop of each size (articles in the FULL file) under
+    work_folder and times the loaders, raw scanners, normalizers, file
+    listing and count comparison on it.
+    """
+    report = environment()
+    report.update(
+        {
+            "sizes": sizes,
+            "repeat": repeat,
+            "workers": workers,
+            "delta_ratio": delta_ratio,
+            "results": [],
+        }
+    )
+    for size in sizes:
+        size_folder = os.path.join(work_folder, str(size))
+        shutil.rmtree(size_folder, ignore_errors=True)
+        print(f"\nGenerating a synthetic drop of {size} articles...")
+        drop = generate_drop(os.path.join(size_folder, "drop"), size, delta_ratio=delta_ratio)
+        results = (
+            bench_loaders(drop, size, size_folder, repeat, workers)
+            + bench_scanners(drop, size, size_folder, repeat)
+            + bench_normalizers(drop, size, repeat)
+            + bench_listing(size, size_folder, repeat)
+            + bench_compare_counts(size, size_folder, repeat)
+        )
+        report["results"].extend(result.to_dict() for result in results)
+        if not keep:
+            shutil.rmtree(size_folder, ignore_errors=True)
+    return report
+
+
+def write_report(report: dict, output_folder: str) -> str:
+    os.makedirs(output_folder, exist_ok=True)
+    stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    path = os.path.join(output_folder, f"benchmark_{stamp}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def compare_reports(baseline_file: str, report: dict):
+    """Prints the best time of each benchmark against a previous report."""
+    with open(baseline_file, encoding="utf-8") as f:
+        baseline = {
+            (result["name"], result["size"]): result["best_s"]
+            for result in json.load(f)["results"]
+        }
+    print(f"\n--- Compared to {baseline_file} (best time, lower is better) ---")
+    for result in report["results"]:
+        before = baseline.get((result["name"], result["size"]))
+        if not before:
+            continue
+        print(
+            f"  {result['name']:<32} size={result['size']:<8} "
+            f"{before:.4f}s -> {result['best_s']:.4f}s ({result['best_s'] / before:.2f}x)"
+        )
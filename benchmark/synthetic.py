@@ -0,0 +1,212 @@
+import datetime
+import os
+import random
+from dataclasses import dataclass, field
+
+
+# Thai words the article descriptions (MAKTX) are built from, so the loaders
+# and scanners see multi-byte UTF-8 like in the real SAP drops
+THAI_WORDS = [
+    "กระเป๋า", "น้ำหอม", "ลิปสติก", "นาฬิกา", "แว่นตา", "รองเท้า", "เสื้อ",
+    "ครีม", "บำรุง", "ผิว", "ขนาด", "สีแดง", "สีดำ", "ชุด", "ของขวัญ", "พิเศษ",
+]
+BRAND_IDS = ["GUC", "HER", "DIO", "CHA", "LVM", "PRA", "BUR", "CEL", "FEN", "YSL"]
+CHANNEL_CODES = [
+    "KPD_OFFLINE",
+    "KPT_OFFLINE",
+    "KPC_OFFLINE",
+    "KPC_ONLINE_TH",
+    "KPC_ONLINE_CN",
+    "KPC_ONLINE_THT",
+    "KPC_ONLINE_FIRSTER",
+]
+
+ARTICLE_HEADER = "MATNR|MTART|MAKTX|MATKL|MEINS|BRAND_ID|ERSDA"
+
+
+@dataclass
+class SyntheticDrop:
+    """The files of one generated SAP outbound folder, oldest first per type."""
+
+    folder: str
+    article_files: list[str] = field(default_factory=list)
+    brand_files: list[str] = field(default_factory=list)
+    category_files: list[str] = field(default_factory=list)
+    costcenter_files: list[str] = field(default_factory=list)
+    # Normalized IDs of the articles changed or added by the delta files
+    delta_article_ids: set[str] = field(default_factory=set)
+    article_rows: int = 0
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(
+            os.path.getsize(path)
+            for path in self.article_files
+            + self.brand_files
+            + self.category_files
+            + self.costcenter_files
+        )
+
+
+def drop_file_name(module: str, nature: str, date: datetime.date, time: str) -> str:
+    """S4P_{MODULE}_{NATURE}_{yyyymmdd}_{hhmmss}_1_1.CSV, as parsed by file_listing."""
+    return f"S4P_{module}_{nature}_{date.strftime('%Y%m%d')}_{time}_1_1.CSV"
+
+
+def article_id(number: int) -> str:
+    return f"{number:018d}"
+
+
+def article_line(rng: random.Random, number: int, categories: list[str]) -> str:
+    name = " ".join(rng.choice(THAI_WORDS) for _ in range(rng.randint(2, 5)))
+    category = rng.choice(categories)
+    return "|".join(
+        [
+            article_id(number),
+            "ZFG",
+            f"{name} {number}",
+            f"{category}-{rng.randint(0, 99):02d}",
+            "EA",
+            rng.choice(BRAND_IDS),
+            "20240101",
+        ]
+    )
+
+
+def write_lines(path: str, header: str, lines: list[str]):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(header + "\n")
+        for line in lines:
+            f.write(line + "\n")
+
+
+def generate_drop(
+    folder: str,
+    articles: int,
+    delta_ratio: float = 0.1,
+    deltas: int = 3,
+    new_ratio: float = 0.2,
+    reject_ratio: float = 0.001,
+    start_date: datetime.date = datetime.date(2025, 8, 1),
+    seed: int = 0,
+) -> SyntheticDrop:
+    """
+    Writes a synthetic SAP outbound drop into folder.
+
+    One ARTICLE FULL file of the given size is followed by the given number of
+    DELTA files. Each delta touches delta_ratio of the articles; new_ratio of
+    those are new articles, the rest change an existing one. reject_ratio of
+    the rows miss their MATNR, like the rows the loaders skip. BRAND, CATEGORY
+    and COSTCENTER FULL files cover the IDs the articles use.
+    """
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(seed)
+    drop = SyntheticDrop(folder)
+    categories = [f"{number:03d}" for number in range(100, 100 + max(10, articles // 500))]
+
+    lines = []
+    for number in range(1, articles + 1):
+        if rng.random() < reject_ratio:
+            lines.append(f"|ZFG|{rng.choice(THAI_WORDS)}|{rng.choice(categories)}|EA||20240101")
+            continue
+        lines.append(article_line(rng, number, categories))
+    path = os.path.join(folder, drop_file_name("ARTICLE", "FULL", start_date, "999999"))
+    write_lines(path, ARTICLE_HEADER, lines)
+    drop.article_files.append(path)
+    drop.article_rows += len(lines)
+
+    next_number = articles + 1
+    for day in range(1, deltas + 1):
+        lines = []
+        for _ in range(int(articles * delta_ratio)):
+            if rng.random() < new_ratio:
+                number = next_number
+                next_number += 1
+            else:
+                number = rng.randint(1, articles)
+            drop.delta_article_ids.add(article_id(number))
+            lines.append(article_line(rng, number, categories))
+        date = start_date + datetime.timedelta(days=day)
+        path = os.path.join(folder, drop_file_name("ARTICLE", "DELTA", date, "013000"))
+        write_lines(path, ARTICLE_HEADER, lines)
+        drop.article_files.append(path)
+        drop.article_rows += len(lines)
+
+    path = os.path.join(folder, drop_file_name("BRAND", "FULL", start_date, "999999"))
+    write_lines(
+        path,
+        "BRAND_ID|BRAND_DESCR",
+        [f"{brand_id}|{rng.choice(THAI_WORDS)} {brand_id}" for brand_id in BRAND_IDS],
+    )
+    drop.brand_files.append(path)
+
+    path = os.path.join(folder, drop_file_name("CATEGORY", "FULL", start_date, "999999"))
+    write_lines(
+        path,
+        "CLASS|KLART|KSCHG",
+        [f"{category}|026|{rng.choice(THAI_WORDS)}" for category in categories],
+    )
+    drop.category_files.append(path)
+
+    path = os.path.join(folder, drop_file_name("COSTCENTER", "FULL", start_date, "999999"))
+    write_lines(
+        path,
+        "KOKRS|KOSTL|LTXT",
+        [
+            f"KPG|{number:010d}|{rng.choice(THAI_WORDS)}"
+            for number in range(1, 1 + max(10, articles // 100))
+        ],
+    )
+    drop.costcenter_files.append(path)
+    return drop
+
+
+def generate_listing_folder(folder: str, files: int, seed: int = 0) -> str:
+    """
+    Fills folder with the given number of empty, validly named drop files of
+    every module and nature over the past days, for timing the file listing.
+    """
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(seed)
+    modules = ["ARTICLE", "BRAND", "CATEGORY", "COSTCENTER", "COMPANY", "BUSSINESSAREA"]
+    for number in range(files):
+        date = datetime.date(2025, 1, 1) + datetime.timedelta(days=rng.randint(0, 365))
+        nature = "FULL" if rng.random() < 0.05 else "DELTA"
+        time = "999999" if nature == "FULL" else f"{rng.randint(0, 235959):06d}"
+        name = drop_file_name(rng.choice(modules), nature, date, time)
+        open(os.path.join(folder, name.replace("_1_1.", f"_{number}_1.")), "w").close()
+    return folder
+
+
+def generate_count_files(
+    folder: str, pairs: int, mismatch_ratio: float = 0.05, seed: int = 0
+) -> tuple[str, str]:
+    """
+    Writes a count-from-db.csv and count-from-sap.csv pair for compare_counts
+    with pairs rows per channel. mismatch_ratio of the rows differ in count or
+    exist on one side only.
+    """
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(seed)
+    db_file = os.path.join(folder, "count-from-db.csv")
+    sap_file = os.path.join(folder, "count-from-sap.csv")
+    with open(db_file, "w", encoding="utf-8") as db, open(sap_file, "w", encoding="utf-8") as sap:
+        for channel in CHANNEL_CODES:
+            for pair in range(pairs):
+                count = rng.randint(1, 5000)
+                roll = rng.random()
+                if roll < mismatch_ratio / 3:
+                    db.write(f"{channel}|{pair:06d}|{count}\n")
+                elif roll < mismatch_ratio * 2 / 3:
+                    sap.write(f"{channel}|{pair:06d}|{count}\n")
+                else:
+                    db.write(f"{channel}|{pair:06d}|{count}\n")
+                    if roll < mismatch_ratio:
+                        count += rng.randint(1, 10)
+                    sap.write(f"{channel}|{pair:06d}|{count}\n")
+    return db_file, sap_file
+
+
+if __name__ == "__main__":
+    drop = generate_drop("data/benchmark-drop", 10000)
+    print(f"Generated {drop.article_rows} article rows in {drop.folder} ✅")
@@ -1,11 +1,33 @@
 from collections import defaultdict
 import csv
+import heapq
 import json
 import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "script"))
+from abc_normalize import normalize_article_ids, normalize_brand_ids, normalize_category_ids
+from abc_utils import (
+    ColumnReader,
+    get_db_connection,
+    open_source,
+    stage,
+    write_run_report,
+)
+from file_listing import FileType, list_files_in_folder
+
+# --- Reconciliation configuration ---
+SOURCE_FOLDER = "/Users/pakawin_m/workspace/kpc-gwl-category-brand-conf/data/kpg-sap-s3-outbound-prod/"
+DB_NAME = "data/articles.db"
+TABLE_NAME = "articles"
+# The articles table and the raw SAP files carry no channel; the per-channel
+# earn/burn configuration only exists in the TypeScript converter
+RECONCILE_CHANNEL = "ALL"
 
 def read_counts_to_dict(filepath: str) -> dict:
     """
-    Reads a pipe-delimited CSV file into a dictionary.
+    Reads a pipe-delimited CSV file, plain or compressed, into a dictionary.
     The key is a tuple of (channel, pair), and the value is the count.
     Keys are normalized to uppercase to ensure case-insensitive comparison.
     """
@@ -14,7 +36,7 @@ def read_counts_to_dict(filepath: str) -> dict:
         print(f"Error: File not found at {filepath}")
         return counts
 
-    with open(filepath, 'r', newline='', encoding='utf-8') as csvfile:
+    with open_source(filepath, 'r', newline='') as csvfile:
         reader = csv.reader(csvfile, delimiter='|')
         for i, row in enumerate(reader):
             if len(row) == 3:
@@ -77,5 +99,361 @@ def compare_counts(db_file: str, sap_file: str):
     for diff in db_lower_diff:
         print(diff)
 
+# Rows sorted in memory per run of the external sort in streaming mode
+SORT_CHUNK_ROWS = 1_000_000
+# Spilled runs merged at once; more are first merged into one run
+SORT_MERGE_FAN_IN = 128
+# Inputs larger than this together are compared in streaming mode
+STREAMING_MIN_BYTES = 512 * 1024 * 1024
+
+def iter_count_rows(filepath: str):
+    """
+    Yields (key, count) for every valid row of a count file, with the same
+    normalization and warnings as read_counts_to_dict.
+    """
+    if not os.path.exists(filepath):
+        print(f"Error: File not found at {filepath}")
+        return
+
+    with open_source(filepath, 'r', newline='') as csvfile:
+        reader = csv.reader(csvfile, delimiter='|')
+        for i, row in enumerate(reader):
+            if len(row) == 3:
+                channel, pair, count_str = row
+                key = (channel.strip().upper(), pair.strip().upper())
+                try:
+                    yield key, int(count_str.strip())
+                except ValueError:
+                    print(f"Warning: Could not parse count '{count_str}' on line {i+1} in {filepath}. Skipping.")
+            else:
+                print(f"Warning: Malformed row on line {i+1} in {filepath}: {row}. Skipping.")
+
+def flatten_count_row(row) -> tuple:
+    (channel, pair), seq, count = row
+    return channel, pair, seq, count
+
+def parse_count_row(fields: list) -> tuple:
+    channel, pair, seq, count = fields
+    return (channel, pair), int(seq), int(count)
+
+def write_sorted_run(rows: list, tmp_dir: str | None, flatten=flatten_count_row):
+    run = tempfile.TemporaryFile('w+', encoding='utf-8', newline='', dir=tmp_dir)
+    writer = csv.writer(run, delimiter='|', lineterminator='\n')
+    for row in sorted(rows):
+        writer.writerow(flatten(row))
+    run.seek(0)
+    return run
+
+def read_sorted_run(run, parse=parse_count_row):
+    for fields in csv.reader(run, delimiter='|'):
+        yield parse(fields)
+
+def merge_runs(runs: list, tmp_dir: str | None, flatten=flatten_count_row, parse=parse_count_row):
+    """Merges sorted runs into one, closing them, so few files are open at a time."""
+    merged = tempfile.TemporaryFile('w+', encoding='utf-8', newline='', dir=tmp_dir)
+    writer = csv.writer(merged, delimiter='|', lineterminator='\n')
+    for row in heapq.merge(*(read_sorted_run(run, parse) for run in runs)):
+        writer.writerow(flatten(row))
+    for run in runs:
+        run.close()
+    merged.seek(0)
+    return merged
+
+def external_sort(
+    rows,
+    chunk_rows: int = SORT_CHUNK_ROWS,
+    tmp_dir: str | None = None,
+    flatten=flatten_count_row,
+    parse=parse_count_row,
+):
+    """
+    Yields rows in sorted order, holding at most chunk_rows of them in
+    memory. Larger inputs are sorted in runs spilled to temporary files,
+    flatten(row) turning a row into CSV fields and parse(fields) back, and
+    merged.
+    """
+    runs = []
+    chunk = []
+    try:
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_rows:
+                runs.append(write_sorted_run(chunk, tmp_dir, flatten))
+                chunk = []
+                if len(runs) >= SORT_MERGE_FAN_IN:
+                    runs = [merge_runs(runs, tmp_dir, flatten, parse)]
+        if runs:
+            if chunk:
+                runs.append(write_sorted_run(chunk, tmp_dir, flatten))
+                chunk = []
+            yield from heapq.merge(*(read_sorted_run(run, parse) for run in runs))
+        else:
+            chunk.sort()
+            yield from chunk
+    finally:
+        for run in runs:
+            run.close()
+
+def sorted_counts(filepath: str, chunk_rows: int = SORT_CHUNK_ROWS, tmp_dir: str | None = None):
+    """
+    Yields the (key, count) of a count file in key order, holding at most
+    chunk_rows rows in memory, see external_sort. Like read_counts_to_dict,
+    the last row of a duplicated key wins.
+    """
+    rows = (
+        (key, seq, count) for seq, (key, count) in enumerate(iter_count_rows(filepath))
+    )
+    previous = None
+    for key, _, count in external_sort(rows, chunk_rows, tmp_dir):
+        if previous is not None and previous[0] != key:
+            yield previous
+        previous = (key, count)
+    if previous is not None:
+        yield previous
+
+def merge_join(db_rows, sap_rows):
+    """
+    Walks two key-ordered (key, count) streams together and yields
+    (key, db_count, sap_count), with None for the side a key is missing from.
+    """
+    db_next = next(db_rows, None)
+    sap_next = next(sap_rows, None)
+    while db_next is not None or sap_next is not None:
+        if sap_next is None or (db_next is not None and db_next[0] < sap_next[0]):
+            yield db_next[0], db_next[1], None
+            db_next = next(db_rows, None)
+        elif db_next is None or sap_next[0] < db_next[0]:
+            yield sap_next[0], None, sap_next[1]
+            sap_next = next(sap_rows, None)
+        else:
+            yield db_next[0], db_next[1], sap_next[1]
+            db_next = next(db_rows, None)
+            sap_next = next(sap_rows, None)
+
+def compare_counts_streaming(
+    db_file: str,
+    sap_file: str,
+    output=None,
+    chunk_rows: int = SORT_CHUNK_ROWS,
+    tmp_dir: str | None = None,
+):
+    """
+    Same report as compare_counts, in bounded memory: both files are sorted
+    externally and walked once with a merge-join, see compare_count_streams.
+    """
+    output = output or sys.stdout
+    print(f"Comparing '{db_file}' and '{sap_file}'...\n", file=output)
+    compare_count_streams(
+        sorted_counts(db_file, chunk_rows, tmp_dir),
+        sorted_counts(sap_file, chunk_rows, tmp_dir),
+        output,
+        tmp_dir,
+    )
+
+def is_numeric_pair(key) -> bool:
+    """The keys compare_counts reports on: the ones with a numeric pair."""
+    return key[1].isdigit()
+
+def compare_count_streams(
+    db_rows, sap_rows, output=None, tmp_dir: str | None = None, reported=is_numeric_pair
+):
+    """
+    Writes the compare_counts report for two key-ordered (key, count) streams.
+    Each section is written to a temporary file as it is found and copied to
+    output (stdout by default) at the end; only the per-channel sums are kept
+    in memory. Only the keys reported(key) accepts are listed; None lists all.
+    """
+    output = output or sys.stdout
+    reported = reported or (lambda key: True)
+
+    def section():
+        return tempfile.TemporaryFile('w+', encoding='utf-8', dir=tmp_dir)
+
+    with (
+        section() as mismatches,
+        section() as only_in_db,
+        section() as only_in_sap,
+        section() as db_lower,
+    ):
+        mismatches_found = False
+        any_only_in_db = False
+        any_only_in_sap = False
+        diff_count = defaultdict(int)
+        for key, db_count, sap_count in merge_join(iter(db_rows), iter(sap_rows)):
+            if sap_count is None:
+                any_only_in_db = True
+                if reported(key):
+                    only_in_db.write(f"  - Key {key}: Count = {db_count}\n")
+            elif db_count is None:
+                any_only_in_sap = True
+                if reported(key):
+                    only_in_sap.write(f"  - Key {key}: Count = {sap_count}\n")
+            elif db_count != sap_count and reported(key):
+                line = f"  - Key {key}: DB count = {db_count}, SAP count = {sap_count}\n"
+                mismatches.write(line)
+                diff_count[key[0]] += abs(db_count - sap_count)
+                if db_count < sap_count:
+                    db_lower.write(line)
+                mismatches_found = True
+
+        def copy(title: str, lines, found: bool):
+            print(title, file=output)
+            if not found:
+                print("  (None)", file=output)
+            lines.seek(0)
+            for line in lines:
+                output.write(line)
+
+        copy("--- Mismatched Counts (found in both files) ---", mismatches, mismatches_found)
+        copy("\n--- Records Only in DB File ---", only_in_db, any_only_in_db)
+        copy("\n--- Records Only in SAP File ---", only_in_sap, any_only_in_sap)
+        print(f'\nSum diff {json.dumps(dict(diff_count), indent=2, ensure_ascii=False)}', file=output)
+        copy("\n--- Records which DB is lower ---", db_lower, True)
+
+
+def count_db_keys(
+    db_name: str, table_name: str, column: str, channel: str = RECONCILE_CHANNEL
+) -> list:
+    """(channel, value) counts of one column of the imported articles, in key order."""
+    conn = get_db_connection(db_name, profile="interactive-read")
+    try:
+        cursor = conn.execute(
+            f"""
+            SELECT {column}, COUNT(*)
+            FROM {table_name}
+            GROUP BY {column}
+            ORDER BY {column}
+        """
+        )
+        rows = [((channel, value.strip().upper()), count) for value, count in cursor]
+    finally:
+        conn.close()
+    rows.sort()
+    return rows
+
+def count_db_categories(
+    db_name: str, table_name: str, channel: str = RECONCILE_CHANNEL
+) -> list:
+    """
+    (channel, category) counts of the imported articles in key order, from a
+    GROUP BY served by the (category_id, brand_id) index.
+    """
+    return count_db_keys(db_name, table_name, "category_id", channel)
+
+def count_db_brands(db_name: str, table_name: str, channel: str = RECONCILE_CHANNEL) -> list:
+    """(channel, brand) counts of the imported articles, from the brand_id index."""
+    return count_db_keys(db_name, table_name, "brand_id", channel)
+
+def parse_article_row(fields: list) -> tuple:
+    article_id, seq, category_id, brand_id = fields
+    return article_id, int(seq), category_id, brand_id
+
+def iter_sap_articles(source_files: list, chunk_rows: int = 100_000):
+    """
+    Yields (article, seq, category, brand) for every row of the raw article
+    files, seq numbering them in the order given, with the same
+    normalization, brand default and rejects as article-to-db.
+    """
+    seq = 0
+
+    def apply(rows: list):
+        nonlocal seq
+        article_ids, category_ids, brand_ids = zip(*rows)
+        for article_id, category_id, brand_id in zip(
+            normalize_article_ids(article_ids),
+            normalize_category_ids(category_ids),
+            normalize_brand_ids(brand_ids),
+        ):
+            category_id = category_id[:3]
+            if article_id and category_id:
+                yield article_id, seq, category_id, brand_id or "000"
+                seq += 1
+
+    for file_path in source_files:
+        rows = []
+        try:
+            for row in ColumnReader(file_path, ["MATNR", "MATKL", "BRAND_ID"]):
+                rows.append(row)
+                if len(rows) >= chunk_rows:
+                    yield from apply(rows)
+                    rows = []
+        except FileNotFoundError:
+            print(f"Warning: Source file not found, skipping: {file_path}")
+        if rows:
+            yield from apply(rows)
+
+def replay_sap_articles(
+    source_files: list, chunk_rows: int = SORT_CHUNK_ROWS, tmp_dir: str | None = None
+):
+    """
+    Yields the (article, category, brand) the raw article files add up to,
+    in article order: the rows are sorted externally by (article, seq) and
+    the latest row of each article wins. At most chunk_rows rows are held in
+    memory, however many articles the files hold.
+    """
+    previous = None
+    for article_id, _, category_id, brand_id in external_sort(
+        iter_sap_articles(source_files), chunk_rows, tmp_dir, tuple, parse_article_row
+    ):
+        if previous is not None and previous[0] != article_id:
+            yield previous
+        previous = (article_id, category_id, brand_id)
+    if previous is not None:
+        yield previous
+
+def count_sap_categories_and_brands(articles, channel: str = RECONCILE_CHANNEL) -> tuple:
+    """(channel, category) and (channel, brand) counts of replay_sap_articles, in key order."""
+    categories = defaultdict(int)
+    brands = defaultdict(int)
+    for _, category_id, brand_id in articles:
+        categories[category_id] += 1
+        brands[brand_id] += 1
+
+    def keyed(counts: dict) -> list:
+        return sorted(((channel, value.upper()), count) for value, count in counts.items())
+
+    return keyed(categories), keyed(brands)
+
+def reconcile_counts(
+    db_name: str, source_folder: str, table_name: str = TABLE_NAME, output=None
+):
+    """
+    Compares the category and brand counts of the articles table with the
+    ones the raw SAP article files in source_folder add up to, without
+    exported count files. The files are replayed once for both.
+    """
+    output = output or sys.stdout
+    article_files = list_files_in_folder(
+        source_folder, no_filter=True, file_type=FileType.ARTICLE
+    )
+    print(
+        f"Reconciling '{db_name}' with {len(article_files)} article files "
+        f"in '{source_folder}'...\n",
+        file=output,
+    )
+    sap_categories, sap_brands = count_sap_categories_and_brands(
+        replay_sap_articles([f.path for f in article_files])
+    )
+
+    print("=== Categories ===", file=output)
+    compare_count_streams(count_db_categories(db_name, table_name), sap_categories, output)
+    # Brand IDs are not numeric, so every brand key is reported
+    print("\n=== Brands ===", file=output)
+    compare_count_streams(
+        count_db_brands(db_name, table_name), sap_brands, output, reported=None
+    )
+
 if __name__ == "__main__":
-    compare_counts('./count-from-db.csv', './count-from-sap.csv')
\ No newline at end of file
+    db_file, sap_file = './count-from-db.csv', './count-from-sap.csv'
+    if '--reconcile' in sys.argv:
+        # The count files play no part, so they are not sized
+        with stage("compare"):
+            reconcile_counts(DB_NAME, SOURCE_FOLDER)
+    else:
+        sizes = sum(os.path.getsize(f) for f in (db_file, sap_file) if os.path.exists(f))
+        with stage("compare", bytes=sizes):
+            if '--streaming' in sys.argv or sizes >= STREAMING_MIN_BYTES:
+                compare_counts_streaming(db_file, sap_file)
+            else:
+                compare_counts(db_file, sap_file)
+    write_run_report("compare_counts")
\ No newline at end of file
@@ -1,4 +1,6 @@
 import re
+from functools import lru_cache
+from typing import Iterable
 
 
 def normalize_article_id(id_str: str | None) -> str:
@@ -35,3 +37,71 @@ def normalize_text(text: str | None) -> str:
     if text is None:
         return ""
     return text.strip()
+
+
+# Bytes variants used by the raw-record scanners, which match keys without
+# decoding lines. SAP IDs are ASCII, where these agree with the str versions.
+
+
+def normalize_article_id_bytes(raw: bytes) -> bytes:
+    return raw.strip().translate(None, b"-_")
+
+
+def normalize_brand_id_bytes(raw: bytes) -> bytes:
+    return raw.strip().upper()
+
+
+def normalize_category_id_bytes(raw: bytes) -> bytes:
+    return raw.strip().lower().translate(None, b"-_")
+
+
+def normalize_costcenter_id_bytes(raw: bytes) -> bytes:
+    raw = raw.strip()
+    if not raw.isdigit():
+        return b""
+    return raw
+
+
+# Batch variants used by the loaders, which normalize a whole column of a
+# parsed range at once. They return exactly what the single-value functions
+# above return, using translate tables instead of a regex per value.
+
+# Distinct brand/category IDs remembered per process
+ID_CACHE_SIZE = 4096
+
+_DROP_SEPARATORS = str.maketrans("", "", "-_")
+
+
+def normalize_article_ids(values: Iterable[str | None]) -> list[str]:
+    table = _DROP_SEPARATORS
+    return ["" if value is None else str(value).strip().translate(table) for value in values]
+
+
+@lru_cache(maxsize=ID_CACHE_SIZE, typed=True)
+def _cached_brand_id(value) -> str:
+    return str(value).strip().upper()
+
+
+@lru_cache(maxsize=ID_CACHE_SIZE, typed=True)
+def _cached_category_id(value) -> str:
+    return str(value).strip().lower().translate(_DROP_SEPARATORS)
+
+
+def normalize_brand_ids(values: Iterable[str | None]) -> list[str]:
+    cached = _cached_brand_id
+    return ["" if value is None else cached(value) for value in values]
+
+
+def normalize_category_ids(values: Iterable[str | None]) -> list[str]:
+    cached = _cached_category_id
+    return ["" if value is None else cached(value) for value in values]
+
+
+def normalize_costcenter_ids(values: Iterable[str | None]) -> list[str]:
+    stripped = ("" if value is None else value.strip() for value in values)
+    return [value if value.isdigit() else "" for value in stripped]
+
+
+def normalize_texts(values: Iterable[str | None]) -> list[str]:
+    return ["" if value is None else value.strip() for value in values]
+
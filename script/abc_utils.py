@@ -1,19 +1,444 @@
+import bz2
 import datetime
+import gzip
+import hashlib
+import importlib.util
+import io
+import json
+import mmap
+import multiprocessing
 import os
 import sqlite3
-import csv
-from typing import List, Tuple
-from file_listing import FileType, list_files_in_folder
-from abc_normalize import normalize_brand_id, normalize_text
+import sys
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from operator import itemgetter
+from typing import Callable, List, Tuple
+from file_listing import REJECT_FILE_SUFFIX, FileType, strip_compression_suffix
 
+try:
+    import resource
+except ImportError:  # Not available on Windows; peak RSS is then not reported
+    resource = None
 
-def get_db_connection(db_name):
-    """Establishes and returns a connection to the SQLite database."""
+
+# Approximate size of the byte ranges a source file is parsed in
+PARSE_RANGE_BYTES = 8 * 1024 * 1024
+# Bytes of a file applied between two resumable checkpoint commits
+CHECKPOINT_BYTES = 64 * 1024 * 1024
+# Rejected rows printed per file and reason; all of them go to the sidecar
+# reject file. Set ABC_REJECT_SAMPLES=0 to print none.
+REJECT_SAMPLE_LIMIT = int(os.getenv("ABC_REJECT_SAMPLES", "3"))
+# How parse workers are started. Not fork: the sync runs downloads on
+# threads, and forking a process with threads can deadlock the child on a
+# lock one of them held. forkserver where available, spawn elsewhere.
+PARSE_POOL_START_METHOD = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+# Where the sidecar reject files go. Not the source folder: writing there
+# would change its mtime and invalidate the listing manifest every run.
+REJECT_FOLDER = "data/rejects"
+
+
+# Named PRAGMA sets applied by get_db_connection. WAL is used everywhere so
+# readers (find_article, summarize_by_imported_at) never block on an import.
+CONNECTION_PROFILES = {
+    "safe-default": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+    },
+    # One transaction per file; NORMAL only fsyncs the WAL on checkpoint,
+    # which is still crash-safe for the database file itself.
+    "bulk-load": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -256 * 1024,  # KiB, i.e. 256 MB of page cache
+        "mmap_size": 1024 * 1024 * 1024,
+    },
+    "interactive-read": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64 * 1024,
+        "mmap_size": 256 * 1024 * 1024,
+        "query_only": "ON",
+    },
+}
+
+
+# --- Instrumentation ---
+# Per-stage wall time, throughput and peak RSS of a run, written as a JSON
+# report at the end of every __main__. Set ABC_INSTRUMENT=0 to turn it off.
+INSTRUMENTATION_ENABLED = os.getenv("ABC_INSTRUMENT", "1") != "0"
+RUN_REPORT_FOLDER = "data/run-reports"
+# Linux keeps the RSS high-water mark in VmHWM and resets it to the current
+# RSS when "5" is written to clear_refs, which gives every stage its own peak
+PROC_STATUS = "/proc/self/status"
+PROC_CLEAR_REFS = "/proc/self/clear_refs"
+
+
+def peak_rss_mb(children: bool = False) -> float | None:
+    """Peak resident set size of this process, or of its largest finished child."""
+    if resource is None:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def rss_high_water_kb() -> int | None:
+    """
+    The RSS high-water mark of this process in kB: VmHWM since the last
+    reset_rss_high_water where /proc has it, else the process-wide peak.
+    """
+    try:
+        with open(PROC_STATUS, "rb") as f:
+            for line in f:
+                if line.startswith(b"VmHWM:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    peak = peak_rss_mb()
+    return None if peak is None else int(peak * 1024)
+
+
+def reset_rss_high_water() -> bool:
+    """Resets VmHWM to the current RSS. False where that is not supported."""
+    try:
+        with open(PROC_CLEAR_REFS, "w") as f:
+            f.write("5")
+    except OSError:
+        return False
+    return True
+
+
+@dataclass
+class StageTiming:
+    """Totals of one stage over a run."""
+
+    name: str
+    seconds: float = 0.0
+    calls: int = 0
+    rows: int = 0
+    bytes: int = 0
+    # Highest RSS over the passes through the stage in this process
+    peak_rss_mb: float | None = None
+
+    def to_dict(self) -> dict:
+        return {
+            "seconds": round(self.seconds, 6),
+            "calls": self.calls,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "rows_per_s": round(self.rows / self.seconds, 1) if self.seconds else None,
+            "bytes_per_s": round(self.bytes / self.seconds, 1) if self.seconds else None,
+            "peak_rss_mb": self.peak_rss_mb,
+        }
+
+
+class StageTimer:
+    """Times one pass through a stage. rows and bytes may be set inside the block."""
+
+    __slots__ = ("instrumentation", "name", "rows", "bytes", "started_at", "peak_rss_kb")
+
+    def __init__(self, instrumentation, name: str, rows: int = 0, bytes: int = 0):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.rows = rows
+        self.bytes = bytes
+        self.peak_rss_kb = 0
+
+    def __enter__(self):
+        self.instrumentation.enter_stage(self)
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.started_at
+        peak_rss_kb = self.instrumentation.exit_stage(self)
+        self.instrumentation.record(
+            self.name,
+            seconds,
+            self.rows,
+            self.bytes,
+            None if peak_rss_kb is None else round(peak_rss_kb / 1024, 1),
+        )
+
+
+class DisabledStageTimer:
+    """Shared stand-in for StageTimer when instrumentation is off."""
+
+    rows = 0
+    bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+    def __setattr__(self, name, value):
+        pass
+
+
+DISABLED_STAGE_TIMER = DisabledStageTimer()
+
+
+class RunInstrumentation:
+    """Collects the StageTiming of every stage of one run."""
+
+    def __init__(self, enabled: bool = INSTRUMENTATION_ENABLED):
+        self.enabled = enabled
+        self.started_at = datetime.datetime.now()
+        self.started_perf = time.perf_counter()
+        self.stages: dict[str, StageTiming] = {}
+        # Counters of every IngestionSession closed during the run
+        self.sessions: list[dict] = []
+        # Stages may be recorded from the sync thread as well
+        self.lock = threading.Lock()
+        # Timers inside their block, and the process peak folded in before
+        # each high-water reset, in kB
+        self.active_timers: set[StageTimer] = set()
+        self.peak_rss_kb = 0
+
+    def stage(self, name: str, rows: int = 0, bytes: int = 0):
+        if not self.enabled:
+            return DISABLED_STAGE_TIMER
+        return StageTimer(self, name, rows, bytes)
+
+    def fold_rss_high_water(self) -> int | None:
+        """Folds the current high-water mark into the open timers and the process peak."""
+        high_water = rss_high_water_kb()
+        if high_water is not None:
+            self.peak_rss_kb = max(self.peak_rss_kb, high_water)
+            for timer in self.active_timers:
+                timer.peak_rss_kb = max(timer.peak_rss_kb, high_water)
+        return high_water
+
+    def enter_stage(self, timer: StageTimer) -> None:
+        """
+        Starts the RSS high-water mark of a stage afresh. Stages nest and run
+        on the sync thread too, so the mark reached so far is first folded
+        into the stages still open.
+        """
+        with self.lock:
+            self.fold_rss_high_water()
+            reset_rss_high_water()
+            self.active_timers.add(timer)
+
+    def exit_stage(self, timer: StageTimer) -> int | None:
+        """The peak RSS in kB reached while timer was open."""
+        with self.lock:
+            high_water = self.fold_rss_high_water()
+            self.active_timers.discard(timer)
+        return None if high_water is None else timer.peak_rss_kb
+
+    def record(
+        self,
+        name: str,
+        seconds: float,
+        rows: int = 0,
+        bytes: int = 0,
+        peak_rss_mb: float | None = None,
+    ) -> None:
+        """Adds a pass timed elsewhere, e.g. in a parse worker, to a stage."""
+        if not self.enabled:
+            return
+        with self.lock:
+            timing = self.stages.get(name)
+            if timing is None:
+                timing = self.stages[name] = StageTiming(name)
+            timing.seconds += seconds
+            timing.calls += 1
+            timing.rows += rows
+            timing.bytes += bytes
+            if peak_rss_mb is not None:
+                timing.peak_rss_mb = max(timing.peak_rss_mb or 0.0, peak_rss_mb)
+
+    def record_session(self, session: dict) -> None:
+        """Adds the counters of a closed IngestionSession to the run report."""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.sessions.append(session)
+
+    def process_peak_rss_mb(self) -> float | None:
+        """
+        Peak RSS of the whole run. The stage resets lower VmHWM (and with it
+        ru_maxrss), so the marks folded in before each reset count too.
+        """
+        with self.lock:
+            high_water = self.fold_rss_high_water()
+        if high_water is None:
+            return None
+        return round(self.peak_rss_kb / 1024, 1)
+
+    def report(self, script_name: str) -> dict:
+        return {
+            "script": script_name,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "finished_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "wall_seconds": round(time.perf_counter() - self.started_perf, 6),
+            "peak_rss_mb": self.process_peak_rss_mb(),
+            "peak_worker_rss_mb": peak_rss_mb(children=True),
+            "stages": {name: timing.to_dict() for name, timing in self.stages.items()},
+            "sessions": self.sessions,
+        }
+
+    def write_report(self, script_name: str, folder: str = RUN_REPORT_FOLDER) -> str | None:
+        """Prints the stage table and writes the JSON run report. Returns its path."""
+        if not self.enabled:
+            return None
+        report = self.report(script_name)
+        print()
+        print("Run Stages:")
+        print("-------------------------------------------------------")
+        print("Stage       |    Seconds |       Rows/s |         MB/s")
+        print("-------------------------------------------------------")
+        for name, timing in report["stages"].items():
+            rows_per_s = f"{timing['rows_per_s']:12.0f}" if timing["rows"] else f"{'-':>12}"
+            mb_per_s = (
+                f"{timing['bytes_per_s'] / (1024 * 1024):12.1f}"
+                if timing["bytes"]
+                else f"{'-':>12}"
+            )
+            print(f"{name:<11} | {timing['seconds']:10.3f} | {rows_per_s} | {mb_per_s}")
+        print("-------------------------------------------------------")
+        print(f"Wall time {report['wall_seconds']:.3f}s, peak RSS {report['peak_rss_mb']} MB")
+
+        os.makedirs(folder, exist_ok=True)
+        stamp = self.started_at.strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(folder, f"{script_name}_{stamp}.json")
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+        except OSError as e:
+            print(f"Warning: could not write the run report {path}: {e}")
+            return None
+        print(f"Run report written to {path} 📝")
+        return path
+
+
+# The instrumentation of the running script
+INSTRUMENTATION = RunInstrumentation()
+
+
+def stage(name: str, rows: int = 0, bytes: int = 0):
+    """
+    Times a block as a stage of the current run:
+
+        with stage("listing"):
+            ...
+        with stage("raw_export") as timer:
+            timer.rows = written
+    """
+    return INSTRUMENTATION.stage(name, rows, bytes)
+
+
+def write_run_report(script_name: str) -> str | None:
+    return INSTRUMENTATION.write_report(script_name)
+
+
+# Script name of each module loaded by import_script, by module name
+IMPORTED_SCRIPTS: dict[str, str] = {}
+
+
+def import_script(name: str):
+    """
+    Imports a hyphenated script of script/ (e.g. "article-to-db") as a module.
+    It is registered in sys.modules so parse workers can unpickle its functions,
+    see open_parse_pool.
+    """
+    module_name = name.replace("-", "_")
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(
+        module_name, os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{name}.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    IMPORTED_SCRIPTS[module_name] = name
+    spec.loader.exec_module(module)
+    return module
+
+
+def is_compressed(file_path) -> bool:
+    return strip_compression_suffix(str(file_path)) != str(file_path)
+
+
+def open_source(file_path, mode: str = "rb", encoding: str = "utf-8", newline=None):
+    """Opens a plain or compressed (.gz, .bz2, .zst) source file as a stream.
+
+    Compressed files are decompressed on the fly, never into a temp file.
+    Reading .zst files requires the optional 'zstandard' package.
+
+    Args:
+        file_path: The file to open
+        mode: "rb" for a binary stream, "r" or "rt" for text
+    """
+    binary = "b" in mode
+    suffix = str(file_path).lower().rsplit(".", 1)[-1]
+    if suffix == "gz":
+        stream = gzip.open(file_path, "rb")
+    elif suffix == "bz2":
+        stream = bz2.open(file_path, "rb")
+    elif suffix == "zst":
+        import zstandard
+
+        raw = open(file_path, "rb")
+        stream = io.BufferedReader(
+            zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        )
+    elif binary:
+        return open(file_path, "rb")
+    else:
+        return open(file_path, "r", encoding=encoding, newline=newline)
+
+    if binary:
+        return stream
+    return io.TextIOWrapper(stream, encoding=encoding, newline=newline)
+
+
+def get_db_connection(db_name, profile: str = "safe-default"):
+    """Establishes and returns a connection to the SQLite database.
+
+    Args:
+        db_name: Name of the SQLite database file
+        profile: Key of CONNECTION_PROFILES whose PRAGMAs are applied
+    """
     conn = sqlite3.connect(db_name)
     conn.row_factory = sqlite3.Row
+    for pragma, value in CONNECTION_PROFILES[profile].items():
+        conn.execute(f"PRAGMA {pragma}={value}")
     return conn
 
 
+# Columns of the imported logs ledger besides file_path; older ledgers only
+# had file_path and are migrated in place
+IMPORTED_LOG_COLUMNS = {
+    "size": "INTEGER",
+    "mtime_ns": "INTEGER",
+    "content_hash": "TEXT",
+    "row_count": "INTEGER",
+    "reject_count": "INTEGER",
+    "duration": "REAL",
+    "logged_at": "TEXT",
+}
+
+
+@dataclass
+class FileFingerprint:
+    """Stat and content identity of a source file as recorded in the ledger."""
+
+    size: int
+    mtime_ns: int
+    content_hash: str | None = None
+
+
 def create_imported_logs(db_name: str, table_name: str):
     """Creates the '{table_name}' table if it doesn't already exist."""
     conn = get_db_connection(db_name)
@@ -24,6 +449,27 @@ def create_imported_logs(db_name: str, table_name: str):
                 CREATE TABLE IF NOT EXISTS {table_name} (file_path TEXT PRIMARY KEY)
             """
             )
+            existing = {row["name"] for row in conn.execute(f"PRAGMA table_info({table_name})")}
+            for column, column_type in IMPORTED_LOG_COLUMNS.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE {table_name} ADD COLUMN {column} {column_type}")
+            conn.execute(
+                f"""
+                CREATE INDEX IF NOT EXISTS {table_name}_content_hash_idx
+                ON {table_name} (content_hash)
+            """
+            )
+            conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {table_name}_checkpoints (
+                    file_path TEXT PRIMARY KEY,
+                    content_hash TEXT NOT NULL,
+                    byte_offset INTEGER NOT NULL,
+                    row_count INTEGER NOT NULL,
+                    reject_count INTEGER NOT NULL
+                )
+            """
+            )
         print(f"Table '{table_name}' is ready. ✅")
         return True
     except sqlite3.Error as e:
@@ -32,33 +478,109 @@ def create_imported_logs(db_name: str, table_name: str):
         conn.close()
 
 
-def insert_imported_logs_if_not_exists(db_name: str, table_name: str, file_path: str):
-    """Inserts a file path into the imported logs table if it doesn't already exist.
+def hash_file(file_path: str) -> str:
+    """Returns a BLAKE2b digest of the raw (possibly compressed) file content."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as infile:
+        while chunk := infile.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
 
-    Args:
-        table_name: Name of the imported logs table
-        file_path: Path of the file to log
+
+def fingerprint_file(file_path: str) -> FileFingerprint:
+    stat = os.stat(file_path)
+    return FileFingerprint(stat.st_size, stat.st_mtime_ns, hash_file(file_path))
+
+
+def check_imported_log(
+    conn: sqlite3.Connection, table_name: str, file_path: str
+) -> FileFingerprint | None:
+    """Decides whether a source file still has to be imported.
+
+    A file whose path, size and mtime match the ledger is skipped without
+    reading it. Otherwise its content is hashed: content already in the
+    ledger (a re-delivered or touched file) is recorded under this path and
+    skipped. Rows left by the path-only ledger are trusted and get their
+    stat filled in.
 
     Returns:
-        bool: True if inserted successfully, False if already exists or error occurs
+        FileFingerprint: The fingerprint to record once the file is imported,
+                         or None if the file must be skipped.
     """
-    conn = get_db_connection(db_name)
-    try:
-        with conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                f"""
-                INSERT OR IGNORE INTO {table_name} (file_path)
-                VALUES (?)
-            """,
-                (file_path,),
-            )
-            return cursor.rowcount > 0
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        return False
-    finally:
-        conn.close()
+    stat = os.stat(file_path)
+    fingerprint = FileFingerprint(stat.st_size, stat.st_mtime_ns)
+    row = conn.execute(
+        f"SELECT size, mtime_ns, content_hash FROM {table_name} WHERE file_path = ?",
+        (str(file_path),),
+    ).fetchone()
+    if row is not None and row["size"] is None:
+        conn.execute(
+            f"UPDATE {table_name} SET size = ?, mtime_ns = ? WHERE file_path = ?",
+            (fingerprint.size, fingerprint.mtime_ns, str(file_path)),
+        )
+        return None
+    if row is not None and (row["size"], row["mtime_ns"]) == (
+        fingerprint.size,
+        fingerprint.mtime_ns,
+    ):
+        return None
+
+    fingerprint.content_hash = hash_file(file_path)
+    duplicate = conn.execute(
+        f"SELECT file_path FROM {table_name} WHERE content_hash = ? LIMIT 1",
+        (fingerprint.content_hash,),
+    ).fetchone()
+    if duplicate is not None:
+        conn.execute(
+            f"""
+            INSERT INTO {table_name} (file_path, size, mtime_ns, content_hash, logged_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(file_path) DO UPDATE SET
+                size=excluded.size,
+                mtime_ns=excluded.mtime_ns,
+                logged_at=excluded.logged_at
+        """,
+            (
+                str(file_path),
+                fingerprint.size,
+                fingerprint.mtime_ns,
+                fingerprint.content_hash,
+                datetime.datetime.now().isoformat(),
+            ),
+        )
+        if duplicate["file_path"] != str(file_path):
+            print(f"Skipping {file_path}: same content as {duplicate['file_path']}")
+        return None
+    return fingerprint
+
+
+def record_imported_log(
+    conn: sqlite3.Connection,
+    table_name: str,
+    file_path: str,
+    fingerprint: FileFingerprint,
+    row_count: int,
+    reject_count: int,
+    duration: float,
+):
+    """Marks a file as imported. Must run in the same transaction as its data."""
+    conn.execute(
+        f"""
+        INSERT OR REPLACE INTO {table_name}
+            (file_path, size, mtime_ns, content_hash, row_count, reject_count, duration, logged_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """,
+        (
+            str(file_path),
+            fingerprint.size,
+            fingerprint.mtime_ns,
+            fingerprint.content_hash,
+            row_count,
+            reject_count,
+            duration,
+            datetime.datetime.now().isoformat(),
+        ),
+    )
 
 
 def summarize_by_imported_at(db_name: str, table_name: str) -> None:
@@ -68,9 +590,9 @@ def summarize_by_imported_at(db_name: str, table_name: str) -> None:
         db_name: Name of the SQLite database file
         table_name: Name of the table to summarize
     """
-    conn = get_db_connection(db_name)
+    conn = get_db_connection(db_name, profile="interactive-read")
     try:
-        with conn:
+        with conn, stage("summary"):
             cursor = conn.cursor()
             cursor.execute(
                 f"""
@@ -95,14 +617,1084 @@ def summarize_by_imported_at(db_name: str, table_name: str) -> None:
         conn.close()
 
 
-def sync_s3():
-    """Syncs files with S3 using AWS CLI"""
+class MissingColumnError(Exception):
+    """Raised when a source file header lacks a column a loader requires."""
+
+
+def resolve_column_indexes(
+    header_line: str, columns: list[str], file_path: str = "", delimiter: str = "|"
+) -> list[int]:
+    """Resolves the position of each required column from a header line.
+
+    Raises:
+        MissingColumnError: If any of the columns is not in the header.
+    """
+    header = header_line.lstrip("\ufeff").rstrip("\r\n").split(delimiter)
+    positions = {name.strip(): i for i, name in enumerate(header)}
+    missing = [column for column in columns if column not in positions]
+    if missing:
+        raise MissingColumnError(
+            f"Missing required column(s) {', '.join(missing)} in header of '{file_path}': {header}"
+        )
+    return [positions[column] for column in columns]
+
+
+class ColumnReader:
+    """
+    Reads a pipe-delimited SAP file and yields a tuple of only the requested
+    columns for every row, using positions resolved once from the header.
+
+    Lines are split on the delimiter without quote handling, the same way
+    the SAP outbound files are produced and read by the TypeScript converter.
+    Rows too short to hold every requested column are padded with empty
+    fields, like csv.DictReader fills missing trailing fields, so a row
+    without a trailing BRAND_ID still gets the loaders' default; short_rows
+    counts them. Blank lines are skipped.
+
+    Args:
+        file_path: The file to read
+        columns: Header names of the fields to yield, in order
+        delimiter: Field delimiter of the file
+        start: Byte offset of the first line to read; the header is always
+               read for column positions
+        end: Byte offset to stop at, None for the end of the file. Compressed
+             files are always read as a whole, see split_byte_ranges
+
+    While a row is being consumed, raw_line holds its raw bytes and
+    line_offset and line_length their byte range in the file.
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        columns: list[str],
+        delimiter: str = "|",
+        start: int = 0,
+        end: int | None = None,
+    ):
+        self.file_path = file_path
+        self.columns = columns
+        self.delimiter = delimiter
+        self.start = start
+        self.end = end
+        self.header_line = ""
+        self.raw_line = b""
+        self.line_offset = 0
+        self.line_length = 0
+        self.row_count = 0
+        self.short_rows = 0
+
+    def __iter__(self):
+        with open_source(self.file_path) as infile:
+            self.header_line = infile.readline().decode("utf-8")
+            if not self.header_line:
+                return
+            indexes = resolve_column_indexes(
+                self.header_line, self.columns, str(self.file_path), self.delimiter
+            )
+            width = max(indexes) + 1
+            delimiter = self.delimiter
+            if len(indexes) > 1:
+                pick = itemgetter(*indexes)
+            else:
+                pick = lambda fields, i=indexes[0]: (fields[i],)
+
+            position = infile.tell()
+            if self.start > position:
+                position = infile.seek(self.start)
+            end = self.end
+            for raw_line in infile:
+                if end is not None and position >= end:
+                    break
+                self.line_offset = position
+                position += len(raw_line)
+                line = raw_line.decode("utf-8")
+                fields = line.rstrip("\r\n").split(delimiter)
+                if len(fields) < width:
+                    if not line.strip():
+                        continue
+                    fields += [""] * (width - len(fields))
+                    self.short_rows += 1
+                self.row_count += 1
+                self.raw_line = raw_line
+                self.line_length = len(raw_line)
+                yield pick(fields)
+
+
+def split_byte_ranges(
+    file_path: str, range_bytes: int, start: int = 0
+) -> list[tuple[int, int | None]]:
+    """Splits a file after its header, or from a line-aligned start offset,
+    into line-aligned (start, end) byte ranges.
+
+    A compressed file cannot be seeked into, so it is one open range and is
+    parsed as a single batch. A missing file also yields one open range, so
+    the parser reports it like any other read error.
+    """
+    if is_compressed(file_path):
+        return [(0, None)]
+    try:
+        size = os.path.getsize(file_path)
+        with open(file_path, mode="rb") as infile:
+            infile.readline()
+            position = max(infile.tell(), start)
+            ranges = []
+            while position < size:
+                infile.seek(position + range_bytes)
+                infile.readline()
+                end = min(infile.tell(), size)
+                ranges.append((position, end))
+                position = end
+    except FileNotFoundError:
+        return [(0, None)]
+    return ranges or [(position, size)]
+
+
+@dataclass
+class ParsedBatch:
+    """Normalized rows parsed from one byte range of a source file."""
+
+    file_path: str
+    start: int
+    end: int | None
+    rows: list = field(default_factory=list)
+    # (reason, raw line) of every rejected row
+    skipped: list = field(default_factory=list)
+    positions: list = field(default_factory=list)
+    # Rows padded with empty trailing fields, see ColumnReader
+    short_rows: int = 0
+    error: str = ""
+    first: bool = True
+    last: bool = True
+    # Worker time spent reading the rows and normalizing them
+    parse_seconds: float = 0.0
+    normalize_seconds: float = 0.0
+
+
+@dataclass
+class FileLoadStats:
+    """Totals the single writer accumulates over the batches of one file."""
+
+    file_path: str
+    started_at: float = field(default_factory=time.perf_counter)
+    row_count: int = 0
+    reject_count: int = 0
+    failed: bool = False
+    checkpoint_offset: int = 0
+    # Size of the file as fingerprinted, the end of its last byte range
+    size: int = 0
+
+    def add(self, batch: ParsedBatch):
+        self.row_count += len(batch.rows)
+        self.reject_count += len(batch.skipped)
+        self.failed = self.failed or bool(batch.error)
+        if INSTRUMENTATION.enabled:
+            end = batch.end if batch.end is not None else max(self.size, batch.start)
+            rows = len(batch.rows) + len(batch.skipped)
+            INSTRUMENTATION.record("parse", batch.parse_seconds, rows, end - batch.start)
+            INSTRUMENTATION.record("normalize", batch.normalize_seconds, rows)
+
+    def checkpoint_due(self, batch: ParsedBatch) -> bool:
+        """True once CHECKPOINT_BYTES have been applied since the last checkpoint."""
+        if batch.end is None or self.failed:
+            return False
+        return batch.end - self.checkpoint_offset >= CHECKPOINT_BYTES
+
+    @property
+    def duration(self) -> float:
+        return time.perf_counter() - self.started_at
+
+
+def missing_reason(columns: tuple, values: tuple) -> str | None:
+    """The reject reason of the first empty value, named after its column."""
+    for column, value in zip(columns, values):
+        if not value:
+            return f"missing {column}"
+    return None
+
+
+def reject_file_path(file_path: str) -> str:
+    """The sidecar reject file of a source file in REJECT_FOLDER, named after it uncompressed."""
+    file_name = os.path.basename(strip_compression_suffix(str(file_path)))
+    return os.path.join(REJECT_FOLDER, file_name + REJECT_FILE_SUFFIX)
+
+
+class RejectLog:
+    """
+    Counts the rejected rows of a run by file and reason and writes them to
+    a buffered sidecar reject file per source file, in REJECT_FOLDER.
+
+    A sidecar holds the source header prefixed with REJECT_REASON, then one
+    "reason|raw line" per rejected row. It is only created for files with
+    rejects; a stale one from an earlier import of the file is removed.
+    Only sample_limit rows per file and reason are printed. Short rows the
+    ColumnReader padded are not rejected but counted here as well, and
+    reported when their file ends.
+    """
+
+    def __init__(self, sample_limit: int = REJECT_SAMPLE_LIMIT):
+        self.sample_limit = sample_limit
+        self.counts: dict[str, Counter] = {}
+        self.short_rows: Counter = Counter()
+        self.sidecars = {}
+        self.header_lines = {}
+
+    def start_file(self, file_path: str, resume: bool = False) -> None:
+        """Starts counting a file; a resumed file appends to its sidecar."""
+        self.counts[file_path] = Counter()
+        self.short_rows[file_path] = 0
+        if not resume and os.path.exists(reject_file_path(file_path)):
+            os.remove(reject_file_path(file_path))
+
+    def add(self, batch: ParsedBatch) -> None:
+        self.short_rows[batch.file_path] += batch.short_rows
+        if not batch.skipped:
+            return
+        counts = self.counts.setdefault(batch.file_path, Counter())
+        sidecar = self.sidecars.get(batch.file_path) or self.open_sidecar(batch.file_path)
+        for reason, raw_line in batch.skipped:
+            counts[reason] += 1
+            if counts[reason] <= self.sample_limit:
+                line = raw_line.decode("utf-8", "replace").rstrip()
+                print(f"Rejected row ({reason}): {line}")
+            sidecar.write(reason.encode("utf-8") + b"|" + raw_line)
+            if not raw_line.endswith(b"\n"):
+                sidecar.write(b"\n")
+
+    def open_sidecar(self, file_path: str):
+        path = reject_file_path(file_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_header = not os.path.exists(path)
+        sidecar = self.sidecars[file_path] = open(path, "ab", buffering=1024 * 1024)
+        if write_header:
+            with open_source(file_path) as infile:
+                sidecar.write(b"REJECT_REASON|" + infile.readline())
+        return sidecar
+
+    def flush(self, file_path: str) -> None:
+        """Flushes a sidecar along with a checkpoint commit of its file."""
+        if file_path in self.sidecars:
+            self.sidecars[file_path].flush()
+
+    def end_file(self, file_path: str) -> None:
+        sidecar = self.sidecars.pop(file_path, None)
+        if sidecar:
+            sidecar.close()
+        if self.short_rows[file_path]:
+            print(
+                f"Padded {self.short_rows[file_path]} short rows of {file_path} "
+                f"with empty fields ⚠️"
+            )
+
+    def close(self) -> None:
+        for file_path in list(self.sidecars):
+            self.end_file(file_path)
+
+    def print_summary(self) -> None:
+        rejected = {path: counts for path, counts in self.counts.items() if counts}
+        padded = {path: count for path, count in self.short_rows.items() if count}
+        if not rejected and not padded:
+            return
+        print()
+        print("Rejected Rows:")
+        print("-----------------------")
+        for file_path in dict.fromkeys([*rejected, *padded]):
+            if file_path in rejected:
+                print(f"{file_path} -> {reject_file_path(file_path)}")
+                for reason, count in rejected[file_path].most_common():
+                    print(f"  {reason:<20} | {count:10d}")
+            else:
+                print(file_path)
+            if file_path in padded:
+                print(f"  {'padded short rows':<20} | {padded[file_path]:10d}")
+        print("-----------------------")
+
+
+def load_checkpoint(
+    conn: sqlite3.Connection, table_name: str, file_path: str, fingerprint: FileFingerprint
+) -> FileLoadStats | None:
+    """Returns the progress of a partly imported file to resume from.
+
+    A checkpoint left by different content (the file was replaced) is dropped.
+    """
+    row = conn.execute(
+        f"SELECT * FROM {table_name}_checkpoints WHERE file_path = ?",
+        (str(file_path),),
+    ).fetchone()
+    if row is None:
+        return None
+    if row["content_hash"] != fingerprint.content_hash:
+        clear_checkpoint(conn, table_name, file_path)
+        return None
+    return FileLoadStats(
+        str(file_path),
+        row_count=row["row_count"],
+        reject_count=row["reject_count"],
+        checkpoint_offset=row["byte_offset"],
+        size=fingerprint.size,
+    )
+
+
+def save_checkpoint(
+    conn: sqlite3.Connection,
+    table_name: str,
+    fingerprint: FileFingerprint,
+    stats: FileLoadStats,
+    byte_offset: int,
+):
+    """Records how far a file has been applied. Must run in the same transaction as its data."""
+    stats.checkpoint_offset = byte_offset
+    conn.execute(
+        f"""
+        INSERT OR REPLACE INTO {table_name}_checkpoints
+            (file_path, content_hash, byte_offset, row_count, reject_count)
+        VALUES (?, ?, ?, ?, ?)
+    """,
+        (
+            stats.file_path,
+            fingerprint.content_hash,
+            byte_offset,
+            stats.row_count,
+            stats.reject_count,
+        ),
+    )
+
+
+def clear_checkpoint(conn: sqlite3.Connection, table_name: str, file_path: str):
+    conn.execute(
+        f"DELETE FROM {table_name}_checkpoints WHERE file_path = ?", (str(file_path),)
+    )
+
+
+def open_parse_pool(parse_batch: Callable, workers: int) -> ProcessPoolExecutor:
+    """
+    Opens a process pool to run parse_batch in, its workers started with
+    PARSE_POOL_START_METHOD. A function of a script loaded with import_script
+    is pickled under a module name only this process has registered; the
+    workers start fresh, so each one imports the script first.
+    """
+    mp_context = multiprocessing.get_context(PARSE_POOL_START_METHOD)
+    script = IMPORTED_SCRIPTS.get(parse_batch.__module__)
+    if script is None:
+        return ProcessPoolExecutor(max_workers=workers, mp_context=mp_context)
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=mp_context,
+        initializer=import_script,
+        initargs=(script,),
+    )
+
+
+@contextmanager
+def shared_parse_pool(parse_batch: Callable, workers: int):
+    """
+    A parse pool to pass to every parse_files_in_parallel call of a load, so
+    the workers start once rather than once per batch of files handed out by
+    the sync. Yields None when parsing in-process.
+    """
+    if workers <= 1:
+        yield None
+        return
+    with open_parse_pool(parse_batch, workers) as pool:
+        yield pool
+
+
+def parse_files_in_parallel(
+    file_paths: list[str],
+    parse_batch: Callable[[str, int, int | None], ParsedBatch],
+    workers: int,
+    range_bytes: int = PARSE_RANGE_BYTES,
+    start_offsets: dict[str, int] | None = None,
+    pool: ProcessPoolExecutor | None = None,
+):
+    """
+    Parses files in byte ranges and yields the batches in file order, then
+    byte order, so a single writer can apply them as if read sequentially.
+
+    With more than one worker the ranges are parsed in a process pool, at
+    most workers + 2 of them ahead of the writer to bound memory.
+
+    Args:
+        file_paths: Files to parse, already in the order they must be applied
+        parse_batch: Top-level function (picklable) parsing one byte range
+        workers: Number of worker processes; 1 or less parses in-process
+        range_bytes: Approximate size of one byte range
+        start_offsets: Byte offset to resume each file from, by file path
+        pool: A pool from shared_parse_pool to use instead of opening one
+    """
+    start_offsets = start_offsets or {}
+    tasks = []
+    for file_path in file_paths:
+        ranges = split_byte_ranges(
+            file_path, range_bytes, start_offsets.get(str(file_path), 0)
+        )
+        for i, (start, end) in enumerate(ranges):
+            tasks.append((str(file_path), start, end, i == 0, i == len(ranges) - 1))
+
+    if workers <= 1:
+        for file_path, start, end, first, last in tasks:
+            batch = parse_batch(file_path, start, end)
+            batch.first, batch.last = first, last
+            yield batch
+        return
+
+    def collect(entry) -> ParsedBatch:
+        future, first, last = entry
+        batch = future.result()
+        batch.first, batch.last = first, last
+        return batch
+
+    with ExitStack() as stack:
+        if pool is None:
+            pool = stack.enter_context(open_parse_pool(parse_batch, workers))
+        pending = deque()
+        for file_path, start, end, first, last in tasks:
+            pending.append((pool.submit(parse_batch, file_path, start, end), first, last))
+            if len(pending) >= workers + 2:
+                yield collect(pending.popleft())
+        while pending:
+            yield collect(pending.popleft())
+
+
+def create_secondary_indexes(
+    conn: sqlite3.Connection, table_name: str, indexes: dict[str, tuple]
+) -> list[str]:
+    """
+    Creates the missing secondary indexes of a table, named
+    {table_name}_{name}, and runs ANALYZE when any was built so the planner
+    picks them up.
+
+    Args:
+        indexes: Index name suffix to the indexed columns
+
+    Returns:
+        list: Names of the indexes built
+    """
+    existing = {
+        row[0]
+        for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?",
+            (table_name,),
+        )
+    }
+    built = []
+    for name, columns in indexes.items():
+        index_name = f"{table_name}_{name}"
+        if index_name in existing:
+            continue
+        conn.execute(f"CREATE INDEX {index_name} ON {table_name} ({', '.join(columns)})")
+        built.append(index_name)
+    if built:
+        conn.execute(f"ANALYZE {table_name}")
+    return built
+
+
+def drop_secondary_indexes(conn: sqlite3.Connection, table_name: str, indexes: dict[str, tuple]):
+    for name in indexes:
+        conn.execute(f"DROP INDEX IF EXISTS {table_name}_{name}")
+
+
+@contextmanager
+def deferred_secondary_indexes(
+    session: "IngestionSession", table_name: str, indexes: dict[str, tuple], defer: bool = True
+):
+    """
+    Drops the secondary indexes of a table for a large backfill on the
+    session connection, and builds them again afterwards in one pass each,
+    followed by ANALYZE. Rows the block did not commit are rolled back
+    before the rebuild. With defer False the indexes are kept and maintained
+    row by row.
+    """
+    if not defer:
+        yield
+        return
+    drop_secondary_indexes(session.conn, table_name, indexes)
+    session.commit()
+    print(f"Deferred {len(indexes)} secondary indexes on '{table_name}' for the backfill.")
+    try:
+        yield
+    except BaseException:
+        session.rollback()
+        raise
+    finally:
+        with stage("index_build"):
+            built = create_secondary_indexes(session.conn, table_name, indexes)
+            session.commit()
+        print(f"Rebuilt {len(built)} secondary indexes on '{table_name}' and analyzed it. ✅")
+
+
+# Authorizer actions that write (schema changes write sqlite_master) or
+# change the connection; allowed on the temp database only
+TEMP_ONLY_ACTIONS = {
+    sqlite3.SQLITE_INSERT,
+    sqlite3.SQLITE_UPDATE,
+    sqlite3.SQLITE_DELETE,
+    sqlite3.SQLITE_ANALYZE,
+    sqlite3.SQLITE_REINDEX,
+    sqlite3.SQLITE_ATTACH,
+    sqlite3.SQLITE_DETACH,
+    sqlite3.SQLITE_PRAGMA,
+    sqlite3.SQLITE_CREATE_VTABLE,
+    sqlite3.SQLITE_DROP_VTABLE,
+}
+
+
+def temp_only_authorizer(action: int, arg1, arg2, db_name, trigger) -> int:
+    """An authorizer callback denying every write outside the temp database."""
+    if action in TEMP_ONLY_ACTIONS and db_name != "temp":
+        return sqlite3.SQLITE_DENY
+    return sqlite3.SQLITE_OK
+
+
+@contextmanager
+def temp_lookup_table(conn: sqlite3.Connection, name: str, columns: tuple, rows):
+    """
+    Bulk-loads lookup keys into an indexed TEMP table, so a key list of any
+    size is resolved with one join instead of chunks of bound parameters.
+    Yields the qualified table name; the table is dropped afterwards.
+
+    Only the temp schema is written. On a query_only connection, such as the
+    interactive-read profile, query_only is lifted while the table exists
+    and temp_only_authorizer denies any write outside temp meanwhile, so
+    the connection stays read-only for every other database. The helper
+    commits the transaction it opened itself; a transaction the caller
+    already had open is left to the caller.
+
+    Args:
+        columns: Key column names; the key is their PRIMARY KEY, duplicates
+                 are ignored
+        rows: Iterable of key tuples, consumed once
+    """
+    started_transaction = not conn.in_transaction
+    query_only = conn.execute("PRAGMA query_only").fetchone()[0]
+    if query_only:
+        conn.execute("PRAGMA query_only = OFF")
+        conn.set_authorizer(temp_only_authorizer)
+    column_list = ", ".join(columns)
+    try:
+        conn.execute(f"DROP TABLE IF EXISTS temp.{name}")
+        conn.execute(
+            f"""
+            CREATE TEMP TABLE {name} (
+                {", ".join(f"{column} TEXT NOT NULL" for column in columns)},
+                PRIMARY KEY ({column_list})
+            ) WITHOUT ROWID
+        """
+        )
+        conn.executemany(
+            f"INSERT OR IGNORE INTO temp.{name} ({column_list}) "
+            f"VALUES ({', '.join('?' for _ in columns)})",
+            rows,
+        )
+        yield f"temp.{name}"
+    finally:
+        try:
+            conn.execute(f"DROP TABLE IF EXISTS temp.{name}")
+        finally:
+            if query_only:
+                conn.set_authorizer(None)
+                conn.execute("PRAGMA query_only = ON")
+        if started_transaction and conn.in_transaction:
+            conn.commit()
+
+
+def create_raw_line_index(conn: sqlite3.Connection, table_name: str):
+    """Creates the tables mapping each normalized key of '{table_name}' to
+    the source file, byte offset and length of its newest raw line."""
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {table_name}_raw_files (
+            file_id INTEGER PRIMARY KEY,
+            file_path TEXT NOT NULL UNIQUE
+        )
+    """
+    )
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {table_name}_raw_index (
+            key TEXT PRIMARY KEY,
+            file_id INTEGER NOT NULL,
+            byte_offset INTEGER NOT NULL,
+            length INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """
+    )
+
+
+def record_raw_lines(
+    conn: sqlite3.Connection,
+    table_name: str,
+    file_path: str,
+    positions: List[Tuple[str, int, int]],
+):
+    """Points the raw line index at the given (key, byte_offset, length) lines of a file.
+
+    Called in file order by the single writer, so the newest line of a key wins.
+    Compressed files are not indexed, since their lines cannot be pread.
+    """
+    if not positions or is_compressed(file_path):
+        return
+    conn.execute(
+        f"INSERT OR IGNORE INTO {table_name}_raw_files (file_path) VALUES (?)",
+        (str(file_path),),
+    )
+    file_id = conn.execute(
+        f"SELECT file_id FROM {table_name}_raw_files WHERE file_path = ?",
+        (str(file_path),),
+    ).fetchone()[0]
+    conn.executemany(
+        f"""
+        INSERT INTO {table_name}_raw_index (key, file_id, byte_offset, length)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(key) DO UPDATE SET
+            file_id=excluded.file_id,
+            byte_offset=excluded.byte_offset,
+            length=excluded.length
+    """,
+        [(key, file_id, offset, length) for key, offset, length in positions],
+    )
+
+
+def copy_indexed_raw_lines(
+    conn: sqlite3.Connection,
+    table_name: str,
+    keys: set[str],
+    source_files: list[str],
+    outfile,
+    key_column: str,
+    normalize: Callable[[bytes], bytes],
+    header_written: bool = False,
+) -> Tuple[int, bool]:
+    """
+    Copies the raw lines of the given keys to the binary outfile by reading
+    only their indexed byte ranges with os.pread.
+
+    Only lines in source_files are used, newest file first in the order given.
+    A line whose key no longer matches (the file was replaced) is ignored.
+    Copied keys are removed from keys, so the caller can scan for the rest.
+
+    Returns:
+        tuple: (number of lines written, whether the header has been written)
+    """
+    if not keys:
+        return 0, header_written
+
+    started_at = time.perf_counter()
+    copied_bytes = 0
+    locations = defaultdict(list)
+    with temp_lookup_table(
+        conn, f"{table_name}_raw_keys", ("key",), ((key,) for key in keys)
+    ) as lookup:
+        cursor = conn.execute(
+            f"""
+            SELECT i.key, f.file_path, i.byte_offset, i.length
+            FROM {lookup} AS k
+            JOIN {table_name}_raw_index AS i ON i.key = k.key
+            JOIN {table_name}_raw_files AS f ON f.file_id = i.file_id
+            """
+        )
+        for key, file_path, offset, length in cursor:
+            locations[file_path].append((offset, length, key))
+
+    found_count = 0
+    for file_path in map(str, source_files):
+        if file_path not in locations:
+            continue
+        try:
+            fd = os.open(file_path, os.O_RDONLY)
+        except FileNotFoundError:
+            continue
+        try:
+            with open(fd, "rb", closefd=False) as infile:
+                header_line = infile.readline()
+            key_index = resolve_column_indexes(
+                header_line.decode("utf-8"), [key_column], file_path
+            )[0]
+            for offset, length, key in sorted(locations[file_path]):
+                if key not in keys:
+                    continue
+                line = os.pread(fd, length, offset)
+                fields = line.split(b"|", key_index + 1)
+                if len(fields) <= key_index or normalize(fields[key_index]) != key.encode("utf-8"):
+                    continue
+                if not header_written:
+                    outfile.write(header_line)
+                    header_written = True
+                outfile.write(line)
+                keys.remove(key)
+                found_count += 1
+                copied_bytes += length
+        finally:
+            os.close(fd)
+    INSTRUMENTATION.record(
+        "raw_export", time.perf_counter() - started_at, found_count, copied_bytes
+    )
+    return found_count, header_written
+
+
+def scan_raw_lines(
+    source_files: list[str],
+    keys: set[str],
+    outfile,
+    key_column: str,
+    normalize: Callable[[bytes], bytes],
+    header_written: bool = False,
+) -> Tuple[int, bool]:
+    """
+    Copies the first raw line of each of the given keys found in the source
+    files to the binary outfile.
+
+    Each plain file is memory-mapped, compressed files are streamed, and
+    lines are only split up to the key column. Keys are
+    normalized as bytes and matching lines are copied without decoding. The
+    scan stops as soon as every key has been found. Found keys are removed
+    from keys.
+
+    Returns:
+        tuple: (number of lines written, whether the header has been written)
+    """
+    if not keys:
+        return 0, header_written
+
+    targets = {key.encode("utf-8") for key in keys}
+    found_count = 0
+    scanned_bytes = 0
+    started_at = time.perf_counter()
+
+    for file_path in source_files:
+        if not targets:
+            break
+        try:
+            with ExitStack() as stack:
+                infile = stack.enter_context(open_source(file_path))
+                if is_compressed(file_path):
+                    source = infile  # Compressed files are scanned as a stream
+                elif os.fstat(infile.fileno()).st_size == 0:
+                    continue  # Skip empty files, they cannot be mapped
+                else:
+                    source = stack.enter_context(
+                        mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+                    )
+
+                header_line = source.readline()
+                if not header_line:
+                    continue
+                key_index = resolve_column_indexes(
+                    header_line.decode("utf-8"), [key_column], str(file_path)
+                )[0]
+                if not header_written:
+                    outfile.write(header_line)
+                    header_written = True
+
+                for line in iter(source.readline, b""):
+                    fields = line.split(b"|", key_index + 1)
+                    if len(fields) <= key_index:
+                        continue  # Skip malformed lines without the key column
+                    key = normalize(fields[key_index])
+                    if key in targets:
+                        targets.remove(key)
+                        outfile.write(line)  # Write the original, unmodified line
+                        found_count += 1
+                        if not targets:
+                            break
+                scanned_bytes += source.tell()
+        except FileNotFoundError:
+            print(f"Warning: Source file not found, skipping: {file_path}")
+
+    keys.intersection_update(key.decode("utf-8") for key in targets)
+    elapsed = time.perf_counter() - started_at
+    INSTRUMENTATION.record("raw_export", elapsed, found_count, scanned_bytes)
+    megabytes = scanned_bytes / (1024 * 1024)
+    print(
+        f"Scanned {megabytes:.1f} MB in {elapsed:.2f}s "
+        f"({megabytes / elapsed if elapsed else 0:.1f} MB/s)"
+    )
+    return found_count, header_written
+
+
+class IngestionSession:
+    """
+    Owns one connection, the prepared upsert statement and the commit policy
+    for a whole ingestion run.
+
+    Args:
+        db_name: Name of the SQLite database file
+        upsert_sql: Statement executed with executemany for every chunk
+        commit_every: Commit once this many rows are pending; None commits
+                      only at end_file() and close(), so one transaction
+                      covers a whole file
+        profile: Connection profile, see CONNECTION_PROFILES
+    """
+
+    def __init__(
+        self,
+        db_name: str,
+        upsert_sql: str,
+        commit_every: int | None = None,
+        profile: str = "bulk-load",
+    ):
+        self.db_name = db_name
+        self.upsert_sql = upsert_sql
+        self.commit_every = commit_every
+        self.profile = profile
+        self.conn = get_db_connection(db_name, profile=profile)
+        self.connection_count = 1
+        self.commit_count = 0
+        self.row_count = 0
+        self.pending_rows = 0
+
+    def upsert(self, rows: list) -> int:
+        """
+        Runs the upsert statement for a chunk of rows on the session
+        connection. Returns how many rows it inserted or changed.
+        """
+        with stage("db_write", rows=len(rows)):
+            changed = self.conn.executemany(self.upsert_sql, rows).rowcount
+        self.row_count += len(rows)
+        self.pending_rows += len(rows)
+        if self.commit_every and self.pending_rows >= self.commit_every:
+            self.commit()
+        return changed
+
+    def commit(self) -> None:
+        if self.conn.in_transaction:
+            with stage("commit"):
+                self.conn.commit()
+            self.commit_count += 1
+        self.pending_rows = 0
+
+    def rollback(self) -> None:
+        if self.conn.in_transaction:
+            self.conn.rollback()
+        self.pending_rows = 0
+
+    def end_file(self) -> None:
+        """Applies the commit policy at the end of a source file."""
+        self.commit()
+
+    def close(self) -> None:
+        self.commit()
+        self.conn.close()
+        INSTRUMENTATION.record_session(
+            {
+                "db_name": self.db_name,
+                "profile": self.profile,
+                "connections": self.connection_count,
+                "commits": self.commit_count,
+                "rows": self.row_count,
+            }
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.rollback()
+        self.close()
+
+    def print_report(self) -> None:
+        print()
+        print("Ingestion Session:")
+        print("-----------------------")
+        print(f"Database    | {self.db_name}")
+        print(f"Profile     | {self.profile}")
+        print(f"Connections | {self.connection_count:10d}")
+        print(f"Commits     | {self.commit_count:10d}")
+        print(f"Rows        | {self.row_count:10d}")
+        print("-----------------------")
+
+
+def import_entity_files(
+    session: IngestionSession,
+    files: List[Tuple[str, datetime.date, FileFingerprint]],
+    table_name: str,
+    log_table_name: str,
+    parse_batch: Callable[[str, int, int | None], ParsedBatch],
+    workers: int = 1,
+    pool=None,
+):
+    """
+    Loads the files of an entity keyed by one ID, such as brands, categories
+    and cost centers, into '{table_name}'.
+
+    Files are parsed in byte ranges by parse_batch in worker processes while
+    this process, the single writer, upserts the batches in file order with
+    the session's statement, each row followed by the file's imported_at
+    date, and commits each file as a whole. The raw line index is updated in
+    the same transaction. Large files also commit a checkpoint every
+    CHECKPOINT_BYTES, so an interrupted file resumes from there instead of
+    from the start. One summary line is printed per file.
+
+    Args:
+        session: The ingestion session holding the entity's upsert statement.
+        files: (file_path, imported_at date, fingerprint) in datetime order.
+        log_table_name: The imported logs ledger, written in each file's commit.
+        parse_batch: The entity's parse function, see parse_files_in_parallel.
+        workers: Number of parsing processes.
+        pool: The load's shared_parse_pool, reused instead of a new pool.
+    """
+    pending = {str(file_path): (date, fingerprint) for file_path, date, fingerprint in files}
+    resumed = {}
+    for file_path, _, fingerprint in files:
+        checkpoint = load_checkpoint(session.conn, log_table_name, file_path, fingerprint)
+        if checkpoint:
+            resumed[str(file_path)] = checkpoint
+
+    rejects = RejectLog()
+    for batch in parse_files_in_parallel(
+        [path for path, _, _ in files],
+        parse_batch,
+        workers,
+        start_offsets={path: stats.checkpoint_offset for path, stats in resumed.items()},
+        pool=pool,
+    ):
+        if batch.first:
+            stats = resumed.get(batch.file_path) or FileLoadStats(
+                batch.file_path, size=pending[batch.file_path][1].size
+            )
+            if batch.file_path in resumed:
+                print(
+                    f"\nResuming file: {batch.file_path} at byte {stats.checkpoint_offset} "
+                    f"({stats.row_count} rows done)..."
+                )
+            else:
+                print(f"\nProcessing file: {batch.file_path}...")
+            rejects.start_file(batch.file_path, resume=batch.file_path in resumed)
+            counts = Counter()
+            write_failed = False
+        stats.add(batch)
+        rejects.add(batch)
+        if batch.last:
+            rejects.end_file(batch.file_path)
+        if batch.error:
+            print(batch.error)
+
+        if write_failed:
+            continue  # The rest of a file whose write failed is left for the next run
+        date, fingerprint = pending[batch.file_path]
+        try:
+            if batch.rows:
+                # A failed chunk raises, so the whole file is rolled back
+                counts["changed"] += session.upsert([(*row, date) for row in batch.rows])
+                counts["rows"] += len(batch.rows)
+            record_raw_lines(session.conn, table_name, batch.file_path, batch.positions)
+            if not batch.last:
+                if stats.checkpoint_due(batch):
+                    save_checkpoint(session.conn, log_table_name, fingerprint, stats, batch.end)
+                    rejects.flush(batch.file_path)
+                    session.commit()
+                continue
+
+            # Mark the file imported and commit it as a whole on the session connection
+            if not stats.failed:
+                record_imported_log(
+                    session.conn,
+                    log_table_name,
+                    batch.file_path,
+                    fingerprint,
+                    stats.row_count,
+                    stats.reject_count,
+                    stats.duration,
+                )
+            clear_checkpoint(session.conn, log_table_name, batch.file_path)
+        except sqlite3.Error as e:
+            session.rollback()
+            stats.failed = write_failed = True
+            print(f"Failed to write {batch.file_path}: {e}")
+            continue
+        session.end_file()
+        print(
+            f"Upserted {batch.file_path}: {counts['changed']} inserted or updated, "
+            f"{counts['rows'] - counts['changed']} unchanged. 🎉"
+        )
+    rejects.close()
+    rejects.print_summary()
+
+
+@dataclass
+class EntityLoad:
+    """What one entity's load did in a run, for the combined summary."""
+
+    entity: str
+    db_name: str
+    # The entity's files handed out by the sync, oldest first
+    files: list = field(default_factory=list)
+    imported_paths: list[str] = field(default_factory=list)
+    last_run: datetime.date | None = None
+    row_count: int = 0
+    reject_count: int = 0
+    seconds: float = 0.0
+    error: str | None = None
+
+    def read_ledger(self, log_table_name: str):
+        """Fills the row and reject counts of the imported files from the ledger."""
+        conn = get_db_connection(self.db_name, profile="interactive-read")
+        try:
+            with temp_lookup_table(
+                conn, "entity_load_files", ("file_path",), ((path,) for path in self.imported_paths)
+            ) as imported:
+                row = conn.execute(
+                    f"""
+                    SELECT COALESCE(SUM(log.row_count), 0), COALESCE(SUM(log.reject_count), 0)
+                    FROM {imported} AS f
+                    JOIN {log_table_name} AS log ON log.file_path = f.file_path
+                """
+                ).fetchone()
+            self.row_count, self.reject_count = row[0], row[1]
+        finally:
+            conn.close()
+
+
+def open_s3_store(full: bool = False):
+    """The store to sync from and whether to list it in full.
+
+    ABC_SYNC_SOURCE points the sync at a plain directory (or another bucket)
+    instead of AWS_BUCKET_NAME, and ABC_SYNC_FULL=1 lists the whole bucket (which
+    also happens every ABC_SYNC_FULL_EVERY_HOURS, 24 by default).
+    """
     import dotenv
+    from s3_sync import open_store
 
     dotenv.load_dotenv()
 
-    s3_bucket = os.getenv("AWS_BUCKET_NAME")
-    local_path = "./data"
+    location = os.getenv("ABC_SYNC_SOURCE") or f"s3://{os.getenv('AWS_BUCKET_NAME')}"
+    return open_store(location), full or os.getenv("ABC_SYNC_FULL") == "1"
+
+
+def sync_s3(full: bool = False):
+    """Mirrors the objects added to the S3 bucket since the last run into ./data, see s3_sync.
 
-    sync_command = f"aws s3 sync s3://{s3_bucket} {local_path}"
-    os.system(sync_command)
+    Like the former `aws s3 sync` call, a sync that cannot run is reported
+    and the run goes on with the local files; None is returned then.
+    """
+    from s3_sync import LOCAL_FOLDER, sync_store
+
+    try:
+        store, full = open_s3_store(full)
+        with stage("s3_sync") as timer:
+            summary = sync_store(store, LOCAL_FOLDER, full=full)
+            timer.rows = summary.fetched
+            timer.bytes = summary.bytes
+    except Exception as e:
+        print(f"❌ S3 sync failed, loading the local files only: {e}")
+        return None
+    return summary
+
+
+def start_s3_sync(source_folder: str, file_types: list[FileType], full: bool = False):
+    """Starts sync_s3 on a background thread.
+
+    The returned SyncPipeline's files(file_type) yields the files of
+    source_folder in datetime order while newer ones are still downloading,
+    and join() waits for the sync to finish. When the store cannot be opened
+    (no boto3, no bucket configured) only the local files are handed out.
+    """
+    from s3_sync import LOCAL_FOLDER, SyncPipeline
+
+    try:
+        store, full = open_s3_store(full)
+    except Exception as e:
+        print(f"❌ Cannot sync from S3, loading the local files only: {e}")
+        store = None
+    return SyncPipeline(store, source_folder, file_types, LOCAL_FOLDER, full=full).start()
@@ -0,0 +1,130 @@
+import argparse
+import os
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from abc_utils import (
+    EntityLoad,
+    import_script,
+    start_s3_sync,
+    summarize_by_imported_at,
+    write_run_report,
+)
+
+
+# --- Configuration ---
+# (script, load function) of each entity; their databases are independent
+ENTITIES = {
+    "article": ("article-to-db", "run_article_load"),
+    "brand": ("brand-to-db", "run_brand_load"),
+    "category": ("category-to-db", "run_category_load"),
+    "costcenter": ("costcenter-to-db", "run_costcenter_load"),
+}
+# Parse worker processes of each entity. The small entities parse in-process
+# so most of the CPUs are left to the articles.
+ENTITY_WORKERS = {
+    "article": max(1, (os.cpu_count() or 1) - 1),
+    "brand": 1,
+    "category": 1,
+    "costcenter": 1,
+}
+
+
+def run_entity_load(entity: str, module, sync, workers: int) -> EntityLoad:
+    try:
+        return getattr(module, ENTITIES[entity][1])(sync, workers)
+    except Exception as e:
+        traceback.print_exc()
+        return EntityLoad(entity, module.DB_NAME, error=f"{type(e).__name__}: {e}")
+
+
+def run_all_loads(
+    entities: list[str], workers: dict[str, int], full_sync: bool = False
+) -> list[EntityLoad]:
+    """
+    Syncs and lists the source folder once for all the entities, then runs
+    their loads side by side, one thread each. Each load imports its files as
+    the sync hands them out and parses with its own number of workers.
+    """
+    modules = {entity: import_script(ENTITIES[entity][0]) for entity in entities}
+    source_folders = {module.SOURCE_FOLDER for module in modules.values()}
+    assert len(source_folders) == 1, f"The loaders read different folders: {source_folders}"
+
+    sync = start_s3_sync(
+        source_folders.pop(), [module.FILE_TYPE for module in modules.values()], full=full_sync
+    )
+    with ThreadPoolExecutor(max_workers=len(entities)) as pool:
+        futures = [
+            pool.submit(run_entity_load, entity, modules[entity], sync, workers[entity])
+            for entity in entities
+        ]
+        loads = [future.result() for future in futures]
+    sync.join()
+    return loads
+
+
+def print_combined_summary(loads: list[EntityLoad], wall_seconds: float):
+    print()
+    print("All Loads:")
+    print("-------------------------------------------------------------------------------")
+    print("Entity     |  Files | Imported |         Rows |    Rejects |  Seconds | Last run")
+    print("-------------------------------------------------------------------------------")
+    for load in loads:
+        if load.error:
+            print(f"{load.entity:<10} | ❌ {load.error}")
+            continue
+        print(
+            f"{load.entity:<10} | {len(load.files):6d} | {len(load.imported_paths):8d} | "
+            f"{load.row_count:12d} | {load.reject_count:10d} | {load.seconds:8.2f} | "
+            f"{load.last_run or '-'}"
+        )
+    print("-------------------------------------------------------------------------------")
+    slowest = max((load.seconds for load in loads), default=0.0)
+    print(
+        f"Wall time {wall_seconds:.2f}s for {sum(load.seconds for load in loads):.2f}s of loads "
+        f"(slowest {slowest:.2f}s)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Syncs S3 once and loads articles, brands, categories and cost centers side by side."
+    )
+    parser.add_argument(
+        "--only",
+        default=",".join(ENTITIES),
+        help="Entities to load, comma separated",
+    )
+    parser.add_argument(
+        "--workers",
+        action="append",
+        default=[],
+        metavar="ENTITY=N",
+        help="Parse workers of an entity, e.g. --workers article=6",
+    )
+    parser.add_argument("--full-sync", action="store_true", help="List the whole bucket")
+    parser.add_argument(
+        "--summaries", action="store_true", help="Print each database's summary by import date"
+    )
+    args = parser.parse_args()
+
+    entities = [entity.strip() for entity in args.only.split(",") if entity.strip()]
+    unknown = [entity for entity in entities if entity not in ENTITIES]
+    if unknown:
+        parser.error(f"unknown entities {unknown}, expected some of {list(ENTITIES)}")
+    workers = dict(ENTITY_WORKERS)
+    for setting in args.workers:
+        entity, _, count = setting.partition("=")
+        if entity not in ENTITIES or not count.isdigit():
+            parser.error(f"--workers expects ENTITY=N, got {setting!r}")
+        workers[entity] = int(count)
+
+    started_at = time.perf_counter()
+    loads = run_all_loads(entities, workers, full_sync=args.full_sync)
+    if args.summaries:
+        for load in loads:
+            module = import_script(ENTITIES[load.entity][0])
+            summarize_by_imported_at(module.DB_NAME, module.TABLE_NAME)
+    print_combined_summary(loads, time.perf_counter() - started_at)
+
+    write_run_report("all-to-db")
@@ -1,22 +1,50 @@
 import datetime
 import os
 import sqlite3
-import csv
-from traceback import print_exc, print_stack
+import time
+from collections import Counter
+from contextlib import ExitStack
+from traceback import print_exc
 from typing import List, Tuple
-from file_listing import FileType, list_files_in_folder
+from file_listing import FileType
 from abc_normalize import (
-    normalize_article_id,
-    normalize_brand_id,
-    normalize_category_id,
-    normalize_text,
+    normalize_article_id_bytes,
+    normalize_article_ids,
+    normalize_brand_ids,
+    normalize_category_ids,
+    normalize_texts,
 )
 from abc_utils import (
+    ColumnReader,
+    EntityLoad,
+    FileFingerprint,
+    FileLoadStats,
+    IngestionSession,
+    MissingColumnError,
+    RejectLog,
+    ParsedBatch,
     get_db_connection,
+    copy_indexed_raw_lines,
     create_imported_logs,
-    insert_imported_logs_if_not_exists,
+    create_raw_line_index,
+    create_secondary_indexes,
+    deferred_secondary_indexes,
+    fingerprint_file,
+    load_checkpoint,
+    missing_reason,
+    check_imported_log,
+    clear_checkpoint,
+    parse_files_in_parallel,
+    record_imported_log,
+    record_raw_lines,
+    save_checkpoint,
+    scan_raw_lines,
+    shared_parse_pool,
+    stage,
     summarize_by_imported_at,
-    sync_s3,
+    start_s3_sync,
+    temp_lookup_table,
+    write_run_report,
 )
 
 
@@ -27,6 +55,18 @@ DB_NAME = "data/articles.db"
 TABLE_NAME = "articles"
 IMOPORTED_LOG_TABLE_NAME = "articles_imported_log"
 OUTPUT_FILE_NAME = "S4P_ARTICLE_FULL_{today}_999999_1_1.CSV"
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", os.cpu_count() or 1))
+# Secondary indexes of the articles table: (category, brand) serves the match
+# export and the reconciliation GROUP BY, imported_at the delta export, and
+# brand_id the brand foreign key checks of catalog.py
+ARTICLE_INDEXES = {
+    "category_brand": ("category_id", "brand_id"),
+    "imported_at": ("imported_at",),
+    "brand_id": ("brand_id",),
+}
+# Imports of at least this many bytes, or into an empty table, drop the
+# secondary indexes and rebuild them once at the end
+DEFER_INDEXES_BYTES = 512 * 1024 * 1024
 
 
 def create_article_config_table(table_name: str):
@@ -45,6 +85,8 @@ def create_article_config_table(table_name: str):
                 )
             """
             )
+            create_secondary_indexes(conn, table_name, ARTICLE_INDEXES)
+            create_raw_line_index(conn, table_name)
         print(f"Table '{table_name}' is ready. ✅")
         return True
     except sqlite3.Error as e:
@@ -53,98 +95,279 @@ def create_article_config_table(table_name: str):
         conn.close()
 
 
-def upsert_articles(
-    articles: List[Tuple[str, str, str, str, datetime.date]], table_name: str
-):
+def create_article_staging_table(session: IngestionSession, table_name: str):
+    """Creates the unconstrained temporary table each article file is streamed into."""
+    session.conn.execute(
+        f"""
+        CREATE TEMP TABLE IF NOT EXISTS {table_name}_staging (
+            article_id TEXT,
+            article_name TEXT,
+            category_id TEXT,
+            brand_id TEXT
+        )
+    """
+    )
+
+
+def build_article_staging_sql(table_name: str) -> str:
+    """Returns the staging insert prepared once per ingestion session."""
+    return f"""
+        INSERT INTO temp.{table_name}_staging (article_id, article_name, category_id, brand_id)
+        VALUES (?, ?, ?, ?)
     """
-    Inserts or replaces a chunk of article records in a single transaction.
+
+
+def stage_articles(session: IngestionSession, articles: List[Tuple[str, str, str, str]]):
+    """
+    Appends a chunk of article records to the staging table.
 
     Args:
+        session: The ingestion session owning the connection and commit policy.
         articles: A list of tuples, where each tuple contains
-                  (article_id, article_name, category_id, brand_id, imported_at).
+                  (article_id, article_name, category_id, brand_id).
     """
-    # Check if there are any articles to process
     if not articles:
-        print("No articles provided to upsert.")
         return
 
-    sql = f"""
-        INSERT INTO {table_name} (article_id, article_name, category_id, brand_id, imported_at)
-        VALUES (?, ?, ?, ?, ?)
-        ON CONFLICT(article_id) DO UPDATE SET
-            article_id=excluded.article_id,
-            article_name=excluded.article_name,
-            category_id=excluded.category_id,
-            brand_id=excluded.brand_id
-        WHERE {table_name}.article_id IS NOT excluded.article_id
-        OR {table_name}.article_name IS NOT excluded.article_name
-        OR {table_name}.category_id IS NOT excluded.category_id
-        OR {table_name}.brand_id IS NOT excluded.brand_id;
+    # A failed chunk raises, so the caller rolls back the whole file
+    session.upsert(articles)
+
+
+def merge_staged_articles(
+    session: IngestionSession, table_name: str, date: datetime.date
+) -> dict[str, int]:
     """
+    Applies the staging table to '{table_name}' with one set-based merge and
+    empties it.
 
-    conn = get_db_connection(DB_NAME)
-    try:
-        # The 'with conn:' block automatically begins and commits/rollbacks a transaction.
-        with conn:
-            # Use executemany to efficiently process the entire list.
-            conn.executemany(sql, articles)
-    except sqlite3.Error as e:
-        print(f"Failed to upsert a chunk of {len(articles)} articles: {e}")
-    else:
-        print(f"Successfully upserted/updated {len(articles)} articles. ✅")
-    finally:
-        conn.close()
+    The last staged row of each article_id wins, like the row-by-row upsert
+    did. imported_at is only set on rows that are new or really changed.
+
+    Returns:
+        dict: Counts of "inserted", "updated" and "unchanged" articles.
+    """
+    conn = session.conn
+    conn.execute(
+        f"""
+        CREATE TEMP TABLE {table_name}_latest AS
+        SELECT article_id, article_name, category_id, brand_id
+        FROM temp.{table_name}_staging
+        WHERE rowid IN (
+            SELECT MAX(rowid) FROM temp.{table_name}_staging GROUP BY article_id
+        )
+    """
+    )
+    staged = conn.execute(f"SELECT COUNT(1) FROM temp.{table_name}_latest").fetchone()[0]
+    updated = conn.execute(
+        f"""
+        UPDATE {table_name}
+        SET article_name = l.article_name,
+            category_id = l.category_id,
+            brand_id = l.brand_id,
+            imported_at = ?
+        FROM temp.{table_name}_latest AS l
+        WHERE {table_name}.article_id = l.article_id
+        AND ({table_name}.article_name IS NOT l.article_name
+            OR {table_name}.category_id IS NOT l.category_id
+            OR {table_name}.brand_id IS NOT l.brand_id)
+    """,
+        (date,),
+    ).rowcount
+    inserted = conn.execute(
+        f"""
+        INSERT INTO {table_name} (article_id, article_name, category_id, brand_id, imported_at)
+        SELECT l.article_id, l.article_name, l.category_id, l.brand_id, ?
+        FROM temp.{table_name}_latest AS l
+        WHERE NOT EXISTS (
+            SELECT 1 FROM {table_name} AS a WHERE a.article_id = l.article_id
+        )
+    """,
+        (date,),
+    ).rowcount
+    conn.execute(f"DROP TABLE temp.{table_name}_latest")
+    conn.execute(f"DELETE FROM temp.{table_name}_staging")
+    return {
+        "inserted": inserted,
+        "updated": updated,
+        "unchanged": staged - inserted - updated,
+    }
 
 
 # --- Main Logic ---
 
 
-def article_to_db(file_path: str, date: datetime.date, table_name: str):
+def parse_article_rows(file_path: str, start: int = 0, end: int | None = None) -> ParsedBatch:
+    """
+    Reads and normalizes the article rows of one byte range of a CSV file.
+    Runs in the worker processes of parse_files_in_parallel.
+    """
+    batch = ParsedBatch(file_path, start, end)
+    # Only the needed columns are picked, by position resolved from the header
+    reader = ColumnReader(
+        file_path, ["MATNR", "MAKTX", "MATKL", "BRAND_ID"], start=start, end=end
+    )
+    started_at = time.perf_counter()
+    raw_rows = []
+    lines = []
+    try:
+        for row in reader:
+            raw_rows.append(row)
+            lines.append((reader.line_offset, reader.raw_line))
+    except FileNotFoundError:
+        batch.error = f"Error: File not found at {file_path}"
+    except MissingColumnError:
+        raise
+    except Exception as e:
+        batch.error = f"An error occurred while processing {file_path}: {e}"
+    batch.parse_seconds = time.perf_counter() - started_at
+    batch.short_rows = reader.short_rows
+    if not raw_rows:
+        return batch
+
+    # Normalize column by column, one batch call per field for the whole range
+    raw_article_ids, raw_article_texts, raw_category_ids, raw_brand_ids = zip(*raw_rows)
+    normalized = zip(
+        normalize_article_ids(raw_article_ids),
+        normalize_texts(raw_article_texts),
+        normalize_category_ids(raw_category_ids),
+        normalize_brand_ids(raw_brand_ids),
+    )
+    for (line_offset, raw_line), normalized_row in zip(lines, normalized):
+        article_id, article_text, category_id, brand_id = normalized_row
+        category_id = category_id[:3]
+        brand_id = brand_id or "000"
+        # Skip if essential data is missing
+        if not article_id or not category_id or not brand_id:
+            reason = missing_reason(
+                ("MATNR", "MATKL", "BRAND_ID"), (article_id, category_id, brand_id)
+            )
+            batch.skipped.append((reason, raw_line))
+            continue
+
+        batch.positions.append((article_id, line_offset, len(raw_line)))
+        batch.rows.append((article_id, article_text, category_id, brand_id))
+    batch.normalize_seconds = time.perf_counter() - started_at - batch.parse_seconds
+    return batch
+
+
+def import_article_files(
+    session: IngestionSession,
+    files: List[Tuple[str, datetime.date, FileFingerprint]],
+    table_name: str,
+    log_table_name: str,
+    workers: int = 1,
+    pool=None,
+):
     """
     Main function to read article data from CSV files and load into the database.
 
+    Files are parsed in byte ranges by worker processes while this process,
+    the single writer, streams the batches into the staging table in file
+    order. Each file is merged into '{table_name}' once its last batch has
+    been staged, so a later delta still wins. The raw line index is updated
+    in the same transaction.
+
+    Large files are also merged and committed every CHECKPOINT_BYTES together
+    with a checkpoint, so an interrupted file resumes from its last checkpoint
+    instead of being parsed again from the start.
+
     Args:
-        files: A list of CSV file paths to process.
+        session: The ingestion session returned for build_article_staging_sql.
+        files: (file_path, imported_at date, fingerprint) in datetime order.
+        log_table_name: The imported logs ledger, written in each file's commit.
+        workers: Number of parsing processes.
+        pool: The load's shared_parse_pool, reused instead of a new pool.
     """
-    # 1. Ensure the database table exists
-    assert create_article_config_table(table_name)
-
-    chunk = []
+    create_article_staging_table(session, table_name)
+    pending = {str(file_path): (date, fingerprint) for file_path, date, fingerprint in files}
+    resumed = {}
+    for file_path, _, fingerprint in files:
+        checkpoint = load_checkpoint(session.conn, log_table_name, file_path, fingerprint)
+        if checkpoint:
+            resumed[str(file_path)] = checkpoint
+
+    rejects = RejectLog()
+    for batch in parse_files_in_parallel(
+        [path for path, _, _ in files],
+        parse_article_rows,
+        workers,
+        start_offsets={path: stats.checkpoint_offset for path, stats in resumed.items()},
+        pool=pool,
+    ):
+        if batch.first:
+            stats = resumed.get(batch.file_path) or FileLoadStats(
+                batch.file_path, size=pending[batch.file_path][1].size
+            )
+            if batch.file_path in resumed:
+                print(
+                    f"\nResuming file: {batch.file_path} at byte {stats.checkpoint_offset} "
+                    f"({stats.row_count} rows done)..."
+                )
+            else:
+                print(f"\nProcessing file: {batch.file_path}...")
+            rejects.start_file(batch.file_path, resume=batch.file_path in resumed)
+            counts = Counter()
+            write_failed = False
+        stats.add(batch)
+        rejects.add(batch)
+        if batch.last:
+            rejects.end_file(batch.file_path)
+        if batch.error:
+            print(batch.error)
+
+        if write_failed:
+            continue  # The rest of a file whose write failed is left for the next run
+        date, fingerprint = pending[batch.file_path]
+        try:
+            stage_articles(session, batch.rows)
+            record_raw_lines(session.conn, table_name, batch.file_path, batch.positions)
+            if not batch.last and not stats.checkpoint_due(batch):
+                continue
+
+            # Merge what is staged, then commit a checkpoint, or at the end of
+            # the file mark it imported in the same commit
+            with stage("db_write"):
+                counts.update(merge_staged_articles(session, table_name, date))
+            if not batch.last:
+                save_checkpoint(session.conn, log_table_name, fingerprint, stats, batch.end)
+                rejects.flush(batch.file_path)
+                session.commit()
+                continue
+            if not stats.failed:
+                record_imported_log(
+                    session.conn,
+                    log_table_name,
+                    batch.file_path,
+                    fingerprint,
+                    stats.row_count,
+                    stats.reject_count,
+                    stats.duration,
+                )
+            clear_checkpoint(session.conn, log_table_name, batch.file_path)
+        except sqlite3.Error as e:
+            session.rollback()
+            stats.failed = write_failed = True
+            print(f"Failed to write {batch.file_path}: {e}")
+            continue
+        session.end_file()
+        print(
+            f"Merged {batch.file_path}: {counts['inserted']} inserted, "
+            f"{counts['updated']} updated, {counts['unchanged']} unchanged. 🎉"
+        )
+    rejects.close()
+    rejects.print_summary()
 
-    # 2. Iterate through each file and process its rows
-    print(f"\nProcessing file: {file_path}...")
-    try:
-        with open(file_path, mode="r", encoding="utf-8") as csvfile:
-            # Use DictReader to read CSV rows as dictionaries
-            reader = csv.DictReader(csvfile, delimiter="|")
-            for row in reader:
-                # 3. Normalize data from each row
-                article_id = normalize_article_id(row.get("MATNR", ""))
-                article_text = normalize_text(row.get("MAKTX", ""))
-                category_id = normalize_category_id(row.get("MATKL", ""))[:3]
-                brand_id = normalize_brand_id(row.get("BRAND_ID", "")) or "000"
-
-                # Skip if essential data is missing
-                if not article_id or not category_id or not brand_id:
-                    print(f"Skipping row due to missing: {row}")
-                    continue
-
-                # 4. Upsert the processed data into the database
-                chunk.append((article_id, article_text, category_id, brand_id, date))
-
-                if len(chunk) == 1000:
-                    upsert_articles(chunk, table_name)
-                    chunk = []
-
-        print(f"Successfully processed {file_path}. 🎉")
-    except FileNotFoundError:
-        print(f"Error: File not found at {file_path}")
-    except Exception as e:
-        print(f"An error occurred while processing {file_path}: {e}")
 
-    if len(chunk):
-        upsert_articles(chunk, table_name)
-        chunk = []
+def article_to_db(
+    session: IngestionSession, file_path: str, date: datetime.date, table_name: str
+):
+    """Loads a single article file in-process, see import_article_files."""
+    import_article_files(
+        session,
+        [(file_path, date, fingerprint_file(file_path))],
+        table_name,
+        IMOPORTED_LOG_TABLE_NAME,
+    )
 
 
 def write_raw_record_of_delta_article(
@@ -162,7 +385,7 @@ def write_raw_record_of_delta_article(
 
     # --- Step 1: Read the list of missing article_ids into a set for fast lookups ---
     try:
-        conn = get_db_connection(DB_NAME)
+        conn = get_db_connection(DB_NAME, profile="interactive-read")
         cursor = conn.cursor()
         cursor.execute(
             f"""
@@ -185,42 +408,35 @@ def write_raw_record_of_delta_article(
         f"Searching for the original lines of {len(missing_articles)} missing article_ids..."
     )
 
-    # --- Step 2: Open the output file and search through the source files line by line ---
+    # --- Step 2: Copy the lines the raw line index points at, then scan the source files for the rest ---
     found_count = 0
     header_written = False
     try:
-        with open(to_file, "w", encoding="utf-8") as outfile:
-            for file_path in source_files:
-                try:
-                    with open(file_path, "r", encoding="utf-8") as infile:
-                        # Read the header to find the column index for "MATNR"
-                        header_line = next(infile, None)
-                        if not header_line:
-                            continue  # Skip empty files
-
-                        if not header_written:
-                            outfile.write(header_line)
-                            header_written = True
-
-                        # Process the rest of the file
-                        for line in infile:
-                            try:
-                                raw_article_id = line.strip().split("|")[0]
-                                normalized_article_id = normalize_article_id(
-                                    raw_article_id
-                                )
-
-                                if normalized_article_id in missing_articles:
-                                    missing_articles.remove(normalized_article_id)
-                                    outfile.write(
-                                        line
-                                    )  # Write the original, unmodified line
-                                    found_count += 1
-                            except IndexError:
-                                # This will skip malformed lines that don't have enough columns
-                                continue
-                except FileNotFoundError:
-                    print(f"Warning: Source file not found, skipping: {file_path}")
+        with open(to_file, "wb") as outfile:
+            try:
+                conn = get_db_connection(DB_NAME, profile="interactive-read")
+                found_count, header_written = copy_indexed_raw_lines(
+                    conn,
+                    table_name,
+                    missing_articles,
+                    source_files,
+                    outfile,
+                    "MATNR",
+                    normalize_article_id_bytes,
+                )
+                conn.close()
+            except sqlite3.Error as e:
+                print(f"Warning: raw line index unavailable, scanning all files: {e}")
+
+            scanned_count, header_written = scan_raw_lines(
+                source_files,
+                missing_articles,
+                outfile,
+                "MATNR",
+                normalize_article_id_bytes,
+                header_written,
+            )
+            found_count += scanned_count
     except IOError as e:
         print(f"❌ Error writing to output file '{to_file}': {e}")
 
@@ -246,52 +462,33 @@ def write_raw_record_of_match_article(
         source_files: A list of raw data CSV file paths to search through.
     """
 
-    def get_chunks(data, size):
-        return [data[i : i + size] for i in range(0, len(data), size)]
-
-
-    # --- Step 1: Read the list of missing article_ids into a set for fast lookups ---
+    # --- Step 1: Resolve the match list with one join against a temp table of its keys ---
     try:
-        conn = get_db_connection(DB_NAME)
+        conn = get_db_connection(DB_NAME, profile="interactive-read")
         if cat_brn and skus:
             raise Exception("Either cat_brn or skus")
         elif cat_brn:
-            matched_articles = set()
-            for chunk in get_chunks(cat_brn, 10000):
-                cursor = conn.cursor()
-                cursor.execute(
+            keys = zip(
+                normalize_category_ids(pair[0] for pair in cat_brn),
+                normalize_brand_ids(pair[1] for pair in cat_brn),
+            )
+            with temp_lookup_table(
+                conn, f"{table_name}_match_keys", ("category_id", "brand_id"), keys
+            ) as lookup:
+                cursor = conn.execute(
                     f"""
-                    SELECT article_id
-                    FROM {table_name}
-                    WHERE (category_id, brand_id) IN (VALUES {','.join(['(?,?)' for _ in chunk])})
-                    """,
-                    [
-                        param
-                        for pair in chunk
-                        for param in [
-                            normalize_category_id(pair[0]),
-                            normalize_brand_id(pair[1]),
-                        ]
-                    ],
-                )
-                matched_articles = matched_articles.union(
-                    {row["article_id"] for row in cursor.fetchall()}
+                    SELECT a.article_id
+                    FROM {lookup} AS k
+                    JOIN {table_name} AS a
+                        ON a.category_id = k.category_id AND a.brand_id = k.brand_id
+                    """
                 )
+                matched_articles = {row["article_id"] for row in cursor}
         elif skus:
-            matched_articles = set()
-            for chunk in get_chunks(skus, 10000):
-                cursor = conn.cursor()
-                cursor.execute(
-                    f"""
-                    SELECT article_id
-                    FROM {table_name}
-                    WHERE article_id IN ({','.join(['?' for _ in chunk])})
-                    """,
-                    chunk,
-                )
-                matched_articles = matched_articles.union(
-                    {row["article_id"] for row in cursor.fetchall()}
-                )
+            matched_articles = {
+                row["article_id"]
+                for row in match_article_rows(conn, table_name, skus, "a.article_id")
+            }
         else:
             raise Exception("Either cat_brn or skus")
         conn.close()
@@ -308,44 +505,35 @@ def write_raw_record_of_match_article(
         f"Searching for the original lines of {len(matched_articles)} matched article_ids..."
     )
 
-    # --- Step 2: Open the output file and search through the source files line by line ---
+    # --- Step 2: Copy the lines the raw line index points at, then scan the source files for the rest ---
     found_count = 0
     header_written = False
     try:
-        with open(to_file, "w", encoding="utf-8") as outfile:
-            for file_path in source_files:
-                if not matched_articles:
-                    break
-                try:
-                    with open(file_path, "r", encoding="utf-8") as infile:
-                        # Read the header to find the column index for "MATNR"
-                        header_line = next(infile, None)
-                        if not header_line:
-                            continue  # Skip empty files
-
-                        if not header_written:
-                            outfile.write(header_line)
-                            header_written = True
-
-                        # Process the rest of the file
-                        for line in infile:
-                            try:
-                                raw_article_id = line.strip().split("|")[0]
-                                normalized_article_id = normalize_article_id(
-                                    raw_article_id
-                                )
-
-                                if normalized_article_id in matched_articles:
-                                    matched_articles.remove(normalized_article_id)
-                                    outfile.write(
-                                        line
-                                    )  # Write the original, unmodified line
-                                    found_count += 1
-                            except IndexError:
-                                # This will skip malformed lines that don't have enough columns
-                                continue
-                except FileNotFoundError:
-                    print(f"Warning: Source file not found, skipping: {file_path}")
+        with open(to_file, "wb") as outfile:
+            try:
+                conn = get_db_connection(DB_NAME, profile="interactive-read")
+                found_count, header_written = copy_indexed_raw_lines(
+                    conn,
+                    table_name,
+                    matched_articles,
+                    source_files,
+                    outfile,
+                    "MATNR",
+                    normalize_article_id_bytes,
+                )
+                conn.close()
+            except sqlite3.Error as e:
+                print(f"Warning: raw line index unavailable, scanning all files: {e}")
+
+            scanned_count, header_written = scan_raw_lines(
+                source_files,
+                matched_articles,
+                outfile,
+                "MATNR",
+                normalize_article_id_bytes,
+                header_written,
+            )
+            found_count += scanned_count
     except IOError as e:
         print(f"❌ Error writing to output file '{to_file}': {e}")
 
@@ -354,19 +542,28 @@ def write_raw_record_of_match_article(
     )
 
 
-def find_article(*skus: str):
-    try:
-        conn = get_db_connection(DB_NAME)
-        cursor = conn.cursor()
-        cursor.execute(
+def match_article_rows(conn: sqlite3.Connection, table_name: str, skus, select: str = "a.*"):
+    """
+    Yields the selected columns of the articles in skus, resolved with one
+    join against a temp table of the SKUs whatever their number.
+    """
+    with temp_lookup_table(
+        conn, f"{table_name}_sku_keys", ("article_id",), ((sku,) for sku in skus)
+    ) as lookup:
+        cursor = conn.execute(
             f"""
-            SELECT *
-            FROM {TABLE_NAME}
-            WHERE article_id IN ({','.join(['?' for _ in skus])})
-            """,
-            skus,
+            SELECT {select}
+            FROM {lookup} AS k
+            JOIN {table_name} AS a ON a.article_id = k.article_id
+            """
         )
-        result = [dict(row) for row in cursor.fetchall()]
+        yield from cursor
+
+
+def find_article(*skus: str):
+    try:
+        conn = get_db_connection(DB_NAME, profile="interactive-read")
+        result = [dict(row) for row in match_article_rows(conn, TABLE_NAME, skus)]
         conn.close()
         return result
     except sqlite3.Error as e:
@@ -382,29 +579,73 @@ def find_clearance_list():
         yield "{:>018s}".format(line.strip())
 
 
-# --- Example Usage ---
-if __name__ == "__main__":
-    sync_s3()
+def run_article_load(sync, workers: int = IMPORT_WORKERS) -> EntityLoad:
+    """
+    Imports the article files the sync hands out, each batch as soon as it is
+    on disk. Shared by __main__ and the all-to-db.py orchestrator.
+    """
+    started_at = time.perf_counter()
+    load = EntityLoad("article", DB_NAME)
     create_imported_logs(DB_NAME, IMOPORTED_LOG_TABLE_NAME)
     create_article_config_table(TABLE_NAME)
 
-    all_files = list_files_in_folder(SOURCE_FOLDER, no_filter=True)
-    article_files = [f for f in all_files if f.file_type is FILE_TYPE]
-    article_files.sort(key=lambda k: k.datetime)
+    with (
+        IngestionSession(DB_NAME, build_article_staging_sql(TABLE_NAME)) as session,
+        shared_parse_pool(parse_article_rows, workers) as pool,
+        ExitStack() as indexes,
+    ):
+        is_empty = session.conn.execute(f"SELECT 1 FROM {TABLE_NAME} LIMIT 1").fetchone() is None
+        deferring = None
+        # Each batch holds the files ready so far, already sorted by datetime
+        for ready_files in sync.files(FILE_TYPE):
+            load.files.extend(ready_files)
+            # A cheap stat check, then a content hash, decides what still needs importing
+            pending_files = []
+            for article_file in ready_files:
+                date = datetime.datetime.strptime(article_file.datetime[:8], "%Y%m%d").date()
+                if article_file.datetime[8:] == "999999":
+                    load.last_run = date
+                fingerprint = check_imported_log(
+                    session.conn, IMOPORTED_LOG_TABLE_NAME, article_file.path
+                )
+                if fingerprint:
+                    pending_files.append((article_file.path, date, fingerprint))
+            session.commit()
+            if not pending_files:
+                continue
+
+            if deferring is None:
+                # Decided once, counting the files still downloading as pending too
+                pending_bytes = sum(fingerprint.size for _, _, fingerprint in pending_files)
+                pending_bytes += sync.queued_bytes(FILE_TYPE)
+                deferring = is_empty or pending_bytes >= DEFER_INDEXES_BYTES
+                indexes.enter_context(
+                    deferred_secondary_indexes(session, TABLE_NAME, ARTICLE_INDEXES, defer=deferring)
+                )
+            import_article_files(
+                session, pending_files, TABLE_NAME, IMOPORTED_LOG_TABLE_NAME, workers, pool
+            )
+            load.imported_paths.extend(str(path) for path, _, _ in pending_files)
+    session.print_report()
+
+    if load.files and not load.last_run:
+        load.last_run = datetime.datetime.strptime(load.files[-1].datetime[:8], "%Y%m%d").date()
+    load.read_ledger(IMOPORTED_LOG_TABLE_NAME)
+    load.seconds = time.perf_counter() - started_at
+    return load
 
-    last_run = None
-    for article_file in article_files:
-        date = datetime.datetime.strptime(article_file.datetime[:8], "%Y%m%d").date()
-        if article_file.datetime[8:] == "999999":
-            last_run = date
-        if insert_imported_logs_if_not_exists(
-            DB_NAME, IMOPORTED_LOG_TABLE_NAME, str(article_file.path)
-        ):
-            article_to_db(article_file.path, date, TABLE_NAME)
+
+# --- Example Usage ---
+if __name__ == "__main__":
+    # Files already on disk are imported while newer ones are still downloading
+    sync = start_s3_sync(SOURCE_FOLDER, [FILE_TYPE])
+    load = run_article_load(sync)
+    sync.join()
+    article_files = load.files
 
     summarize_by_imported_at(DB_NAME, TABLE_NAME)
 
-    last_run = last_run or date
+    last_run = load.last_run
     print("last run", last_run)
     today = datetime.date.today().isoformat().replace("-", "")
     article_files.sort(key=lambda k: k.datetime, reverse=True)
@@ -433,3 +674,5 @@ if __name__ == "__main__":
         os.path.join(SOURCE_FOLDER, OUTPUT_FILE_NAME.format(today=today)),
         skus=list(find_clearance_list()),
     )
+
+    write_run_report("article-to-db")
@@ -1,16 +1,30 @@
 import datetime
 import os
 import sqlite3
-import csv
+import time
 from typing import List, Tuple
-from file_listing import FileType, list_files_in_folder
-from abc_normalize import normalize_brand_id, normalize_text
+from file_listing import FileType
+from abc_normalize import normalize_brand_id_bytes, normalize_brand_ids, normalize_texts
 from abc_utils import (
+    ColumnReader,
+    EntityLoad,
+    FileFingerprint,
+    IngestionSession,
+    MissingColumnError,
+    ParsedBatch,
+    import_entity_files,
     get_db_connection,
+    copy_indexed_raw_lines,
     create_imported_logs,
-    insert_imported_logs_if_not_exists,
+    create_raw_line_index,
+    fingerprint_file,
+    missing_reason,
+    check_imported_log,
+    scan_raw_lines,
+    shared_parse_pool,
     summarize_by_imported_at,
-    sync_s3,
+    start_s3_sync,
+    write_run_report,
 )
 
 
@@ -21,6 +35,7 @@ DB_NAME = "data/brands.db"
 TABLE_NAME = "brands"
 IMOPORTED_LOG_TABLE_NAME = "brands_imported_log"
 OUTPUT_FILE_NAME = "S4P_BRAND_FULL_{today}_999999_1_1.CSV"
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", os.cpu_count() or 1))
 
 
 def create_brand_config_table(table_name: str):
@@ -37,6 +52,7 @@ def create_brand_config_table(table_name: str):
                 )
             """
             )
+            create_raw_line_index(conn, table_name)
         print(f"Table '{table_name}' is ready. ✅")
         return True
     except sqlite3.Error as e:
@@ -45,20 +61,9 @@ def create_brand_config_table(table_name: str):
         conn.close()
 
 
-def upsert_brands(brands: List[Tuple[str, str, datetime.date]], table_name: str):
-    """
-    Inserts or replaces a chunk of brand records in a single transaction.
-
-    Args:
-        brands: A list of tuples, where each tuple contains
-                  (brand_id, brand_name, imported_at).
-    """
-    # Check if there are any brands to process
-    if not brands:
-        print("No brands provided to upsert.")
-        return
-
-    sql = f"""
+def build_brand_upsert_sql(table_name: str) -> str:
+    """Returns the upsert statement prepared once per ingestion session."""
+    return f"""
         INSERT INTO {table_name} (brand_id, brand_name, imported_at)
         VALUES (?, ?, ?)
         ON CONFLICT(brand_id) DO UPDATE SET
@@ -67,67 +72,87 @@ def upsert_brands(brands: List[Tuple[str, str, datetime.date]], table_name: str)
         WHERE {table_name}.brand_name IS NOT excluded.brand_name;
     """
 
-    conn = get_db_connection(DB_NAME)
-    try:
-        # The 'with conn:' block automatically begins and commits/rollbacks a transaction.
-        with conn:
-            # Use executemany to efficiently process the entire list.
-            conn.executemany(sql, brands)
-    except sqlite3.Error as e:
-        print(f"Failed to upsert a chunk of {len(brands)} brands: {e}")
-    else:
-        print(f"Successfully upserted/updated {len(brands)} brands. ✅")
-    finally:
-        conn.close()
-
 
 # --- Main Logic ---
 
 
-def brand_to_db(file_path: str, date: datetime.date, table_name: str):
+def parse_brand_rows(file_path: str, start: int = 0, end: int | None = None) -> ParsedBatch:
     """
-    Main function to read brand data from CSV files and load into the database.
-
-    Args:
-        files: A list of CSV file paths to process.
+    Reads and normalizes the brand rows of one byte range of a CSV file.
+    Runs in the worker processes of parse_files_in_parallel.
     """
-    # 1. Ensure the database table exists
-    assert create_brand_config_table(table_name)
-
-    chunk = []
-
-    # 2. Iterate through each file and process its rows
-    print(f"\nProcessing file: {file_path}...")
+    batch = ParsedBatch(file_path, start, end)
+    # Only the needed columns are picked, by position resolved from the header
+    reader = ColumnReader(file_path, ["BRAND_ID", "BRAND_DESCR"], start=start, end=end)
+    started_at = time.perf_counter()
+    raw_rows = []
+    lines = []
     try:
-        with open(file_path, mode="r", encoding="utf-8") as csvfile:
-            # Use DictReader to read CSV rows as dictionaries
-            reader = csv.DictReader(csvfile, delimiter="|")
-            for row in reader:
-                # 3. Normalize data from each row
-                brand_id = normalize_brand_id(row.get("BRAND_ID", ""))
-                brand_text = normalize_text(row.get("BRAND_DESCR", ""))
-
-                # Skip if essential data is missing
-                if not brand_id or not brand_text:
-                    print(f"Skipping row due to missing: {row}")
-                    continue
-
-                # 4. Upsert the processed data into the database
-                chunk.append([brand_id, brand_text, date])
-
-                if len(chunk) == 1000:
-                    upsert_brands(chunk, table_name)
-                    chunk = []
-
-        print(f"Successfully processed {file_path}. 🎉")
+        for row in reader:
+            raw_rows.append(row)
+            lines.append((reader.line_offset, reader.raw_line))
     except FileNotFoundError:
-        print(f"Error: File not found at {file_path}")
+        batch.error = f"Error: File not found at {file_path}"
+    except MissingColumnError:
+        raise
     except Exception as e:
-        print(f"An error occurred while processing {file_path}: {e}")
+        batch.error = f"An error occurred while processing {file_path}: {e}"
+    batch.parse_seconds = time.perf_counter() - started_at
+    batch.short_rows = reader.short_rows
+    if not raw_rows:
+        return batch
+
+    # Normalize column by column, one batch call per field for the whole range
+    raw_brand_ids, raw_brand_texts = zip(*raw_rows)
+    normalized = zip(
+        normalize_brand_ids(raw_brand_ids),
+        normalize_texts(raw_brand_texts),
+    )
+    for (line_offset, raw_line), (brand_id, brand_text) in zip(lines, normalized):
+        # Skip if essential data is missing
+        if not brand_id or not brand_text:
+            reason = missing_reason(("BRAND_ID", "BRAND_DESCR"), (brand_id, brand_text))
+            batch.skipped.append((reason, raw_line))
+            continue
+
+        batch.positions.append((brand_id, line_offset, len(raw_line)))
+        batch.rows.append((brand_id, brand_text))
+    batch.normalize_seconds = time.perf_counter() - started_at - batch.parse_seconds
+    return batch
+
+
+def import_brand_files(
+    session: IngestionSession,
+    files: List[Tuple[str, datetime.date, FileFingerprint]],
+    table_name: str,
+    log_table_name: str,
+    workers: int = 1,
+    pool=None,
+):
+    """
+    Main function to read brand data from CSV files and load into the database,
+    parsed by parse_brand_rows; see import_entity_files.
 
-    if len(chunk):
-        upsert_brands(chunk, table_name)
-        chunk = []
+    Args:
+        session: The ingestion session returned for build_brand_upsert_sql.
+        files: (file_path, imported_at date, fingerprint) in datetime order.
+        log_table_name: The imported logs ledger, written in each file's commit.
+        workers: Number of parsing processes.
+        pool: The load's shared_parse_pool, reused instead of a new pool.
+    """
+    import_entity_files(
+        session, files, table_name, log_table_name, parse_brand_rows, workers, pool
+    )
+
+
+def brand_to_db(session: IngestionSession, file_path: str, date: datetime.date):
+    """Loads a single brand file in-process, see import_brand_files."""
+    import_brand_files(
+        session,
+        [(file_path, date, fingerprint_file(file_path))],
+        TABLE_NAME,
+        IMOPORTED_LOG_TABLE_NAME,
+    )
 
 
 def write_raw_record_of_delta_brand(
@@ -145,7 +170,7 @@ def write_raw_record_of_delta_brand(
 
     # --- Step 1: Read the list of missing brand_ids into a set for fast lookups ---
     try:
-        conn = get_db_connection(DB_NAME)
+        conn = get_db_connection(DB_NAME, profile="interactive-read")
         cursor = conn.cursor()
         cursor.execute(
             f"""
@@ -168,40 +193,35 @@ def write_raw_record_of_delta_brand(
         f"Searching for the original lines of {len(missing_brands)} missing brand_ids..."
     )
 
-    # --- Step 2: Open the output file and search through the source files line by line ---
+    # --- Step 2: Copy the lines the raw line index points at, then scan the source files for the rest ---
     found_count = 0
     header_written = False
     try:
-        with open(to_file, "w", encoding="utf-8") as outfile:
-            for file_path in source_files:
-                try:
-                    with open(file_path, "r", encoding="utf-8") as infile:
-                        # Read the header to find the column index for "MATNR"
-                        header_line = next(infile, None)
-                        if not header_line:
-                            continue  # Skip empty files
-
-                        if not header_written:
-                            outfile.write(header_line)
-                            header_written = True
-
-                        # Process the rest of the file
-                        for line in infile:
-                            try:
-                                raw_brand_id = line.strip().split("|")[0]
-                                normalized_brand_id = normalize_brand_id(raw_brand_id)
-
-                                if normalized_brand_id in missing_brands:
-                                    missing_brands.remove(normalized_brand_id)
-                                    outfile.write(
-                                        line
-                                    )  # Write the original, unmodified line
-                                    found_count += 1
-                            except IndexError:
-                                # This will skip malformed lines that don't have enough columns
-                                continue
-                except FileNotFoundError:
-                    print(f"Warning: Source file not found, skipping: {file_path}")
+        with open(to_file, "wb") as outfile:
+            try:
+                conn = get_db_connection(DB_NAME, profile="interactive-read")
+                found_count, header_written = copy_indexed_raw_lines(
+                    conn,
+                    table_name,
+                    missing_brands,
+                    source_files,
+                    outfile,
+                    "BRAND_ID",
+                    normalize_brand_id_bytes,
+                )
+                conn.close()
+            except sqlite3.Error as e:
+                print(f"Warning: raw line index unavailable, scanning all files: {e}")
+
+            scanned_count, header_written = scan_raw_lines(
+                source_files,
+                missing_brands,
+                outfile,
+                "BRAND_ID",
+                normalize_brand_id_bytes,
+                header_written,
+            )
+            found_count += scanned_count
     except IOError as e:
         print(f"❌ Error writing to output file '{to_file}': {e}")
 
@@ -210,29 +230,61 @@ def write_raw_record_of_delta_brand(
     )
 
 
-# --- Example Usage ---
-if __name__ == "__main__":
-    sync_s3()
+def run_brand_load(sync, workers: int = IMPORT_WORKERS) -> EntityLoad:
+    """
+    Imports the brand files the sync hands out, each batch as soon as it is
+    on disk. Shared by __main__ and the all-to-db.py orchestrator.
+    """
+    started_at = time.perf_counter()
+    load = EntityLoad("brand", DB_NAME)
     create_imported_logs(DB_NAME, IMOPORTED_LOG_TABLE_NAME)
     create_brand_config_table(TABLE_NAME)
 
-    all_files = list_files_in_folder(SOURCE_FOLDER, no_filter=True)
-    brand_files = [f for f in all_files if f.file_type is FILE_TYPE]
-    brand_files.sort(key=lambda k: k.datetime)
+    with (
+        IngestionSession(DB_NAME, build_brand_upsert_sql(TABLE_NAME)) as session,
+        shared_parse_pool(parse_brand_rows, workers) as pool,
+    ):
+        # Each batch holds the files ready so far, already sorted by datetime
+        for ready_files in sync.files(FILE_TYPE):
+            load.files.extend(ready_files)
+            # A cheap stat check, then a content hash, decides what still needs importing
+            pending_files = []
+            for brand_file in ready_files:
+                date = datetime.datetime.strptime(brand_file.datetime[:8], "%Y%m%d").date()
+                if brand_file.datetime[8:] == "999999":
+                    load.last_run = date
+                fingerprint = check_imported_log(
+                    session.conn, IMOPORTED_LOG_TABLE_NAME, brand_file.path
+                )
+                if fingerprint:
+                    pending_files.append((brand_file.path, date, fingerprint))
+            session.commit()
+
+            if pending_files:
+                import_brand_files(
+                    session, pending_files, TABLE_NAME, IMOPORTED_LOG_TABLE_NAME, workers, pool
+                )
+                load.imported_paths.extend(str(path) for path, _, _ in pending_files)
+    session.print_report()
+
+    if load.files and not load.last_run:
+        load.last_run = datetime.datetime.strptime(load.files[-1].datetime[:8], "%Y%m%d").date()
+    load.read_ledger(IMOPORTED_LOG_TABLE_NAME)
+    load.seconds = time.perf_counter() - started_at
+    return load
 
-    last_run = None
-    for brand_file in brand_files:
-        date = datetime.datetime.strptime(brand_file.datetime[:8], "%Y%m%d").date()
-        if brand_file.datetime[8:] == "999999":
-            last_run = date
-        if insert_imported_logs_if_not_exists(
-            DB_NAME, IMOPORTED_LOG_TABLE_NAME, str(brand_file.path)
-        ):
-            brand_to_db(brand_file.path, date, TABLE_NAME)
+
+# --- Example Usage ---
+if __name__ == "__main__":
+    # Files already on disk are imported while newer ones are still downloading
+    sync = start_s3_sync(SOURCE_FOLDER, [FILE_TYPE])
+    load = run_brand_load(sync)
+    sync.join()
+    brand_files = load.files
 
     summarize_by_imported_at(DB_NAME, TABLE_NAME)
 
-    last_run = last_run or date
+    last_run = load.last_run
     print("last run", last_run)
     assert last_run
     today = datetime.date.today().isoformat().replace("-", "")
@@ -243,3 +295,5 @@ if __name__ == "__main__":
         datetime.date(2025, 8, 1),
         os.path.join(SOURCE_FOLDER, OUTPUT_FILE_NAME.format(today=today)),
     )
+
+    write_run_report("brand-to-db")
@@ -0,0 +1,268 @@
+import csv
+import datetime
+import os
+import sys
+from dataclasses import dataclass, field
+from abc_utils import get_db_connection, stage, write_run_report
+
+
+# --- Configuration ---
+# The entity databases as the loaders write them, by table name
+ENTITY_DATABASES = {
+    "articles": "data/articles.db",
+    "brands": "data/brands.db",
+    "categories": "data/categories.db",
+    "costcenters": "data/costcenters.db",
+}
+CATALOG_DB = "data/catalog.db"
+# (table, column, referenced table, referenced column) of each foreign key
+FOREIGN_KEYS = [
+    ("articles", "brand_id", "brands", "brand_id"),
+    ("articles", "category_id", "categories", "category_id"),
+]
+# Missing IDs printed per foreign key; the output file lists every orphan
+REPORT_TOP_IDS = 20
+
+CATALOG_SCHEMA = [
+    """
+    CREATE TABLE brands (
+        brand_id TEXT PRIMARY KEY,
+        brand_name TEXT NOT NULL,
+        imported_at DATE NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE categories (
+        category_id TEXT PRIMARY KEY,
+        category_name TEXT NOT NULL,
+        imported_at DATE NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE costcenters (
+        costcenter_id TEXT PRIMARY KEY,
+        costcenter_name TEXT NOT NULL,
+        imported_at DATE NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE articles (
+        article_id TEXT PRIMARY KEY,
+        article_name TEXT NOT NULL,
+        category_id TEXT NOT NULL REFERENCES categories (category_id),
+        brand_id TEXT NOT NULL REFERENCES brands (brand_id),
+        imported_at DATE NOT NULL
+    )
+    """,
+]
+# Built after the copy; category_id is covered by the leading column
+CATALOG_INDEXES = [
+    "CREATE INDEX articles_category_brand ON articles (category_id, brand_id)",
+    "CREATE INDEX articles_brand_id ON articles (brand_id)",
+    "CREATE INDEX articles_imported_at ON articles (imported_at)",
+]
+
+
+@dataclass
+class Catalog:
+    """A read connection and the qualified name of each entity table in it."""
+
+    conn: object
+    tables: dict[str, str]
+    description: str
+
+    def close(self):
+        self.conn.close()
+
+
+@dataclass
+class OrphanReport:
+    column: str
+    referenced_table: str
+    orphan_articles: int = 0
+    # (missing ID, articles referencing it), most referenced first
+    missing_ids: list[tuple[str, int]] = field(default_factory=list)
+
+
+def open_catalog(catalog_db: str | None = None) -> Catalog:
+    """
+    Opens the unified catalog file when catalog_db is given. Otherwise
+    articles.db is opened with the other entity databases ATTACHed under
+    their table names, so the same queries run without copying anything.
+    """
+    if catalog_db:
+        if not os.path.exists(catalog_db):
+            raise FileNotFoundError(f"No catalog at '{catalog_db}', build it first")
+        conn = get_db_connection(catalog_db, profile="interactive-read")
+        return Catalog(conn, {table: f"main.{table}" for table in ENTITY_DATABASES}, catalog_db)
+
+    missing = [db_name for db_name in ENTITY_DATABASES.values() if not os.path.exists(db_name)]
+    if missing:
+        # ATTACH would create them empty
+        raise FileNotFoundError(f"Entity databases not found: {', '.join(missing)}")
+    conn = get_db_connection(ENTITY_DATABASES["articles"], profile="interactive-read")
+    tables = {"articles": "main.articles"}
+    for table, db_name in ENTITY_DATABASES.items():
+        if table != "articles":
+            conn.execute(f"ATTACH DATABASE ? AS {table}", (db_name,))
+            tables[table] = f"{table}.{table}"
+    return Catalog(conn, tables, ", ".join(ENTITY_DATABASES.values()) + " (attached)")
+
+
+def build_catalog(catalog_db: str = CATALOG_DB) -> str:
+    """
+    Copies the four entity databases into one catalog file with declared,
+    indexed foreign keys. The file is built next to the old one and swapped
+    in when complete. Foreign keys are not enforced, since SAP does deliver
+    articles of unknown brands; integrity_report lists them instead.
+    """
+    part_path = catalog_db + ".part"
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(part_path + suffix):
+            os.remove(part_path + suffix)
+
+    conn = get_db_connection(part_path, profile="bulk-load")
+    try:
+        with stage("catalog_build") as timer:
+            conn.execute("PRAGMA foreign_keys=OFF")
+            for statement in CATALOG_SCHEMA:
+                conn.execute(statement)
+            for table, db_name in ENTITY_DATABASES.items():
+                if not os.path.exists(db_name):
+                    raise FileNotFoundError(f"Entity database not found: {db_name}")
+                conn.execute("ATTACH DATABASE ? AS source", (db_name,))
+                column_list = ", ".join(
+                    row["name"] for row in conn.execute(f"PRAGMA main.table_info({table})")
+                )
+                with conn:
+                    timer.rows += conn.execute(
+                        f"INSERT INTO main.{table} ({column_list}) "
+                        f"SELECT {column_list} FROM source.{table}"
+                    ).rowcount
+                conn.execute("DETACH DATABASE source")
+            with conn:
+                for statement in CATALOG_INDEXES:
+                    conn.execute(statement)
+            conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    # A -wal left by the old catalog would be replayed into the new file on
+    # its next open; its content is being replaced anyway
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(catalog_db + suffix):
+            os.remove(catalog_db + suffix)
+    os.replace(part_path, catalog_db)
+    print(f"Catalog '{catalog_db}' built from {len(ENTITY_DATABASES)} databases. ✅")
+    return catalog_db
+
+
+def find_orphans(catalog: Catalog) -> list[OrphanReport]:
+    """
+    Finds the articles whose brand or category is not in its table. Articles
+    are grouped by the key first, over its index, so only one lookup per
+    distinct ID is made in the referenced table.
+    """
+    reports = []
+    for table, column, referenced_table, referenced_column in FOREIGN_KEYS:
+        report = OrphanReport(column, referenced_table)
+        for row in catalog.conn.execute(
+            f"""
+            SELECT g.{column}, g.article_count
+            FROM (
+                SELECT {column}, COUNT(*) AS article_count
+                FROM {catalog.tables[table]}
+                GROUP BY {column}
+            ) AS g
+            WHERE NOT EXISTS (
+                SELECT 1 FROM {catalog.tables[referenced_table]} AS r
+                WHERE r.{referenced_column} = g.{column}
+            )
+            ORDER BY g.article_count DESC, g.{column}
+        """
+        ):
+            report.missing_ids.append((row[0], row[1]))
+            report.orphan_articles += row[1]
+        reports.append(report)
+    return reports
+
+
+def write_orphan_articles(catalog: Catalog, output_file: str) -> int:
+    """Writes every orphaned article with the keys it is missing. Returns the count."""
+    articles = catalog.tables["articles"]
+    rows = catalog.conn.execute(
+        f"""
+        SELECT a.article_id, a.category_id, a.brand_id,
+               c.category_id IS NULL AS missing_category,
+               b.brand_id IS NULL AS missing_brand
+        FROM {articles} AS a
+        LEFT JOIN {catalog.tables["categories"]} AS c ON c.category_id = a.category_id
+        LEFT JOIN {catalog.tables["brands"]} AS b ON b.brand_id = a.brand_id
+        WHERE c.category_id IS NULL OR b.brand_id IS NULL
+        ORDER BY a.article_id
+    """
+    )
+    count = 0
+    with open(output_file, "w", encoding="utf-8", newline="") as outfile:
+        writer = csv.writer(outfile, delimiter="|")
+        writer.writerow(["MATNR", "MATKL", "BRAND_ID", "MISSING"])
+        for row in rows:
+            missing = [name for name, flag in (("category", row[3]), ("brand", row[4])) if flag]
+            writer.writerow([row[0], row[1], row[2], ",".join(missing)])
+            count += 1
+    return count
+
+
+def integrity_report(
+    catalog_db: str | None = None, output_file: str | None = None
+) -> list[OrphanReport]:
+    """Prints the orphaned article brands and categories, see find_orphans."""
+    catalog = open_catalog(catalog_db)
+    try:
+        with stage("integrity") as timer:
+            article_count = catalog.conn.execute(
+                f"SELECT COUNT(*) FROM {catalog.tables['articles']}"
+            ).fetchone()[0]
+            reports = find_orphans(catalog)
+            timer.rows = article_count
+
+        print()
+        print(f"Catalog Integrity: {catalog.description}")
+        print("-----------------------------------------------")
+        print(f"Articles                  | {article_count:12d}")
+        for report in reports:
+            print(
+                f"Unknown {report.column:<17} | {report.orphan_articles:12d} articles, "
+                f"{len(report.missing_ids)} IDs"
+            )
+        print("-----------------------------------------------")
+        for report in reports:
+            if not report.missing_ids:
+                continue
+            print(f"Missing from {report.referenced_table} ({report.column} | articles):")
+            for missing_id, count in report.missing_ids[:REPORT_TOP_IDS]:
+                print(f"  {missing_id!s:<22} | {count:10d}")
+            if len(report.missing_ids) > REPORT_TOP_IDS:
+                print(f"  ... {len(report.missing_ids) - REPORT_TOP_IDS} more")
+
+        if output_file and any(report.orphan_articles for report in reports):
+            count = write_orphan_articles(catalog, output_file)
+            print(f"{count} orphaned articles written to {output_file} 📝")
+    finally:
+        catalog.close()
+    return reports
+
+
+if __name__ == "__main__":
+    # Usage: python script/catalog.py [build] [report] [--catalog] [--output]
+    #   build      copies the entity databases into CATALOG_DB
+    #   --catalog  reports on CATALOG_DB instead of the attached entity databases
+    #   --output   also writes every orphaned article to a CSV file
+    if "build" in sys.argv:
+        build_catalog(CATALOG_DB)
+    if "report" in sys.argv or "build" not in sys.argv:
+        today = datetime.date.today().isoformat().replace("-", "")
+        integrity_report(
+            CATALOG_DB if "--catalog" in sys.argv else None,
+            f"data/ORPHAN_ARTICLES_{today}.csv" if "--output" in sys.argv else None,
+        )
+    write_run_report("catalog")
@@ -1,16 +1,30 @@
 import datetime
 import os
 import sqlite3
-import csv
+import time
 from typing import List, Tuple
-from file_listing import FileType, list_files_in_folder
-from abc_normalize import normalize_category_id, normalize_text
+from file_listing import FileType
+from abc_normalize import normalize_category_id_bytes, normalize_category_ids, normalize_texts
 from abc_utils import (
+    ColumnReader,
+    EntityLoad,
+    FileFingerprint,
+    IngestionSession,
+    MissingColumnError,
+    ParsedBatch,
+    import_entity_files,
     get_db_connection,
+    copy_indexed_raw_lines,
     create_imported_logs,
-    insert_imported_logs_if_not_exists,
+    create_raw_line_index,
+    fingerprint_file,
+    missing_reason,
+    check_imported_log,
+    scan_raw_lines,
+    shared_parse_pool,
     summarize_by_imported_at,
-    sync_s3,
+    start_s3_sync,
+    write_run_report,
 )
 
 
@@ -21,6 +35,7 @@ DB_NAME = "data/categories.db"
 TABLE_NAME = "categories"
 IMOPORTED_LOG_TABLE_NAME = "categories_imported_log"
 OUTPUT_FILE_NAME = "S4P_CATEGORY_FULL_{today}_999999_1_1.CSV"
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", os.cpu_count() or 1))
 
 
 def create_category_config_table(table_name: str):
@@ -37,6 +52,7 @@ def create_category_config_table(table_name: str):
                 )
             """
             )
+            create_raw_line_index(conn, table_name)
         print(f"Table '{table_name}' is ready. ✅")
         return True
     except sqlite3.Error as e:
@@ -45,22 +61,9 @@ def create_category_config_table(table_name: str):
         conn.close()
 
 
-def upsert_categories(
-    categories: List[Tuple[str, str, datetime.date]], table_name: str
-):
-    """
-    Inserts or replaces a chunk of category records in a single transaction.
-
-    Args:
-        categories: A list of tuples, where each tuple contains
-                  (category_id, category_name, imported_at).
-    """
-    # Check if there are any categories to process
-    if not categories:
-        print("No categories provided to upsert.")
-        return
-
-    sql = f"""
+def build_category_upsert_sql(table_name: str) -> str:
+    """Returns the upsert statement prepared once per ingestion session."""
+    return f"""
         INSERT INTO {table_name} (category_id, category_name, imported_at)
         VALUES (?, ?, ?)
         ON CONFLICT(category_id) DO UPDATE SET
@@ -69,67 +72,87 @@ def upsert_categories(
         WHERE {table_name}.category_name IS NOT excluded.category_name;
     """
 
-    conn = get_db_connection(DB_NAME)
-    try:
-        # The 'with conn:' block automatically begins and commits/rollbacks a transaction.
-        with conn:
-            # Use executemany to efficiently process the entire list.
-            conn.executemany(sql, categories)
-    except sqlite3.Error as e:
-        print(f"Failed to upsert a chunk of {len(categories)} categories: {e}")
-    else:
-        print(f"Successfully upserted/updated {len(categories)} categories. ✅")
-    finally:
-        conn.close()
-
 
 # --- Main Logic ---
 
 
-def category_to_db(file_path: str, date: datetime.date, table_name: str):
+def parse_category_rows(file_path: str, start: int = 0, end: int | None = None) -> ParsedBatch:
     """
-    Main function to read category data from CSV files and load into the database.
-
-    Args:
-        files: A list of CSV file paths to process.
+    Reads and normalizes the category rows of one byte range of a CSV file.
+    Runs in the worker processes of parse_files_in_parallel.
     """
-    # 1. Ensure the database table exists
-    assert create_category_config_table(table_name)
-
-    chunk = []
-
-    # 2. Iterate through each file and process its rows
-    print(f"\nProcessing file: {file_path}...")
+    batch = ParsedBatch(file_path, start, end)
+    # Only the needed columns are picked, by position resolved from the header
+    reader = ColumnReader(file_path, ["CLASS", "KSCHG"], start=start, end=end)
+    started_at = time.perf_counter()
+    raw_rows = []
+    lines = []
     try:
-        with open(file_path, mode="r", encoding="utf-8") as csvfile:
-            # Use DictReader to read CSV rows as dictionaries
-            reader = csv.DictReader(csvfile, delimiter="|")
-            for row in reader:
-                # 3. Normalize data from each row
-                category_id = normalize_category_id(row.get("CLASS", ""))
-                category_text = normalize_text(row.get("KSCHG", ""))
-
-                # Skip if essential data is missing
-                if not category_id or not category_text:
-                    print(f"Skipping row due to missing: {row}")
-                    continue
-
-                # 4. Upsert the processed data into the database
-                chunk.append([category_id, category_text, date])
-
-                if len(chunk) == 1000:
-                    upsert_categories(chunk, table_name)
-                    chunk = []
-
-        print(f"Successfully processed {file_path}. 🎉")
+        for row in reader:
+            raw_rows.append(row)
+            lines.append((reader.line_offset, reader.raw_line))
     except FileNotFoundError:
-        print(f"Error: File not found at {file_path}")
+        batch.error = f"Error: File not found at {file_path}"
+    except MissingColumnError:
+        raise
     except Exception as e:
-        print(f"An error occurred while processing {file_path}: {e}")
+        batch.error = f"An error occurred while processing {file_path}: {e}"
+    batch.parse_seconds = time.perf_counter() - started_at
+    batch.short_rows = reader.short_rows
+    if not raw_rows:
+        return batch
+
+    # Normalize column by column, one batch call per field for the whole range
+    raw_category_ids, raw_category_texts = zip(*raw_rows)
+    normalized = zip(
+        normalize_category_ids(raw_category_ids),
+        normalize_texts(raw_category_texts),
+    )
+    for (line_offset, raw_line), (category_id, category_text) in zip(lines, normalized):
+        # Skip if essential data is missing
+        if not category_id or not category_text:
+            reason = missing_reason(("CLASS", "KSCHG"), (category_id, category_text))
+            batch.skipped.append((reason, raw_line))
+            continue
+
+        batch.positions.append((category_id, line_offset, len(raw_line)))
+        batch.rows.append((category_id, category_text))
+    batch.normalize_seconds = time.perf_counter() - started_at - batch.parse_seconds
+    return batch
+
+
+def import_category_files(
+    session: IngestionSession,
+    files: List[Tuple[str, datetime.date, FileFingerprint]],
+    table_name: str,
+    log_table_name: str,
+    workers: int = 1,
+    pool=None,
+):
+    """
+    Main function to read category data from CSV files and load into the database,
+    parsed by parse_category_rows; see import_entity_files.
 
-    if len(chunk):
-        upsert_categories(chunk, table_name)
-        chunk = []
+    Args:
+        session: The ingestion session returned for build_category_upsert_sql.
+        files: (file_path, imported_at date, fingerprint) in datetime order.
+        log_table_name: The imported logs ledger, written in each file's commit.
+        workers: Number of parsing processes.
+        pool: The load's shared_parse_pool, reused instead of a new pool.
+    """
+    import_entity_files(
+        session, files, table_name, log_table_name, parse_category_rows, workers, pool
+    )
+
+
+def category_to_db(session: IngestionSession, file_path: str, date: datetime.date):
+    """Loads a single category file in-process, see import_category_files."""
+    import_category_files(
+        session,
+        [(file_path, date, fingerprint_file(file_path))],
+        TABLE_NAME,
+        IMOPORTED_LOG_TABLE_NAME,
+    )
 
 
 def write_raw_record_of_delta_category(
@@ -147,7 +170,7 @@ def write_raw_record_of_delta_category(
 
     # --- Step 1: Read the list of missing category_ids into a set for fast lookups ---
     try:
-        conn = get_db_connection(DB_NAME)
+        conn = get_db_connection(DB_NAME, profile="interactive-read")
         cursor = conn.cursor()
         cursor.execute(
             f"""
@@ -170,42 +193,35 @@ def write_raw_record_of_delta_category(
         f"Searching for the original lines of {len(missing_categories)} missing category_ids..."
     )
 
-    # --- Step 2: Open the output file and search through the source files line by line ---
+    # --- Step 2: Copy the lines the raw line index points at, then scan the source files for the rest ---
     found_count = 0
     header_written = False
     try:
-        with open(to_file, "w", encoding="utf-8") as outfile:
-            for file_path in source_files:
-                try:
-                    with open(file_path, "r", encoding="utf-8") as infile:
-                        # Read the header to find the column index for "MATNR"
-                        header_line = next(infile, None)
-                        if not header_line:
-                            continue  # Skip empty files
-
-                        if not header_written:
-                            outfile.write(header_line)
-                            header_written = True
-
-                        # Process the rest of the file
-                        for line in infile:
-                            try:
-                                raw_category_id = line.strip().split("|")[0]
-                                normalized_category_id = normalize_category_id(
-                                    raw_category_id
-                                )
-
-                                if normalized_category_id in missing_categories:
-                                    missing_categories.remove(normalized_category_id)
-                                    outfile.write(
-                                        line
-                                    )  # Write the original, unmodified line
-                                    found_count += 1
-                            except IndexError:
-                                # This will skip malformed lines that don't have enough columns
-                                continue
-                except FileNotFoundError:
-                    print(f"Warning: Source file not found, skipping: {file_path}")
+        with open(to_file, "wb") as outfile:
+            try:
+                conn = get_db_connection(DB_NAME, profile="interactive-read")
+                found_count, header_written = copy_indexed_raw_lines(
+                    conn,
+                    table_name,
+                    missing_categories,
+                    source_files,
+                    outfile,
+                    "CLASS",
+                    normalize_category_id_bytes,
+                )
+                conn.close()
+            except sqlite3.Error as e:
+                print(f"Warning: raw line index unavailable, scanning all files: {e}")
+
+            scanned_count, header_written = scan_raw_lines(
+                source_files,
+                missing_categories,
+                outfile,
+                "CLASS",
+                normalize_category_id_bytes,
+                header_written,
+            )
+            found_count += scanned_count
     except IOError as e:
         print(f"❌ Error writing to output file '{to_file}': {e}")
 
@@ -214,29 +230,61 @@ def write_raw_record_of_delta_category(
     )
 
 
-# --- Example Usage ---
-if __name__ == "__main__":
-    sync_s3()
+def run_category_load(sync, workers: int = IMPORT_WORKERS) -> EntityLoad:
+    """
+    Imports the category files the sync hands out, each batch as soon as it is
+    on disk. Shared by __main__ and the all-to-db.py orchestrator.
+    """
+    started_at = time.perf_counter()
+    load = EntityLoad("category", DB_NAME)
     create_imported_logs(DB_NAME, IMOPORTED_LOG_TABLE_NAME)
     create_category_config_table(TABLE_NAME)
 
-    all_files = list_files_in_folder(SOURCE_FOLDER, no_filter=True)
-    category_files = [f for f in all_files if f.file_type is FILE_TYPE]
-    category_files.sort(key=lambda k: k.datetime)
+    with (
+        IngestionSession(DB_NAME, build_category_upsert_sql(TABLE_NAME)) as session,
+        shared_parse_pool(parse_category_rows, workers) as pool,
+    ):
+        # Each batch holds the files ready so far, already sorted by datetime
+        for ready_files in sync.files(FILE_TYPE):
+            load.files.extend(ready_files)
+            # A cheap stat check, then a content hash, decides what still needs importing
+            pending_files = []
+            for category_file in ready_files:
+                date = datetime.datetime.strptime(category_file.datetime[:8], "%Y%m%d").date()
+                if category_file.datetime[8:] == "999999":
+                    load.last_run = date
+                fingerprint = check_imported_log(
+                    session.conn, IMOPORTED_LOG_TABLE_NAME, category_file.path
+                )
+                if fingerprint:
+                    pending_files.append((category_file.path, date, fingerprint))
+            session.commit()
+
+            if pending_files:
+                import_category_files(
+                    session, pending_files, TABLE_NAME, IMOPORTED_LOG_TABLE_NAME, workers, pool
+                )
+                load.imported_paths.extend(str(path) for path, _, _ in pending_files)
+    session.print_report()
+
+    if load.files and not load.last_run:
+        load.last_run = datetime.datetime.strptime(load.files[-1].datetime[:8], "%Y%m%d").date()
+    load.read_ledger(IMOPORTED_LOG_TABLE_NAME)
+    load.seconds = time.perf_counter() - started_at
+    return load
 
-    last_run = None
-    for category_file in category_files:
-        date = datetime.datetime.strptime(category_file.datetime[:8], "%Y%m%d").date()
-        if category_file.datetime[8:] == "999999":
-            last_run = date
-        if insert_imported_logs_if_not_exists(
-            DB_NAME, IMOPORTED_LOG_TABLE_NAME, str(category_file.path)
-        ):
-            category_to_db(category_file.path, date, TABLE_NAME)
+
+# --- Example Usage ---
+if __name__ == "__main__":
+    # Files already on disk are imported while newer ones are still downloading
+    sync = start_s3_sync(SOURCE_FOLDER, [FILE_TYPE])
+    load = run_category_load(sync)
+    sync.join()
+    category_files = load.files
 
     summarize_by_imported_at(DB_NAME, TABLE_NAME)
 
-    last_run = last_run or date
+    last_run = load.last_run
     print("last run", last_run)
     assert last_run
     today = datetime.date.today().isoformat().replace("-", "")
@@ -247,3 +295,5 @@ if __name__ == "__main__":
         datetime.date(2025, 8, 1),
         os.path.join(SOURCE_FOLDER, OUTPUT_FILE_NAME.format(today=today)),
     )
+
+    write_run_report("category-to-db")
@@ -1,5 +1,41 @@
+import errno
+import glob
+import heapq
+import itertools
 import os
-import uuid  # For generating unique file names, similar to ulid
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from operator import itemgetter
+from typing import Callable, Iterator
+from abc_normalize import normalize_article_id_bytes
+from abc_utils import (
+    is_compressed,
+    open_source,
+    resolve_column_indexes,
+    stage,
+    write_run_report,
+)
+
+
+# --- Configuration ---
+ROOT_FOLDER = "/Users/pakawin_m/workspace/kpc-gwl-category-brand-conf/data/gwl-category-brand-master"
+# Most bytes handed to the kernel per copy call, and the chunk size of the
+# buffered fallback; memory use stays at about one chunk per merge
+KERNEL_COPY_BYTES = 64 * 1024 * 1024
+COPY_CHUNK_BYTES = 1024 * 1024
+MERGE_WORKERS = os.cpu_count() or 1
+# Errors meaning the kernel can't copy between these two files
+KERNEL_COPY_UNSUPPORTED = {errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.EBADF}
+# Memory the deduplicating merge may hold its sort chunks in, counting each
+# buffered line as its length plus LINE_OVERHEAD_BYTES
+MERGE_MEMORY_BYTES = int(os.getenv("ABC_MERGE_MEMORY_MB", "256")) * 1024 * 1024
+LINE_OVERHEAD_BYTES = 150
+# Sorted runs merged at once, each read through a RUN_BUFFER_BYTES buffer
+MERGE_FAN_IN = 64
+RUN_BUFFER_BYTES = 256 * 1024
 
 
 def get_file_paths(folder_path: str) -> list[str]:
@@ -14,35 +50,348 @@ def get_file_paths(folder_path: str) -> list[str]:
     return file_paths
 
 
+def copy_file_range(in_fd: int, out_fd: int, offset: int, count: int) -> int:
+    return os.copy_file_range(in_fd, out_fd, count, offset)
+
+
+def sendfile(in_fd: int, out_fd: int, offset: int, count: int) -> int:
+    return os.sendfile(out_fd, in_fd, offset, count)
+
+
+# Kernel copies tried in order; copy_file_range may even share the blocks
+KERNEL_COPIES = [
+    copy
+    for name, copy in (("copy_file_range", copy_file_range), ("sendfile", sendfile))
+    if hasattr(os, name)
+]
+
+
+def kernel_copy(in_fd: int, out_fd: int, offset: int, end: int) -> int:
+    """
+    Appends bytes offset..end of in_fd at the position of out_fd without
+    passing them through Python. Returns the offset reached, which is short of
+    end when no kernel copy works between these two files.
+    """
+    for copy in KERNEL_COPIES:
+        try:
+            while offset < end:
+                copied = copy(in_fd, out_fd, offset, min(end - offset, KERNEL_COPY_BYTES))
+                if not copied:
+                    return offset  # The file got shorter
+                offset += copied
+            return offset
+        except OSError as e:
+            if e.errno not in KERNEL_COPY_UNSUPPORTED:
+                raise
+    return offset
+
+
+def copy_rest(file_path: str, infile, outfile):
+    """
+    Copies infile from its current position to the end into outfile. Plain
+    files are copied by the kernel, compressed streams (or files the kernel
+    can't copy) in COPY_CHUNK_BYTES chunks.
+    """
+    if not is_compressed(file_path):
+        offset = infile.tell()  # After the header lines read through the buffer
+        outfile.flush()
+        offset = kernel_copy(
+            infile.fileno(), outfile.fileno(), offset, os.fstat(infile.fileno()).st_size
+        )
+        infile.seek(offset)
+    shutil.copyfileobj(infile, outfile, COPY_CHUNK_BYTES)
+
+
 def merge_csv_files(input_files: list[str], output_file: str, header_rows: int):
     """
-    Merges multiple CSV files into a single output file, skipping header rows
-    from the second file onwards.
+    Merges multiple CSV files, plain or compressed, into a single plain output
+    file, skipping header rows from the second file onwards.
     """
     is_first_file = True
     try:
         with open(output_file, "wb") as outfile:  # Open in binary write mode
             for file_path in input_files:
                 print(f"merging {file_path}")
-                with open(file_path, "rb") as infile:  # Open in binary read mode
+                with open_source(file_path) as infile:  # Plain or compressed, binary
                     if is_first_file:
-                        outfile.write(infile.read())
                         is_first_file = False
                     else:
                         # Skip header rows
                         for _ in range(header_rows):
                             infile.readline()  # Read and discard the header lines
-                        outfile.write(infile.read())
+                    copy_rest(file_path, infile, outfile)
+    except Exception as e:
+        raise IOError(f"Error merging CSV files: {e}")
+
+
+@dataclass
+class SortedRun:
+    """
+    A file of lines sorted by key. Runs are ordered by tag, the position of
+    their lines among all the parts: on equal keys the line of the later run
+    wins, and within a run the later line.
+    """
+
+    tag: tuple
+    path: str
+    # Column of the key in a part file; None for temp runs of b"key\0line" records
+    key_index: int | None = None
+    header_rows: int = 0
+
+
+@dataclass
+class DedupeStats:
+    rows_in: int = 0
+    rows_out: int = 0
+    without_key: int = 0
+    runs: int = 0
+
+
+def keyed_lines(
+    lines,
+    key_index: int,
+    normalize_key: Callable[[bytes], bytes],
+    stats: DedupeStats | None = None,
+) -> Iterator[tuple[bytes, bytes]]:
+    """(normalized key, line) of each line; lines without a key are left out."""
+    for line in lines:
+        if stats is not None:
+            stats.rows_in += 1
+        fields = line.split(b"|", key_index + 1)
+        key = normalize_key(fields[key_index]) if len(fields) > key_index else b""
+        if not key:
+            if stats is not None:
+                stats.without_key += 1
+            continue
+        if not line.endswith(b"\n"):
+            line += b"\n"  # The last line of a part
+        yield key, line
+
+
+def read_part_header(
+    file_path: str, infile, header_rows: int, key_column: str
+) -> tuple[list[bytes], int]:
+    """Reads the header rows of a part; returns them and the key's column index."""
+    header = [infile.readline() for _ in range(header_rows)]
+    key_index = resolve_column_indexes(
+        header[0].decode("utf-8") if header else "", [key_column], file_path
+    )[0]
+    return header, key_index
+
+
+def is_sorted_part(run: SortedRun, normalize_key: Callable[[bytes], bytes]) -> bool:
+    previous = b""
+    with open_source(run.path) as infile:
+        for _ in range(run.header_rows):
+            infile.readline()
+        for key, _ in keyed_lines(infile, run.key_index, normalize_key):
+            if key < previous:
+                return False
+            previous = key
+    return True
+
+
+def read_run(
+    run: SortedRun, normalize_key: Callable[[bytes], bytes], stats: DedupeStats
+) -> Iterator[tuple[bytes, tuple, bytes]]:
+    if run.key_index is None:
+        with open(run.path, "rb", buffering=RUN_BUFFER_BYTES) as infile:
+            for record in infile:
+                key, line = record.split(b"\0", 1)
+                yield key, run.tag, line
+        return
+    with open_source(run.path) as infile:
+        for _ in range(run.header_rows):
+            infile.readline()
+        for key, line in keyed_lines(infile, run.key_index, normalize_key, stats):
+            yield key, run.tag, line
+
+
+def merge_sorted_runs(
+    runs: list[SortedRun], normalize_key: Callable[[bytes], bytes], stats: DedupeStats
+) -> Iterator[tuple[bytes, bytes]]:
+    """k-way merges runs by key, yielding only the winning line of each key."""
+    merged = heapq.merge(
+        *(read_run(run, normalize_key, stats) for run in sorted(runs, key=lambda r: r.tag)),
+        key=itemgetter(0, 1),
+    )
+    for key, group in itertools.groupby(merged, key=itemgetter(0)):
+        for _, _, line in group:
+            pass  # The last one wins
+        yield key, line
+
+
+def write_temp_run(tag: tuple, records, tmp_dir: str) -> SortedRun:
+    fd, path = tempfile.mkstemp(suffix=".run", dir=tmp_dir)
+    with open(fd, "wb", buffering=RUN_BUFFER_BYTES) as outfile:
+        for key, line in records:
+            outfile.write(key + b"\0" + line)
+    return SortedRun(tag, path)
+
+
+def sort_part(
+    run: SortedRun,
+    normalize_key: Callable[[bytes], bytes],
+    memory_bytes: int,
+    tmp_dir: str,
+    stats: DedupeStats,
+) -> list[SortedRun]:
+    """
+    External sort of an unsorted part: chunks of up to memory_bytes are
+    deduplicated (the later line wins), sorted and written as temp runs.
+    """
+    runs = []
+    chunk: dict[bytes, bytes] = {}
+    chunk_bytes = 0
+    with open_source(run.path) as infile:
+        for _ in range(run.header_rows):
+            infile.readline()
+        for key, line in keyed_lines(infile, run.key_index, normalize_key, stats):
+            chunk[key] = line
+            chunk_bytes += len(line) + LINE_OVERHEAD_BYTES
+            if chunk_bytes >= memory_bytes:
+                runs.append(write_temp_run((*run.tag, len(runs)), sorted(chunk.items()), tmp_dir))
+                chunk, chunk_bytes = {}, 0
+    if chunk or not runs:
+        runs.append(write_temp_run((*run.tag, len(runs)), sorted(chunk.items()), tmp_dir))
+    return runs
+
+
+def merge_csv_files_dedupe(
+    input_files: list[str],
+    output_file: str,
+    header_rows: int,
+    key_column: str = "MATNR",
+    normalize_key: Callable[[bytes], bytes] = normalize_article_id_bytes,
+    memory_bytes: int = MERGE_MEMORY_BYTES,
+    tmp_dir: str | None = None,
+) -> DedupeStats:
+    """
+    Merges part files, oldest first, into one file holding a single line per
+    normalized key_column value: the one from the newest part, and within a
+    part the last one. The output is sorted by key, with the header rows of
+    the first part.
+
+    Parts already sorted by key are streamed as they are; the others are
+    externally sorted in chunks of memory_bytes into temp runs first. All
+    runs are then k-way merged, at most MERGE_FAN_IN at a time. Lines
+    without a key are left out, like the loaders reject them.
+    """
+    stats = DedupeStats()
+    header = []
+    try:
+        with tempfile.TemporaryDirectory(dir=tmp_dir) as run_dir:
+            runs = []
+            for part_index, file_path in enumerate(input_files):
+                print(f"merging {file_path}")
+                with open_source(file_path) as infile:
+                    part_header, key_index = read_part_header(
+                        file_path, infile, header_rows, key_column
+                    )
+                header = header or part_header
+                run = SortedRun((part_index,), file_path, key_index, header_rows)
+                if is_sorted_part(run, normalize_key):
+                    runs.append(run)
+                else:
+                    runs.extend(sort_part(run, normalize_key, memory_bytes, run_dir, stats))
+            stats.runs = len(runs)
+
+            # Merges neighbouring runs first while there are too many to open at once
+            while len(runs) > MERGE_FAN_IN:
+                runs.sort(key=lambda r: r.tag)
+                merged_runs = []
+                for i in range(0, len(runs), MERGE_FAN_IN):
+                    group = runs[i : i + MERGE_FAN_IN]
+                    merged_runs.append(
+                        write_temp_run(
+                            group[-1].tag, merge_sorted_runs(group, normalize_key, stats), run_dir
+                        )
+                    )
+                    for merged in group:
+                        if merged.key_index is None:
+                            os.remove(merged.path)
+                runs = merged_runs
+
+            with open(output_file, "wb") as outfile:
+                outfile.writelines(header)
+                for _, line in merge_sorted_runs(runs, normalize_key, stats):
+                    outfile.write(line)
+                    stats.rows_out += 1
     except Exception as e:
         raise IOError(f"Error merging CSV files: {e}")
+    print(
+        f"Deduplicated {stats.rows_in} rows into {stats.rows_out} by {key_column} "
+        f"from {stats.runs} sorted runs ({stats.without_key} without {key_column})"
+    )
+    return stats
+
+
+def find_article_folders(root_folder: str) -> list[tuple[str, str, str]]:
+    """(folder, date, channel) of every {date}/{channel}/ARTICLE folder under root_folder."""
+    folders = []
+    for folder_path in sorted(glob.glob(os.path.join(root_folder, "*", "*", "ARTICLE"))):
+        if os.path.isdir(folder_path):
+            channel_folder = os.path.dirname(folder_path)
+            date = os.path.basename(os.path.dirname(channel_folder))
+            folders.append((folder_path, date, os.path.basename(channel_folder)))
+    return folders
+
+
+def merge_article_folder(
+    folder_path: str, date: str, channel: str, header_rows: int, dedupe: bool = False
+) -> str:
+    output_csv_path = f"{folder_path}.{channel}.{date}.csv"
+    input_files = sorted(get_file_paths(folder_path))
+    if dedupe:
+        merge_csv_files_dedupe(input_files, output_csv_path, header_rows)
+    else:
+        merge_csv_files(input_files, output_csv_path, header_rows)
+    return output_csv_path
+
+
+def merge_article_folders(
+    root_folder: str, header_rows: int, workers: int = MERGE_WORKERS, dedupe: bool = False
+) -> list[str]:
+    """
+    Merges the part files of every {date}/{channel}/ARTICLE folder under
+    root_folder into {folder}.{channel}.{date}.csv, several folders at a time.
+
+    Plain merges copy in the kernel or in fixed-size chunks, so threads are
+    enough and memory stays flat whatever the part sizes. Deduplicating
+    merges sort in Python and run in processes, each within
+    MERGE_MEMORY_BYTES.
+    """
+    folders = find_article_folders(root_folder)
+    executor = ProcessPoolExecutor if dedupe else ThreadPoolExecutor
+    with executor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(merge_article_folder, folder_path, date, channel, header_rows, dedupe)
+            for folder_path, date, channel in folders
+        ]
+        return [future.result() for future in futures]
 
 
 # Example Usage (equivalent to the TypeScript example)
 if __name__ == "__main__":
+    # --dedupe keeps one line per MATNR, from the newest part
+    dedupe = "--dedupe" in sys.argv
+    if "--all" in sys.argv:
+        # Every {date}/{channel}/ARTICLE folder under ROOT_FOLDER
+        input_bytes = sum(
+            os.path.getsize(path)
+            for folder_path, _, _ in find_article_folders(ROOT_FOLDER)
+            for path in get_file_paths(folder_path)
+        )
+        with stage("merge", bytes=input_bytes):
+            output_paths = merge_article_folders(ROOT_FOLDER, 2, dedupe=dedupe)
+        print(f"Merged CSV files created for {len(output_paths)} folders under: {ROOT_FOLDER}")
+        write_run_report("csv-merge")
+        sys.exit()
+
     # folder_path = '/Users/pakawin_m/Library/CloudStorage/OneDrive-KingPowerGroup/[KPGDX-GWL] - Group-wide Loyalty - GWL - 07_Cutover Plan/cat-brand-master/20250624_143620/KPC_OFFLINE/ARTICLE'
     date = '20250627_202611'
     channel = 'KPC_OFFLINE'
-    folder_path = f'/Users/pakawin_m/workspace/kpc-gwl-category-brand-conf/data/gwl-category-brand-master/{date}/{channel}/ARTICLE'
+    folder_path = f'{ROOT_FOLDER}/{date}/{channel}/ARTICLE'
 
     # Generate a unique ID similar to ulid. For simplicity, using uuid4.
     # If you strictly need ulid, you'd need to install the 'ulid-py' package.
@@ -50,5 +399,10 @@ if __name__ == "__main__":
     output_csv_path = f"{folder_path}.{channel}.{date}.csv"
 
     input_files = sorted(get_file_paths(folder_path))
-    merge_csv_files(input_files, output_csv_path, 2)
+    with stage("merge", bytes=sum(os.path.getsize(path) for path in input_files)):
+        if dedupe:
+            merge_csv_files_dedupe(input_files, output_csv_path, 2)
+        else:
+            merge_csv_files(input_files, output_csv_path, 2)
     print(f"Merged CSV files created at: {output_csv_path}")
+    write_run_report("csv-merge")
@@ -1,6 +1,7 @@
+import json
 import os
 from enum import Enum, auto
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from collections import defaultdict
 from pathlib import Path
 import pprint
@@ -25,6 +26,24 @@ class PathWithFileType:
     datetime: str
 
 
+# Suffixes of SAP drops stored compressed; they are read as streams
+COMPRESSION_SUFFIXES = (".gz", ".bz2", ".zst")
+
+
+def strip_compression_suffix(file_name: str) -> str:
+    """Returns the file name without a trailing compression suffix."""
+    for suffix in COMPRESSION_SUFFIXES:
+        if file_name.lower().endswith(suffix):
+            return file_name[: -len(suffix)]
+    return file_name
+
+
+# Suffix of the sidecar files the loaders write rejected rows to
+REJECT_FILE_SUFFIX = ".rejects"
+# Suffix of files still being downloaded; they are renamed once complete
+PART_FILE_SUFFIX = ".part"
+
+
 # A mapping for efficient module name to FileType conversion
 MODULE_TO_FILE_TYPE_MAP = {
     "category": FileType.CATEGORY,
@@ -41,44 +60,169 @@ def get_file_type_from_name(module: str) -> FileType | None:
     return MODULE_TO_FILE_TYPE_MAP.get(module.lower())
 
 
-def list_files_in_folder(folder: str, start_date: str = "", no_filter=False) -> list[PathWithFileType]:
+# Suffix of the cached listing kept next to (not inside) each listed folder,
+# so writing it does not change the folder mtime it is keyed by
+MANIFEST_SUFFIX = ".manifest.json"
+MANIFEST_VERSION = 1
+
+
+def parse_file_name(file_name: str) -> tuple[FileType, str, str, str] | None:
+    """
+    Parses (file_type, nature, date, time) from a SAP file name, None for an
+    unknown module. Raises ValueError when the name does not match.
+    """
+    # Assumes format: env_module_nature_date_time...[.CSV][.gz|.bz2|.zst]
+    stem = strip_compression_suffix(file_name)
+    if stem.lower().endswith(".csv"):
+        stem = stem[: -len(".csv")]
+    _, module, nature, date, time, *_ = stem.split("_")
+    file_type = get_file_type_from_name(module)
+    if not file_type:
+        return None
+    return file_type, nature, date, time
+
+
+@dataclass
+class FolderManifest:
+    """
+    The parsed listing of a folder, valid while the folder mtime is unchanged.
+
+    entries maps every file name to its [FileType name, nature, date, time],
+    or None for names that are not SAP files of a known module. by_type is
+    the per-FileType index of (date, file) sorted by datetime, built the first
+    time a type is asked for.
+    """
+
+    folder: str
+    mtime_ns: int = -1
+    entries: dict = field(default_factory=dict)
+    by_type: dict = field(default_factory=dict)
+
+    def index(self, file_type: FileType) -> list[tuple[str, PathWithFileType]]:
+        if file_type not in self.by_type:
+            indexed = []
+            for file_name, entry in self.entries.items():
+                if entry is None or entry[0] != file_type.name:
+                    continue
+                _, nature, date, time = entry
+                indexed.append(
+                    (
+                        date,
+                        PathWithFileType(
+                            path=Path(self.folder) / file_name,
+                            file_type=file_type,
+                            nature=nature,
+                            datetime=f"{date}{time}",
+                        ),
+                    )
+                )
+            indexed.sort(key=lambda item: (item[1].datetime, item[1].path.name))
+            self.by_type[file_type] = indexed
+        return self.by_type[file_type]
+
+    def files(self, file_type: FileType | None = None, start_date: str = "") -> list[PathWithFileType]:
+        """Files of one type, or of all types, dated start_date or later, sorted by datetime."""
+        if file_type is None:
+            indexed = sorted(
+                (item for file_type in FileType for item in self.index(file_type)),
+                key=lambda item: (item[1].datetime, item[1].path.name),
+            )
+        else:
+            indexed = self.index(file_type)
+        return [f for date, f in indexed if start_date <= date]
+
+
+# Manifests already loaded by this process, by folder
+MANIFESTS: dict[str, FolderManifest] = {}
+
+
+def manifest_path(folder: str) -> str:
+    return os.path.normpath(folder) + MANIFEST_SUFFIX
+
+
+def read_manifest(folder: str) -> FolderManifest:
+    manifest = FolderManifest(folder)
+    try:
+        with open(manifest_path(folder), encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") == MANIFEST_VERSION:
+            manifest.mtime_ns = data["mtime_ns"]
+            manifest.entries = data["entries"]
+    except (OSError, ValueError, KeyError):
+        pass  # No usable manifest yet; the folder is scanned in full
+    return manifest
+
+
+def write_manifest(manifest: FolderManifest):
+    path = manifest_path(manifest.folder)
+    data = {"version": MANIFEST_VERSION, "mtime_ns": manifest.mtime_ns, "entries": manifest.entries}
+    try:
+        with open(path + ".part", "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(path + ".part", path)
+    except OSError as e:
+        print(f"Warning: could not write the listing manifest {path}: {e}")
+
+
+def load_manifest(folder: str) -> FolderManifest:
+    """
+    Returns the manifest of a folder. When the folder mtime differs from the
+    cached one, the folder is rescanned with os.scandir and only names not
+    seen before are parsed. Raises FileNotFoundError for a missing folder.
+    """
+    mtime_ns = os.stat(folder).st_mtime_ns
+    manifest = MANIFESTS.get(folder)
+    if manifest and manifest.mtime_ns == mtime_ns:
+        return manifest
+
+    manifest = manifest or read_manifest(folder)
+    if manifest.mtime_ns != mtime_ns:
+        entries = {}
+        with os.scandir(folder) as scan:
+            for entry in scan:
+                file_name = entry.name
+                if file_name.endswith((REJECT_FILE_SUFFIX, PART_FILE_SUFFIX)):
+                    continue  # Sidecar reject files and unfinished downloads
+                if file_name in manifest.entries:
+                    entries[file_name] = manifest.entries[file_name]
+                    continue
+                try:
+                    parsed = parse_file_name(file_name)
+                except ValueError:
+                    # Ignores files that don't match the expected naming convention
+                    print(f"Skipping file with incorrect format: {file_name}")
+                    parsed = None
+                entries[file_name] = [parsed[0].name, *parsed[1:]] if parsed else None
+        manifest.entries = entries
+        manifest.mtime_ns = mtime_ns
+        manifest.by_type = {}
+        write_manifest(manifest)
+    MANIFESTS[folder] = manifest
+    return manifest
+
+
+def list_files_in_folder(
+    folder: str,
+    start_date: str = "",
+    no_filter=False,
+    file_type: FileType | None = None,
+) -> list[PathWithFileType]:
     """
     Lists, filters, and sorts files in a folder based on their name, nature, and date.
 
     This function finds the latest "FULL" file for each file type and then includes
     any subsequent files (e.g., deltas) that are newer than that "FULL" file.
-    """
-    all_files: list[PathWithFileType] = []
 
-    # 1. Read all files and parse their metadata from the filename
+    The names come from the folder's cached manifest, see load_manifest, and
+    file_type restricts the result to one FileType through its index.
+    """
+    # 1. Read all files and their metadata parsed from the filename
     try:
-        filenames = os.listdir(folder)
+        all_files = load_manifest(folder).files(file_type, start_date)
     except FileNotFoundError:
         print(f"Error: Folder not found at '{folder}'")
         return []
 
-    for file_name in filenames:
-        try:
-            # Assumes format: env_module_nature_date_time...
-            _, module, nature, date, time, *_ = file_name.split("_")
-
-            file_type = get_file_type_from_name(module)
-
-            # Add to list if the file type is valid and date is within range
-            if file_type and start_date <= date:
-                all_files.append(
-                    PathWithFileType(
-                        path=Path(folder) / file_name,
-                        file_type=file_type,
-                        nature=nature,
-                        datetime=f"{date}{time}",
-                    )
-                )
-        except ValueError:
-            # Ignores files that don't match the expected naming convention
-            print(f"Skipping file with incorrect format: {file_name}")
-            continue
-
     if no_filter:
         return all_files
 
@@ -0,0 +1,628 @@
+import contextlib
+import datetime
+import os
+import shutil
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator
+
+from abc_utils import get_db_connection, stage
+from file_listing import (
+    PART_FILE_SUFFIX,
+    FileType,
+    PathWithFileType,
+    list_files_in_folder,
+    parse_file_name,
+)
+
+
+# --- Configuration ---
+# Where the bucket is mirrored, like the former `aws s3 sync s3://{bucket} ./data`
+LOCAL_FOLDER = "./data"
+# Fetches are logged here rather than in the loaders' import ledgers: those
+# are per entity database and record what was imported, not what was fetched
+SYNC_LEDGER_DB = "data/s3-sync.db"
+FETCHED_LOG_TABLE_NAME = "s3_fetched_log"
+WATERMARK_TABLE_NAME = "s3_sync_watermarks"
+FULL_LISTING_TABLE_NAME = "s3_full_listings"
+# Hours between full listings, which pick up files dropped behind a watermark
+FULL_LISTING_EVERY_HOURS = float(os.getenv("ABC_SYNC_FULL_EVERY_HOURS", "24"))
+# Concurrent downloads, and how many are queued per worker at most
+SYNC_WORKERS = int(os.getenv("ABC_SYNC_WORKERS", "8"))
+SYNC_QUEUE_PER_WORKER = 4
+COPY_BUFFER_BYTES = 1024 * 1024
+
+
+@dataclass
+class StoredObject:
+    """An object of the bucket, or a file of the directory standing in for it."""
+
+    key: str
+    size: int
+    mtime_ns: int
+    etag: str | None = None
+
+
+@dataclass
+class FetchedFile:
+    """A file written completely to its final local path."""
+
+    path: str
+    object: StoredObject
+    duration: float
+
+
+@dataclass
+class SyncSummary:
+    listed: int = 0
+    fetched: int = 0
+    up_to_date: int = 0
+    failed: int = 0
+    bytes: int = 0
+
+
+class DirectoryStore:
+    """
+    A plain directory used in place of the bucket, for offline runs and
+    tests. Keys are the paths relative to root with '/' separators.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def __str__(self):
+        return self.root
+
+    def list_objects(self, prefix: str = "", start_after: str = "") -> Iterator[StoredObject]:
+        """Objects whose key starts with prefix and sorts after start_after, in key order."""
+        folder = prefix.rpartition("/")[0]
+        keys = []
+        for dirpath, _, filenames in os.walk(os.path.join(self.root, folder)):
+            for name in filenames:
+                if name.endswith(PART_FILE_SUFFIX):
+                    continue
+                key = os.path.relpath(os.path.join(dirpath, name), self.root)
+                key = key.replace(os.sep, "/")
+                if key.startswith(prefix) and key > start_after:
+                    keys.append(key)
+        for key in sorted(keys):
+            stat = os.stat(os.path.join(self.root, *key.split("/")))
+            yield StoredObject(key, stat.st_size, stat.st_mtime_ns)
+
+    def download(self, key: str, outfile):
+        with open(os.path.join(self.root, *key.split("/")), "rb") as infile:
+            shutil.copyfileobj(infile, outfile, COPY_BUFFER_BYTES)
+
+
+class S3Store:
+    """
+    A bucket read with boto3, which is only needed for this store. An
+    S3-compatible stand-in is used by setting AWS_ENDPOINT_URL.
+    """
+
+    def __init__(self, bucket: str, client=None):
+        if client is None:
+            try:
+                import boto3
+            except ImportError as e:
+                raise ImportError("boto3 is required to sync from S3: pip install boto3") from e
+            client = boto3.client("s3", endpoint_url=os.getenv("AWS_ENDPOINT_URL") or None)
+        self.bucket = bucket
+        self.client = client
+
+    def __str__(self):
+        return f"s3://{self.bucket}"
+
+    def list_objects(self, prefix: str = "", start_after: str = "") -> Iterator[StoredObject]:
+        """Objects whose key starts with prefix and sorts after start_after, in key order."""
+        params = {"Bucket": self.bucket, "Prefix": prefix}
+        if start_after:
+            params["StartAfter"] = start_after
+        for page in self.client.get_paginator("list_objects_v2").paginate(**params):
+            for item in page.get("Contents", []):
+                if item["Key"].endswith("/"):
+                    continue  # Folder placeholder objects
+                yield StoredObject(
+                    item["Key"],
+                    item["Size"],
+                    # S3 keeps LastModified to the second
+                    int(item["LastModified"].timestamp()) * 1_000_000_000,
+                    item.get("ETag", "").strip('"') or None,
+                )
+
+    def download(self, key: str, outfile):
+        self.client.download_fileobj(self.bucket, key, outfile)
+
+
+def open_store(location: str):
+    """An S3Store for 's3://bucket', a DirectoryStore for anything else."""
+    if location.startswith("s3://"):
+        return S3Store(location[len("s3://") :].strip("/"))
+    return DirectoryStore(location)
+
+
+def watermark_prefix(key: str) -> str | None:
+    """
+    The prefix a key's watermark is kept under: its folder and the
+    env_module_nature_ of the SAP file name. Within one prefix keys sort by
+    date and time, so everything newer lists after the last key fetched.
+    Keys not named like SAP files have none and are listed on every run.
+    """
+    folder, slash, name = key.rpartition("/")
+    parts = name.split("_")
+    if len(parts) < 5:
+        return None
+    return f"{folder}{slash}{'_'.join(parts[:3])}_"
+
+
+def list_new_objects(store, watermarks: dict[str, str]) -> Iterator[StoredObject]:
+    """
+    Lists the whole store in key order but skips, for each prefix with a
+    watermark, its keys up to the watermark: the listing starts again after
+    it. Keys of prefixes never seen before are listed like any other, so the
+    first file of a new env_module_nature_ is never missed. A known prefix
+    costs one more list request, the first time the listing reaches it.
+    """
+    start_after = ""
+    skipped = set()
+    while True:
+        for obj in store.list_objects("", start_after):
+            prefix = watermark_prefix(obj.key)
+            if prefix in watermarks and prefix not in skipped:
+                skipped.add(prefix)
+                if obj.key <= watermarks[prefix]:
+                    start_after = watermarks[prefix]
+                    break
+            yield obj
+        else:
+            return
+
+
+def create_sync_ledger(db_name: str):
+    """Opens the sync ledger, creating its tables if they don't already exist."""
+    os.makedirs(os.path.dirname(db_name) or ".", exist_ok=True)
+    conn = get_db_connection(db_name)
+    with conn:
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {FETCHED_LOG_TABLE_NAME} (
+                file_path TEXT PRIMARY KEY,
+                object_key TEXT NOT NULL,
+                size INTEGER,
+                mtime_ns INTEGER,
+                etag TEXT,
+                duration REAL,
+                fetched_at TEXT
+            )
+        """
+        )
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE_NAME} (
+                prefix TEXT PRIMARY KEY,
+                object_key TEXT NOT NULL,
+                synced_at TEXT
+            )
+        """
+        )
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {FULL_LISTING_TABLE_NAME} (
+                listed_at TEXT PRIMARY KEY,
+                listed INTEGER,
+                late INTEGER
+            )
+        """
+        )
+    return conn
+
+
+def record_fetched_file(conn, fetched: FetchedFile):
+    with conn:
+        conn.execute(
+            f"""
+            INSERT OR REPLACE INTO {FETCHED_LOG_TABLE_NAME}
+                (file_path, object_key, size, mtime_ns, etag, duration, fetched_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+            (
+                fetched.path,
+                fetched.object.key,
+                fetched.object.size,
+                fetched.object.mtime_ns,
+                fetched.object.etag,
+                fetched.duration,
+                datetime.datetime.now().isoformat(),
+            ),
+        )
+
+
+def save_watermarks(conn, watermarks: dict[str, str]):
+    """Moves the watermark of each prefix forward, never back."""
+    now = datetime.datetime.now().isoformat()
+    with conn:
+        conn.executemany(
+            f"""
+            INSERT INTO {WATERMARK_TABLE_NAME} (prefix, object_key, synced_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT(prefix) DO UPDATE SET
+                object_key=max(object_key, excluded.object_key),
+                synced_at=excluded.synced_at
+        """,
+            [(prefix, key, now) for prefix, key in watermarks.items()],
+        )
+
+
+def is_full_listing_due(conn) -> bool:
+    """True when the last full listing is more than FULL_LISTING_EVERY_HOURS old."""
+    row = conn.execute(f"SELECT max(listed_at) AS listed_at FROM {FULL_LISTING_TABLE_NAME}").fetchone()
+    if row["listed_at"] is None:
+        return True
+    age = datetime.datetime.now() - datetime.datetime.fromisoformat(row["listed_at"])
+    return age > datetime.timedelta(hours=FULL_LISTING_EVERY_HOURS)
+
+
+def record_full_listing(conn, listed: int, late: int):
+    with conn:
+        conn.execute(
+            f"INSERT INTO {FULL_LISTING_TABLE_NAME} (listed_at, listed, late) VALUES (?, ?, ?)",
+            (datetime.datetime.now().isoformat(), listed, late),
+        )
+
+
+def local_path(local_folder: str, key: str) -> str:
+    return os.path.join(local_folder, *key.split("/"))
+
+
+def is_up_to_date(path: str, obj: StoredObject) -> bool:
+    """Same size and mtime (to the second) as the object, as aws s3 sync decides."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return False
+    return (stat.st_size, stat.st_mtime_ns // 1_000_000_000) == (
+        obj.size,
+        obj.mtime_ns // 1_000_000_000,
+    )
+
+
+def fetch_object(store, obj: StoredObject, local_folder: str) -> FetchedFile:
+    """
+    Downloads an object into a .part file next to its local path and renames
+    it into place once complete, so readers never see a partial file. The
+    mtime is set to the object's like aws s3 sync does.
+    """
+    started_at = time.perf_counter()
+    path = local_path(local_folder, obj.key)
+    part_path = path + PART_FILE_SUFFIX
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        with open(part_path, "wb") as outfile:
+            store.download(obj.key, outfile)
+        size = os.path.getsize(part_path)
+        if size != obj.size:
+            raise IOError(f"got {size} of {obj.size} bytes")
+        os.utime(part_path, ns=(obj.mtime_ns, obj.mtime_ns))
+        os.replace(part_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(part_path)
+        raise
+    return FetchedFile(path, obj, time.perf_counter() - started_at)
+
+
+def fetch_order(obj: StoredObject) -> tuple[str, str]:
+    """Sorts SAP files by the datetime in their name, other keys last."""
+    try:
+        parsed = parse_file_name(obj.key.rpartition("/")[2])
+    except ValueError:
+        parsed = None
+    return (f"{parsed[2]}{parsed[3]}" if parsed else "~", obj.key)
+
+
+def sync_objects(
+    store,
+    local_folder: str = LOCAL_FOLDER,
+    ledger_db: str = SYNC_LEDGER_DB,
+    full: bool = False,
+    workers: int = SYNC_WORKERS,
+    summary: SyncSummary | None = None,
+    on_planned: Callable[[dict[str, int]], None] | None = None,
+) -> Iterator[FetchedFile]:
+    """
+    Mirrors new objects of store into local_folder, yielding each file as soon
+    as it is completely written.
+
+    Keys up to the watermark of each known prefix are skipped, see
+    list_new_objects; everything else, new prefixes included, is listed on
+    every run. full lists the whole store, as does every run once the last
+    full listing is FULL_LISTING_EVERY_HOURS old; that picks up files dropped
+    behind a watermark, which are reported as late. Downloads run on a bounded thread
+    pool, oldest SAP file first, and each fetched file is recorded in the
+    ledger. on_planned gets the local path and size of every file to fetch
+    before the first download starts. A prefix's
+    watermark only moves past keys that are all settled, so a failed
+    download is retried on the next run.
+    """
+    summary = summary if summary is not None else SyncSummary()
+    conn = create_sync_ledger(ledger_db)
+    stored_watermarks = {
+        row["prefix"]: row["object_key"]
+        for row in conn.execute(f"SELECT prefix, object_key FROM {WATERMARK_TABLE_NAME}")
+    }
+    full = full or is_full_listing_due(conn)
+    watermarks = {} if full else stored_watermarks
+
+    # Keys of each prefix in listing (= key) order, and the ones settled:
+    # fetched or already up to date
+    listed_keys: dict[str, list[str]] = defaultdict(list)
+    settled_keys: set[str] = set()
+    pending = {}
+
+    def collect(done) -> Iterator[FetchedFile]:
+        for future in sorted(done, key=lambda f: pending[f].key):
+            obj = pending.pop(future)
+            try:
+                fetched = future.result()
+            except Exception as e:
+                summary.failed += 1
+                print(f"❌ Failed to fetch {obj.key}: {e}")
+                continue
+            record_fetched_file(conn, fetched)
+            settled_keys.add(obj.key)
+            summary.fetched += 1
+            summary.bytes += obj.size
+            yield fetched
+
+    # List everything first, so on_planned learns the whole run before the
+    # first file lands, and fetch oldest first
+    to_fetch = []
+    late_keys = []
+    for obj in list_new_objects(store, watermarks):
+        summary.listed += 1
+        key_prefix = watermark_prefix(obj.key)
+        if key_prefix:
+            listed_keys[key_prefix].append(obj.key)
+        if is_up_to_date(local_path(local_folder, obj.key), obj):
+            settled_keys.add(obj.key)
+            summary.up_to_date += 1
+        else:
+            to_fetch.append(obj)
+            if key_prefix in stored_watermarks and obj.key <= stored_watermarks[key_prefix]:
+                late_keys.append(obj.key)
+    to_fetch.sort(key=fetch_order)
+    if full:
+        record_full_listing(conn, summary.listed, len(late_keys))
+    for key in late_keys:
+        print(f"⚠️ {key} was dropped behind its prefix's watermark, fetching it late")
+    if on_planned:
+        on_planned({local_path(local_folder, obj.key): obj.size for obj in to_fetch})
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for obj in to_fetch:
+                pending[pool.submit(fetch_object, store, obj, local_folder)] = obj
+                if len(pending) >= workers * SYNC_QUEUE_PER_WORKER:
+                    yield from collect(wait(pending, return_when=FIRST_COMPLETED).done)
+            while pending:
+                yield from collect(wait(pending, return_when=FIRST_COMPLETED).done)
+    finally:
+        new_watermarks = {}
+        for prefix, keys in listed_keys.items():
+            for key in keys:
+                if key not in settled_keys:
+                    break
+                new_watermarks[prefix] = key
+        save_watermarks(conn, new_watermarks)
+        conn.close()
+
+
+def sync_store(
+    store,
+    local_folder: str = LOCAL_FOLDER,
+    ledger_db: str = SYNC_LEDGER_DB,
+    full: bool = False,
+    workers: int = SYNC_WORKERS,
+) -> SyncSummary:
+    """Runs sync_objects to completion and prints what it did."""
+    summary = SyncSummary()
+    for _ in sync_objects(store, local_folder, ledger_db, full, workers, summary):
+        pass
+    print_sync_summary(store, local_folder, summary)
+    return summary
+
+
+def print_sync_summary(store, local_folder: str, summary: SyncSummary):
+    print(
+        f"Synced {store} into '{local_folder}': {summary.listed} listed, "
+        f"{summary.fetched} fetched ({summary.bytes / 1e6:.1f} MB), "
+        f"{summary.up_to_date} up to date, {summary.failed} failed "
+        f"{'✅' if not summary.failed else '⚠️'}"
+    )
+
+
+class SyncPipeline:
+    """
+    Runs sync_objects on a background thread and hands the files of each
+    requested FileType to its loader in datetime order while later ones are
+    still downloading.
+
+    Once the sync has listed what it will fetch, the order of every type is
+    known: the files already in source_folder plus the ones to come. files()
+    releases them in that order as soon as a file and all earlier ones of its
+    type are on disk; files landing early wait in this reorder buffer. A file
+    that fails to download holds back the later ones of its type, which the
+    next run picks up again. Without a store (None) only the files already
+    in source_folder are handed out.
+    """
+
+    def __init__(
+        self,
+        store,
+        source_folder: str,
+        file_types: list[FileType],
+        local_folder: str = LOCAL_FOLDER,
+        ledger_db: str = SYNC_LEDGER_DB,
+        full: bool = False,
+        workers: int = SYNC_WORKERS,
+    ):
+        self.store = store
+        self.source_folder = source_folder
+        self.file_types = file_types
+        self.local_folder = local_folder
+        self.ledger_db = ledger_db
+        self.full = full
+        self.workers = workers
+        self.summary = SyncSummary()
+        self.condition = threading.Condition()
+        self.planned = False
+        self.finished = False
+        # Files of each type not yet handed out, in datetime order
+        self.queued: dict[FileType, deque[PathWithFileType]] = {}
+        # Sizes of the files being fetched, and the ones not on disk yet, by
+        # full local path: a file of the same name in another bucket folder
+        # must not release one of source_folder
+        self.source_path = os.path.realpath(source_folder)
+        self.incoming: dict[str, int] = {}
+        self.waiting: set[str] = set()
+        self.thread = threading.Thread(target=self.run, name="s3-sync", daemon=True)
+
+    def start(self) -> "SyncPipeline":
+        self.thread.start()
+        return self
+
+    def run(self):
+        try:
+            if self.store is None:
+                return  # The sync could not start; only the local files are loaded
+            with stage("s3_sync") as timer:
+                for fetched in sync_objects(
+                    self.store,
+                    self.local_folder,
+                    self.ledger_db,
+                    self.full,
+                    self.workers,
+                    self.summary,
+                    on_planned=self.plan,
+                ):
+                    with self.condition:
+                        self.waiting.discard(os.path.realpath(fetched.path))
+                        self.condition.notify_all()
+                timer.rows = self.summary.fetched
+                timer.bytes = self.summary.bytes
+            print_sync_summary(self.store, self.local_folder, self.summary)
+        except Exception as e:
+            print(f"❌ Sync of {self.store} failed, loading the local files only: {e}")
+        finally:
+            try:
+                if not self.planned:
+                    self.plan({})
+            except Exception as e:
+                print(f"❌ Listing {self.source_folder} failed: {e}")
+            finally:
+                # Set whatever happened, or the loaders would wait forever
+                with self.condition:
+                    self.planned = self.finished = True
+                    self.condition.notify_all()
+
+    def local_key(self, file: PathWithFileType) -> str:
+        """The key of a queued file in incoming and waiting."""
+        return os.path.join(self.source_path, file.path.name)
+
+    def plan(self, incoming: dict[str, int]):
+        """Merges the files to fetch into the source folder listing of each type."""
+        incoming_files = defaultdict(list)
+        sizes = {}
+        for path, size in incoming.items():
+            full_path = os.path.realpath(path)
+            folder, file_name = os.path.split(full_path)
+            if folder != self.source_path:
+                continue
+            try:
+                parsed = parse_file_name(file_name)
+            except ValueError:
+                continue
+            if not parsed or parsed[0] not in self.file_types:
+                continue
+            file_type, nature, date, time = parsed
+            incoming_files[file_type].append(
+                PathWithFileType(
+                    path=Path(self.source_folder) / file_name,
+                    file_type=file_type,
+                    nature=nature,
+                    datetime=f"{date}{time}",
+                )
+            )
+            sizes[full_path] = size
+
+        queued = {}
+        with stage("listing") as timer:
+            for file_type in self.file_types:
+                files = {}
+                if os.path.isdir(self.source_folder):  # Not before the first sync
+                    files = {
+                        f.path.name: f
+                        for f in list_files_in_folder(
+                            self.source_folder, no_filter=True, file_type=file_type
+                        )
+                    }
+                files.update((f.path.name, f) for f in incoming_files[file_type])
+                queued[file_type] = deque(
+                    sorted(files.values(), key=lambda f: (f.datetime, f.path.name))
+                )
+                timer.rows += len(files)
+
+        with self.condition:
+            self.queued = queued
+            self.incoming = sizes
+            self.waiting.update(sizes)
+            self.planned = True
+            self.condition.notify_all()
+
+    def queued_bytes(self, file_type: FileType) -> int:
+        """Size of the files of a type still to be fetched and not yet handed out."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.planned)
+            return sum(
+                self.incoming.get(self.local_key(f), 0) for f in self.queued.get(file_type, ())
+            )
+
+    def files(self, file_type: FileType) -> Iterator[list[PathWithFileType]]:
+        """Yields the files of a type in datetime order, as many as are ready at a time."""
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.planned)
+                queued = self.queued.setdefault(file_type, deque())
+                self.condition.wait_for(
+                    lambda: not queued
+                    or self.local_key(queued[0]) not in self.waiting
+                    or self.finished
+                )
+                ready = []
+                while queued and self.local_key(queued[0]) not in self.waiting:
+                    ready.append(queued.popleft())
+            if ready:
+                yield ready
+                continue
+            if queued:
+                print(
+                    f"⚠️ {queued[0].path} was not fetched; it and {len(queued) - 1} later "
+                    f"{file_type.name} files are left for the next run"
+                )
+            return
+
+    def join(self) -> SyncSummary:
+        self.thread.join()
+        return self.summary
+
+
+if __name__ == "__main__":
+    # Usage: python script/s3_sync.py [s3://bucket | folder] [--full]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    location = args[0] if args else f"s3://{os.getenv('AWS_BUCKET_NAME')}"
+    sync_store(open_store(location), full="--full" in sys.argv)
@@ -0,0 +1,7 @@
+import os
+import sys
+
+REPO_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The scripts import each other as top-level modules, like when run from script/
+sys.path.insert(0, os.path.join(REPO_FOLDER, "script"))
+sys.path.insert(0, REPO_FOLDER)
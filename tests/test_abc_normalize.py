@@ -0,0 +1,41 @@
+import pytest
+
+pytest.importorskip("hypothesis")
+from hypothesis import given, settings, strategies as st
+
+import abc_normalize
+from abc_normalize import (
+    normalize_article_id,
+    normalize_article_ids,
+    normalize_brand_id,
+    normalize_brand_ids,
+    normalize_category_id,
+    normalize_category_ids,
+    normalize_costcenter_id,
+    normalize_costcenter_ids,
+    normalize_text,
+    normalize_texts,
+)
+
+# Separators, whitespace, Thai and case-changing Unicode the IDs come with
+ALPHABET = "-_ \t\n0123456789abcXYZกขคไทยßİǅﬁ\u00a0\u3000"
+
+PAIRS = [
+    (normalize_article_id, normalize_article_ids),
+    (normalize_brand_id, normalize_brand_ids),
+    (normalize_category_id, normalize_category_ids),
+    (normalize_costcenter_id, normalize_costcenter_ids),
+    (normalize_text, normalize_texts),
+]
+
+
+@pytest.mark.parametrize("single, batch", PAIRS, ids=[batch.__name__ for _, batch in PAIRS])
+@settings(max_examples=500, deadline=None)
+@given(values=st.lists(st.none() | st.text(ALPHABET, max_size=12) | st.text()))
+def test_batch_normalizer_matches_single_value(single, batch, values):
+    abc_normalize._cached_brand_id.cache_clear()
+    abc_normalize._cached_category_id.cache_clear()
+    expected = [single(value) for value in values]
+    assert batch(values) == expected
+    # The second pass is served from the caches
+    assert batch(values) == expected
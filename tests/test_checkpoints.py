@@ -0,0 +1,113 @@
+import datetime
+import functools
+
+import pytest
+
+import abc_utils
+from abc_utils import (
+    FileFingerprint,
+    FileLoadStats,
+    IngestionSession,
+    create_imported_logs,
+    fingerprint_file,
+    get_db_connection,
+    import_script,
+    load_checkpoint,
+    save_checkpoint,
+)
+
+BRAND_ROWS = 3000
+
+
+@pytest.fixture
+def brand_loader(tmp_path, monkeypatch):
+    """The brand loader writing into tmp_path, parsing and checkpointing in small steps."""
+    monkeypatch.chdir(tmp_path)
+    module = import_script("brand-to-db")
+    monkeypatch.setattr(module, "DB_NAME", str(tmp_path / "brands.db"))
+    monkeypatch.setattr(abc_utils, "CHECKPOINT_BYTES", 8 * 1024)
+    monkeypatch.setattr(
+        abc_utils,
+        "parse_files_in_parallel",
+        functools.partial(abc_utils.parse_files_in_parallel, range_bytes=2 * 1024),
+    )
+    create_imported_logs(module.DB_NAME, module.IMOPORTED_LOG_TABLE_NAME)
+    module.create_brand_config_table(module.TABLE_NAME)
+    return module
+
+
+@pytest.fixture
+def brand_file(tmp_path) -> str:
+    path = tmp_path / "S4P_BRAND_FULL_20250801_999999_1_1.CSV"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("BRAND_ID|BRAND_DESCR\n")
+        for number in range(BRAND_ROWS):
+            f.write(f"B{number:05d}|BRAND {number}\n")
+    return str(path)
+
+
+def load(module, file_path: str):
+    upsert_sql = module.build_brand_upsert_sql(module.TABLE_NAME)
+    with IngestionSession(module.DB_NAME, upsert_sql) as session:
+        module.import_brand_files(
+            session,
+            [(file_path, datetime.date(2025, 8, 1), fingerprint_file(file_path))],
+            module.TABLE_NAME,
+            module.IMOPORTED_LOG_TABLE_NAME,
+        )
+
+
+def test_checkpoint_of_replaced_content_is_dropped(brand_loader, brand_file):
+    conn = get_db_connection(brand_loader.DB_NAME)
+    table_name = brand_loader.IMOPORTED_LOG_TABLE_NAME
+    stats = FileLoadStats(brand_file, row_count=10)
+    save_checkpoint(conn, table_name, FileFingerprint(1, 1, "old"), stats, 4096)
+
+    resumed = load_checkpoint(conn, table_name, brand_file, FileFingerprint(1, 1, "old"))
+    assert resumed.checkpoint_offset == 4096
+    assert load_checkpoint(conn, table_name, brand_file, FileFingerprint(1, 1, "new")) is None
+    assert load_checkpoint(conn, table_name, brand_file, FileFingerprint(1, 1, "old")) is None
+    conn.close()
+
+
+def test_interrupted_file_resumes_from_its_checkpoint(
+    brand_loader, brand_file, monkeypatch, capsys
+):
+    upsert = IngestionSession.upsert
+    calls = []
+
+    def interrupted_upsert(session, rows):
+        calls.append(len(rows))
+        if len(calls) == 10:
+            raise KeyboardInterrupt
+        return upsert(session, rows)
+
+    monkeypatch.setattr(IngestionSession, "upsert", interrupted_upsert)
+    with pytest.raises(KeyboardInterrupt):
+        load(brand_loader, brand_file)
+    monkeypatch.setattr(IngestionSession, "upsert", upsert)
+
+    conn = get_db_connection(brand_loader.DB_NAME)
+    checkpoint = conn.execute(
+        f"SELECT byte_offset, row_count FROM {brand_loader.IMOPORTED_LOG_TABLE_NAME}_checkpoints"
+    ).fetchone()
+    assert checkpoint is not None
+    # Only the rows up to the checkpoint were committed
+    assert conn.execute("SELECT COUNT(*) FROM brands").fetchone()[0] == checkpoint["row_count"]
+
+    capsys.readouterr()
+    load(brand_loader, brand_file)
+    out = capsys.readouterr().out
+    assert f"at byte {checkpoint['byte_offset']}" in out
+    assert out.count("Upserted ") == 1
+
+    assert conn.execute("SELECT COUNT(*) FROM brands").fetchone()[0] == BRAND_ROWS
+    ledger = conn.execute(
+        f"SELECT row_count FROM {brand_loader.IMOPORTED_LOG_TABLE_NAME} WHERE file_path = ?",
+        (brand_file,),
+    ).fetchone()
+    assert ledger["row_count"] == BRAND_ROWS
+    assert conn.execute(
+        f"SELECT COUNT(*) FROM {brand_loader.IMOPORTED_LOG_TABLE_NAME}_checkpoints"
+    ).fetchone()[0] == 0
+    conn.close()
@@ -0,0 +1,26 @@
+from abc_utils import ColumnReader, import_script
+
+
+def test_short_rows_are_padded_like_dictreader(tmp_path):
+    path = tmp_path / "S4P_ARTICLE_DELTA_20250802_013000_1_1.CSV"
+    path.write_text(
+        "MATNR|MAKTX|MATKL|BRAND_ID\n"
+        "A1|Bag|101|GUC\n"
+        "A2|Watch|102\n"
+        "\n"
+        "A3\n",
+        encoding="utf-8",
+    )
+    reader = ColumnReader(str(path), ["MATNR", "MATKL", "BRAND_ID"])
+    rows = list(reader)
+    assert rows == [("A1", "101", "GUC"), ("A2", "102", ""), ("A3", "", "")]
+    assert reader.short_rows == 2
+
+
+def test_article_without_trailing_brand_gets_the_default_brand(tmp_path):
+    path = tmp_path / "S4P_ARTICLE_DELTA_20250802_013000_1_1.CSV"
+    path.write_text("MATNR|MAKTX|MATKL|BRAND_ID\nA-1|Bag|10101\nA2\n", encoding="utf-8")
+    batch = import_script("article-to-db").parse_article_rows(str(path))
+    assert batch.rows == [("A1", "Bag", "101", "000")]
+    assert [reason for reason, _ in batch.skipped] == ["missing MATKL"]
+    assert batch.short_rows == 2
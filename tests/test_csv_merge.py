@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from abc_normalize import normalize_article_id_bytes
+from abc_utils import import_script
+
+HEADER = [b"MATNR|MAKTX|BRAND_ID\n", b"Material|Description|Brand\n"]
+
+
+@pytest.fixture
+def csv_merge():
+    return import_script("csv-merge")
+
+
+def write_part(path, lines: list[bytes]) -> str:
+    with open(path, "wb") as f:
+        f.writelines(HEADER + lines)
+    return str(path)
+
+
+def read_output(path) -> list[bytes]:
+    with open(path, "rb") as f:
+        return f.readlines()
+
+
+def test_newest_part_and_last_line_win(csv_merge, tmp_path):
+    parts = [
+        write_part(tmp_path / "1.csv", [b"A-2|old|X\n", b"A1|first|X\n", b"A-1|second|X\n"]),
+        write_part(tmp_path / "2.csv", [b"A2|new|Y\n", b"|no key|Y\n", b"A3|only|Y"]),
+    ]
+    output = str(tmp_path / "merged.csv")
+    stats = csv_merge.merge_csv_files_dedupe(parts, output, 2)
+
+    assert read_output(output) == HEADER + [b"A-1|second|X\n", b"A2|new|Y\n", b"A3|only|Y\n"]
+    assert (stats.rows_in, stats.rows_out, stats.without_key) == (6, 3, 1)
+
+
+def line_key(line: bytes) -> bytes:
+    return normalize_article_id_bytes(line.split(b"|", 1)[0])
+
+
+def expected_merge(parts: list[list[bytes]]) -> list[bytes]:
+    latest = {}
+    for lines in parts:
+        for line in lines:
+            key = line_key(line)
+            if key:
+                latest[key] = line
+    return HEADER + [latest[key] for key in sorted(latest)]
+
+
+@pytest.mark.parametrize("memory_bytes, fan_in", [(1 << 30, 64), (2048, 64), (2048, 3)])
+def test_external_sort_keeps_the_dedupe_order(
+    csv_merge, tmp_path, monkeypatch, memory_bytes, fan_in
+):
+    monkeypatch.setattr(csv_merge, "MERGE_FAN_IN", fan_in)
+    rng = random.Random(23)
+    parts = []
+    for part in range(4):
+        lines = [
+            f"{rng.choice(['', 'A', 'A-', 'A_'])}{rng.randint(1, 300)}|{part}:{i}|X\n".encode()
+            for i in range(400)
+        ]
+        if part == 1:
+            lines.sort(key=line_key)  # A part already sorted is streamed without a temp run
+        parts.append(lines)
+    paths = [write_part(tmp_path / f"{index}.csv", lines) for index, lines in enumerate(parts)]
+    output = str(tmp_path / "merged.csv")
+
+    stats = csv_merge.merge_csv_files_dedupe(paths, output, 2, memory_bytes=memory_bytes)
+
+    assert read_output(output) == expected_merge(parts)
+    if memory_bytes < 1 << 30:
+        assert stats.runs > len(parts)
@@ -0,0 +1,90 @@
+import os
+import shutil
+
+import pytest
+
+from abc_utils import (
+    check_imported_log,
+    create_imported_logs,
+    get_db_connection,
+    record_imported_log,
+)
+
+LOG_TABLE_NAME = "brands_imported_log"
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    db_name = str(tmp_path / "brands.db")
+    create_imported_logs(db_name, LOG_TABLE_NAME)
+    conn = get_db_connection(db_name)
+    yield conn
+    conn.close()
+
+
+def write_source(path, content: str = "BRAND_ID|BRAND_DESCR\nGUC|GUCCI\n") -> str:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    return str(path)
+
+
+def import_file(conn, file_path: str):
+    fingerprint = check_imported_log(conn, LOG_TABLE_NAME, file_path)
+    assert fingerprint is not None
+    record_imported_log(conn, LOG_TABLE_NAME, file_path, fingerprint, 1, 0, 0.1)
+    conn.commit()
+    return fingerprint
+
+
+def test_new_file_is_fingerprinted(ledger, tmp_path):
+    file_path = write_source(tmp_path / "S4P_BRAND_FULL_20250801_999999_1_1.CSV")
+    fingerprint = check_imported_log(ledger, LOG_TABLE_NAME, file_path)
+    assert fingerprint.size == os.path.getsize(file_path)
+    assert fingerprint.content_hash
+
+
+def test_imported_file_is_skipped(ledger, tmp_path):
+    file_path = write_source(tmp_path / "S4P_BRAND_FULL_20250801_999999_1_1.CSV")
+    import_file(ledger, file_path)
+    assert check_imported_log(ledger, LOG_TABLE_NAME, file_path) is None
+
+
+def test_touched_file_is_skipped_by_content(ledger, tmp_path):
+    file_path = write_source(tmp_path / "S4P_BRAND_FULL_20250801_999999_1_1.CSV")
+    import_file(ledger, file_path)
+    stat = os.stat(file_path)
+    os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+
+    assert check_imported_log(ledger, LOG_TABLE_NAME, file_path) is None
+    row = ledger.execute(f"SELECT mtime_ns FROM {LOG_TABLE_NAME}").fetchone()
+    assert row["mtime_ns"] == stat.st_mtime_ns + 5_000_000_000
+
+
+def test_redelivered_content_is_recorded_under_its_new_path(ledger, tmp_path):
+    file_path = write_source(tmp_path / "S4P_BRAND_FULL_20250801_999999_1_1.CSV")
+    import_file(ledger, file_path)
+    copy_path = str(tmp_path / "S4P_BRAND_FULL_20250802_999999_1_1.CSV")
+    shutil.copyfile(file_path, copy_path)
+
+    assert check_imported_log(ledger, LOG_TABLE_NAME, copy_path) is None
+    paths = {row["file_path"] for row in ledger.execute(f"SELECT file_path FROM {LOG_TABLE_NAME}")}
+    assert paths == {file_path, copy_path}
+
+
+def test_changed_content_is_imported_again(ledger, tmp_path):
+    file_path = write_source(tmp_path / "S4P_BRAND_FULL_20250801_999999_1_1.CSV")
+    first = import_file(ledger, file_path)
+    write_source(file_path, "BRAND_ID|BRAND_DESCR\nGUC|GUCCI\nDIO|DIOR\n")
+
+    fingerprint = check_imported_log(ledger, LOG_TABLE_NAME, file_path)
+    assert fingerprint is not None
+    assert fingerprint.content_hash != first.content_hash
+
+
+def test_path_only_row_is_trusted_and_migrated(ledger, tmp_path):
+    file_path = write_source(tmp_path / "S4P_BRAND_FULL_20250801_999999_1_1.CSV")
+    ledger.execute(f"INSERT INTO {LOG_TABLE_NAME} (file_path) VALUES (?)", (file_path,))
+
+    assert check_imported_log(ledger, LOG_TABLE_NAME, file_path) is None
+    row = ledger.execute(f"SELECT size FROM {LOG_TABLE_NAME}").fetchone()
+    assert row["size"] == os.path.getsize(file_path)
@@ -0,0 +1,58 @@
+import sqlite3
+
+import pytest
+
+from abc_utils import get_db_connection, temp_lookup_table
+
+
+@pytest.fixture
+def db_name(tmp_path) -> str:
+    db_name = str(tmp_path / "articles.db")
+    conn = get_db_connection(db_name)
+    with conn:
+        conn.execute("CREATE TABLE articles (article_id TEXT PRIMARY KEY, brand_id TEXT)")
+        conn.executemany(
+            "INSERT INTO articles VALUES (?, ?)", [(f"A{n}", f"B{n % 3}") for n in range(50)]
+        )
+    conn.close()
+    return db_name
+
+
+def test_join_against_the_lookup_table(db_name):
+    conn = get_db_connection(db_name, profile="interactive-read")
+    keys = [(f"A{n}",) for n in range(0, 5000, 7)]
+    with temp_lookup_table(conn, "article_keys", ("article_id",), keys) as lookup:
+        found = conn.execute(
+            f"SELECT COUNT(*) FROM {lookup} AS k JOIN articles AS a USING (article_id)"
+        ).fetchone()[0]
+    assert found == len(range(0, 50, 7))
+    assert conn.execute("SELECT name FROM temp.sqlite_master").fetchall() == []
+    conn.close()
+
+
+def test_interactive_read_stays_read_only(db_name):
+    conn = get_db_connection(db_name, profile="interactive-read")
+    with temp_lookup_table(conn, "article_keys", ("article_id",), [("A1",)]):
+        for statement in (
+            "INSERT INTO articles VALUES ('X', 'Y')",
+            "UPDATE main.articles SET brand_id = 'Z'",
+            "CREATE TABLE main.other (id TEXT)",
+            "DROP TABLE articles",
+        ):
+            with pytest.raises(sqlite3.DatabaseError):
+                conn.execute(statement)
+    with pytest.raises(sqlite3.OperationalError):
+        conn.execute("INSERT INTO articles VALUES ('X', 'Y')")
+    assert conn.execute("PRAGMA query_only").fetchone()[0] == 1
+    conn.close()
+
+
+def test_a_transaction_of_the_caller_is_left_open(db_name):
+    conn = get_db_connection(db_name)
+    conn.execute("UPDATE articles SET brand_id = 'X' WHERE article_id = 'A1'")
+    with temp_lookup_table(conn, "article_keys", ("article_id",), [("A1",)]):
+        pass
+    assert conn.in_transaction
+    conn.rollback()
+    assert conn.execute("SELECT brand_id FROM articles WHERE article_id = 'A1'").fetchone()[0] == "B1"
+    conn.close()